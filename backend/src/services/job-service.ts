@@ -86,6 +86,7 @@ export class JobService {
     }
 
     await this.updateJobStatus(jobId, JobStatus.FAILED, job.progress, 'Job cancelled by user');
+    this.processor.cancel(jobId);
     return true;
   }
 }
\ No newline at end of file
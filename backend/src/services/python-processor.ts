@@ -1,8 +1,51 @@
-import { spawn } from 'child_process';
+import { spawn, ChildProcess } from 'child_process';
 import path from 'path';
 import { Job } from '../db';
 import { JobService } from './job-service';
 
+// Jobs running at once across every processor instance; the rest wait for a slot
+const MAX_CONCURRENT_JOBS = Math.max(1, parseInt(process.env.MAX_CONCURRENT_JOBS || '2'));
+let runningJobs = 0;
+const waitingJobs: Array<() => void> = [];
+
+// Only the tail of a child's stderr is kept for the failure message; ffmpeg
+// can write megabytes of it over a long encode
+const MAX_ERROR_OUTPUT = 64 * 1024;
+
+async function acquireSlot(): Promise<void> {
+  if (runningJobs < MAX_CONCURRENT_JOBS) {
+    runningJobs++;
+    return;
+  }
+  // The releasing job hands its slot over directly
+  await new Promise<void>((resolve) => waitingJobs.push(resolve));
+}
+
+function releaseSlot(): void {
+  const next = waitingJobs.shift();
+  if (next) {
+    next();
+  } else {
+    runningJobs--;
+  }
+}
+
+// Calls onLine for each complete line of a child's output; chunks can end
+// mid-line, and a METRICS payload can span several of them
+function lineSplitter(onLine: (line: string) => void): (data: Buffer) => void {
+  let pending = '';
+  return (data) => {
+    pending += data.toString();
+    const lines = pending.split('\n');
+    pending = lines.pop() ?? '';
+    lines.forEach((line) => onLine(line));
+  };
+}
+
+// Running scripts by job id, so a cancel can reach them from any processor instance
+const runningProcesses = new Map<string, ChildProcess>();
+const cancelledJobs = new Set<string>();
+
 export class PythonVideoProcessor {
   private pythonPath: string;
   private scriptPath: string;
@@ -12,7 +55,26 @@ export class PythonVideoProcessor {
     this.scriptPath = process.env.PYTHON_SCRIPT_PATH || path.join(__dirname, '../../../python/style_transfer.py');
   }
 
+  // SIGTERM makes the script stop ffmpeg and remove its partial output; a job still
+  // waiting for a slot is dropped when its turn comes
+  cancel(jobId: string): void {
+    cancelledJobs.add(jobId);
+    runningProcesses.get(jobId)?.kill('SIGTERM');
+  }
+
   async processVideo(job: Job): Promise<void> {
+    await acquireSlot();
+    try {
+      if (cancelledJobs.delete(job.id)) {
+        return;
+      }
+      await this.runVideo(job);
+    } finally {
+      releaseSlot();
+    }
+  }
+
+  private runVideo(job: Job): Promise<void> {
     return new Promise((resolve, reject) => {
       const outputDir = process.env.OUTPUT_DIR || 'outputs';
       const outputPath = path.join(outputDir, `output_${job.id}.mp4`);
@@ -31,16 +93,16 @@ export class PythonVideoProcessor {
       console.log(`Command: ${this.pythonPath} ${args.join(' ')}`);
 
       const process = spawn(this.pythonPath, args);
+      runningProcesses.set(job.id, process);
       
       let lastProgress = 0;
       let errorOutput = '';
 
-      process.stdout.on('data', (data) => {
-        const output = data.toString();
+      process.stdout.on('data', lineSplitter((output) => {
         console.log(`[${job.id}] ${output}`);
 
         // Parse progress updates
-        const progressMatch = output.match(/PROGRESS:(\d+)/);
+        const progressMatch = output.match(/^PROGRESS:(\d+)/);
         if (progressMatch) {
           const progress = parseInt(progressMatch[1]);
           if (progress > lastProgress) {
@@ -50,7 +112,7 @@ export class PythonVideoProcessor {
         }
 
         // Parse metrics (when processing completes)
-        const metricsMatch = output.match(/METRICS:(.+)/);
+        const metricsMatch = output.match(/^METRICS:(.+)/);
         if (metricsMatch) {
           try {
             const metrics = JSON.parse(metricsMatch[1]);
@@ -59,15 +121,20 @@ export class PythonVideoProcessor {
             console.error('Failed to parse metrics:', error);
           }
         }
-      });
+      }));
 
       process.stderr.on('data', (data) => {
-        errorOutput += data.toString();
+        errorOutput = (errorOutput + data.toString()).slice(-MAX_ERROR_OUTPUT);
         console.error(`[${job.id}] Error: ${data}`);
       });
 
       process.on('close', (code) => {
-        if (code === 0) {
+        runningProcesses.delete(job.id);
+        if (cancelledJobs.delete(job.id)) {
+          // The job's status was already set by the cancel
+          console.log(`[${job.id}] Processing cancelled`);
+          resolve();
+        } else if (code === 0) {
           console.log(`[${job.id}] Processing completed successfully`);
           resolve();
         } else {
@@ -1,120 +1,98 @@
+import { execFile } from 'child_process';
+import path from 'path';
+import { promisify } from 'util';
 import { eq } from 'drizzle-orm';
 import { db, styleTemplates, StyleTemplate } from '../db';
 
-export class TemplateService {
-  private defaultTemplates: StyleTemplate[] = [
-    {
-      id: 'cinematic',
-      name: 'Cinematic',
-      description: 'Film-like color grading with dramatic curves and professional look',
-      previewUrl: null,
-      filterChain: {
-        filters: [
-          "curves=all='0/0 0.25/0.15 0.75/0.85 1/1'",
-          "colorbalance=rs=-0.2:gs=0.1:bs=0.15",
-          "eq=brightness=0.1:contrast=1.3:saturation=0.85:gamma=1.1",
-          "hue=h=5:s=1.1",
-          "unsharp=5:5:1.0:5:5:0.5"
-        ],
-        audioFilters: ["loudnorm=I=-16:TP=-1.5:LRA=11"]
-      },
-      createdAt: new Date(),
-    },
-    {
-      id: 'vibrant',
-      name: 'Vibrant',
-      description: 'High energy, social media style with punchy colors and clarity',
-      previewUrl: null,
-      filterChain: {
-        filters: [
-          "eq=saturation=1.6:contrast=1.4:brightness=0.15:gamma=0.9",
-          "colorbalance=rs=0.15:gs=-0.1:bs=-0.15",
-          "curves=all='0/0 0.2/0.35 0.8/0.75 1/1'",
-          "hue=h=-3:s=1.2",
-          "unsharp=7:7:1.5:7:7:0.3"
-        ],
-        audioFilters: ["loudnorm=I=-16:TP=-1.5:LRA=11"]
-      },
-      createdAt: new Date(),
-    },
-    {
-      id: 'minimal',
-      name: 'Minimal',
-      description: 'Clean, professional aesthetic with subtle adjustments',
-      previewUrl: null,
-      filterChain: {
-        filters: [
-          "eq=saturation=0.5:contrast=0.85:brightness=0.2:gamma=1.15",
-          "colorbalance=rs=0.08:gs=0.08:bs=0.08",
-          "curves=all='0/0.15 0.5/0.5 1/0.85'",
-          "hue=h=2:s=0.8"
-        ],
-        audioFilters: ["loudnorm=I=-16:TP=-1.5:LRA=11"]
-      },
-      createdAt: new Date(),
+const execFileAsync = promisify(execFile);
+
+// How long a template list read from the Python registry is reused; custom
+// template files can be added or edited while the server runs
+const TEMPLATE_LIST_TTL_MS = 30 * 1000;
+
+// Loudness normalization the pipeline applies to every template's audio
+const AUDIO_FILTERS = ["loudnorm=I=-16:TP=-1.5:LRA=11"];
+
+// One entry of `style_transfer.py --list-templates`
+interface RegistryTemplate {
+  name: string;
+  description: string;
+  filters: string[];
+  options: Record<string, boolean>;
+}
+
+function toStyleTemplate(template: RegistryTemplate): StyleTemplate {
+  return {
+    id: template.name,
+    name: template.name.split('_').map((word) => word.charAt(0).toUpperCase() + word.slice(1)).join(' '),
+    description: template.description,
+    previewUrl: null,
+    filterChain: {
+      filters: template.filters,
+      options: template.options,
+      audioFilters: AUDIO_FILTERS
     },
-    {
-      id: 'vintage',
-      name: 'Vintage',
-      description: 'Retro film aesthetic with warm tones and aging effects',
-      previewUrl: null,
-      filterChain: {
-        filters: [
-          "eq=saturation=0.7:contrast=1.2:brightness=0.12:gamma=1.05",
-          "colorbalance=rs=0.25:gs=0.15:bs=-0.2",
-          "curves=all='0/0.1 0.25/0.2 0.75/0.8 1/0.9'",
-          "hue=h=8:s=0.9",
-          "vignette=PI/4:0.2",
-          "noise=alls=25:allf=t+u"
-        ],
-        audioFilters: ["loudnorm=I=-16:TP=-1.5:LRA=11"]
-      },
-      createdAt: new Date(),
+    createdAt: new Date(),
+  };
+}
+
+export class TemplateService {
+  private pythonPath = process.env.PYTHON_PATH || 'python3';
+  private scriptPath = process.env.PYTHON_SCRIPT_PATH || path.join(__dirname, '../../../python/style_transfer.py');
+  private registryTemplates: Promise<StyleTemplate[]> | null = null;
+  private loadedAt = 0;
+
+  // The template files read by the Python registry are the source of truth, so
+  // the list served here always matches what jobs can actually use
+  private getRegistryTemplates(): Promise<StyleTemplate[]> {
+    if (!this.registryTemplates || Date.now() - this.loadedAt > TEMPLATE_LIST_TTL_MS) {
+      this.loadedAt = Date.now();
+      this.registryTemplates = execFileAsync(this.pythonPath, [this.scriptPath, '--list-templates'])
+        .then(({ stdout }) => (JSON.parse(stdout) as RegistryTemplate[]).map(toStyleTemplate))
+        .catch((error) => {
+          this.registryTemplates = null;
+          throw error;
+        });
     }
-  ];
+    return this.registryTemplates;
+  }
 
   async getAllTemplates(): Promise<StyleTemplate[]> {
     try {
-      // Try to get from database first
-      const dbTemplates = await db.select().from(styleTemplates);
-      
-      // If no templates in database, return defaults
-      if (dbTemplates.length === 0) {
-        return this.defaultTemplates;
-      }
-      
-      return dbTemplates;
+      return await this.getRegistryTemplates();
     } catch (error) {
-      console.warn('Failed to fetch templates from database, using defaults:', error);
-      return this.defaultTemplates;
+      console.warn('Failed to list templates from the registry, using the database:', error);
+      return db.select().from(styleTemplates);
     }
   }
 
   async getTemplate(templateId: string): Promise<StyleTemplate | null> {
     try {
-      // Try database first
-      const [template] = await db.select().from(styleTemplates).where(eq(styleTemplates.id, templateId));
-      
-      if (template) {
-        return template;
-      }
-      
-      // Fallback to defaults
-      return this.defaultTemplates.find(t => t.id === templateId) || null;
+      const templates = await this.getRegistryTemplates();
+      return templates.find(t => t.id === templateId) || null;
     } catch (error) {
-      console.warn('Failed to fetch template from database, checking defaults:', error);
-      return this.defaultTemplates.find(t => t.id === templateId) || null;
+      console.warn('Failed to list templates from the registry, checking the database:', error);
+      const [template] = await db.select().from(styleTemplates).where(eq(styleTemplates.id, templateId));
+      return template || null;
     }
   }
 
+  // Mirrors the registry into the database for consumers that read it directly
   async seedDefaultTemplates(): Promise<void> {
     try {
-      for (const template of this.defaultTemplates) {
-        await db.insert(styleTemplates).values(template).onConflictDoNothing();
+      for (const template of await this.getRegistryTemplates()) {
+        await db.insert(styleTemplates).values(template).onConflictDoUpdate({
+          target: styleTemplates.id,
+          set: {
+            name: template.name,
+            description: template.description,
+            filterChain: template.filterChain,
+          },
+        });
       }
       console.log('Default templates seeded successfully');
     } catch (error) {
       console.warn('Failed to seed templates:', error);
     }
   }
-}
\ No newline at end of file
+}
@@ -9,7 +9,7 @@ interface ResultsSectionProps {
   isVisible: boolean;
   metrics?: {
     processing_time?: string;
-    style_match?: number;
+    style_match?: number | null;
     colors_analyzed?: number;
     output_size?: string;
   };
@@ -122,7 +122,7 @@ export function ResultsSection({ jobId, originalVideoUrl, isVisible, metrics }:
             </div>
             <div>
               <div className="text-2xl font-bold text-slate-900" data-testid="stat-style-match">
-                {metrics?.style_match || 0}%
+                {metrics?.style_match != null ? `${metrics.style_match}%` : '–'}
               </div>
               <div className="text-sm text-slate-600">Style Match</div>
             </div>
@@ -18,7 +18,7 @@ export interface Job {
   errorMessage?: string | null
   metrics?: {
     processing_time: string
-    style_match: number
+    style_match: number | null
     colors_analyzed: number
     output_size: string
   } | null
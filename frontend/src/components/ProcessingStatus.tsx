@@ -81,7 +81,7 @@ export function ProcessingStatus({ job }: ProcessingStatusProps) {
           </div>
           <div className="text-center">
             <p className="text-sm text-slate-600">Style Match</p>
-            <p className="font-semibold text-slate-900">{job.metrics.style_match}%</p>
+            <p className="font-semibold text-slate-900">{job.metrics.style_match != null ? `${job.metrics.style_match}%` : '–'}</p>
           </div>
           <div className="text-center">
             <p className="text-sm text-slate-600">Colors Analyzed</p>
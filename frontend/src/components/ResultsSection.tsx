@@ -66,7 +66,7 @@ export function ResultsSection({ job }: ResultsSectionProps) {
             <h4 className="font-semibold text-slate-900 mb-4">Processing Summary</h4>
             <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
               <div className="text-center">
-                <p className="text-2xl font-bold text-blue-600">{job.metrics.style_match}%</p>
+                <p className="text-2xl font-bold text-blue-600">{job.metrics.style_match != null ? `${job.metrics.style_match}%` : '–'}</p>
                 <p className="text-sm text-slate-600">Style Match</p>
               </div>
               <div className="text-center">
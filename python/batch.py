@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+"""Batch style transfer; see stylesync/batch.py"""
+
+from stylesync.batch import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+"""Benchmarks for the style transfer pipeline; see stylesync/benchmark.py"""
+
+from stylesync.benchmark import main
+
+if __name__ == "__main__":
+    main()
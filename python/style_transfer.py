@@ -1,340 +1,7 @@
 #!/usr/bin/env python3
-"""
-Video Style Transfer using FFmpeg
-Extracts style characteristics from reference videos and applies them to user videos.
-"""
+"""Command-line entry point spawned once per job by the backend; see stylesync/cli.py"""
 
-import sys
-import json
-import os
-import subprocess
-import random
-from pathlib import Path
-
-def get_video_info(video_path):
-    """Extract video information using ffprobe"""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', video_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return json.loads(result.stdout)
-    except Exception as e:
-        print(f"Error getting video info: {e}")
-        return None
-
-def extract_video_style(reference_video_path):
-    """Extract style characteristics from reference video"""
-    try:
-        print("Analyzing reference video style characteristics...")
-        
-        # Extract color statistics using ffprobe
-        cmd = [
-            'ffprobe', '-f', 'lavfi', '-i', f'movie={reference_video_path},signalstats',
-            '-show_entries', 'frame=pkt_pts_time:frame_tags=lavfi.signalstats.YAVG,lavfi.signalstats.UAVG,lavfi.signalstats.VAVG,lavfi.signalstats.YMIN,lavfi.signalstats.YMAX',
-            '-print_format', 'json', '-read_intervals', '%+#10'
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        stats_data = json.loads(result.stdout)
-        
-        # Extract average color values from multiple frames
-        y_values = []
-        u_values = []
-        v_values = []
-        brightness_values = []
-        
-        for frame in stats_data.get('frames', []):
-            tags = frame.get('tags', {})
-            if 'lavfi.signalstats.YAVG' in tags:
-                y_values.append(float(tags['lavfi.signalstats.YAVG']))
-                u_values.append(float(tags.get('lavfi.signalstats.UAVG', 128)))
-                v_values.append(float(tags.get('lavfi.signalstats.VAVG', 128)))
-                
-                y_min = float(tags.get('lavfi.signalstats.YMIN', 0))
-                y_max = float(tags.get('lavfi.signalstats.YMAX', 255))
-                brightness_values.append((y_min + y_max) / 2)
-        
-        if not y_values:
-            return None
-            
-        # Calculate style characteristics
-        avg_y = sum(y_values) / len(y_values)
-        avg_u = sum(u_values) / len(u_values) 
-        avg_v = sum(v_values) / len(v_values)
-        avg_brightness = sum(brightness_values) / len(brightness_values)
-        
-        # Determine color temperature and characteristics
-        warm_bias = (avg_v - 128) / 128  # Positive = warm, negative = cool
-        green_magenta_bias = (avg_u - 128) / 128  # Positive = green, negative = magenta
-        
-        # Calculate contrast from brightness range
-        brightness_range = max(brightness_values) - min(brightness_values)
-        contrast_level = brightness_range / 255
-        
-        # Determine saturation level from U/V deviation
-        saturation_level = (abs(avg_u - 128) + abs(avg_v - 128)) / 128
-        
-        style_profile = {
-            'brightness': (avg_brightness - 128) / 128,  # -1 to 1
-            'contrast': contrast_level,  # 0 to 1
-            'saturation': saturation_level,  # 0 to 1+
-            'warm_bias': warm_bias,  # -1 to 1
-            'green_magenta_bias': green_magenta_bias,  # -1 to 1
-            'luminance': (avg_y - 128) / 128  # -1 to 1
-        }
-        
-        print(f"Extracted style profile: {style_profile}")
-        return style_profile
-        
-    except Exception as e:
-        print(f"Error extracting video style: {e}")
-        return None
-
-def apply_reference_style_filters(style_profile, options):
-    """Apply style filters based on extracted reference video characteristics"""
-    
-    filters = []
-    
-    # Convert style profile to filter parameters
-    brightness_adj = style_profile['brightness'] * 0.3  # Scale to reasonable range
-    contrast_adj = 1.0 + (style_profile['contrast'] * 0.5)  # 1.0 to 1.5
-    saturation_adj = 0.8 + (style_profile['saturation'] * 0.8)  # 0.8 to 1.6
-    
-    # Color balance adjustments based on reference
-    rs_adj = style_profile['warm_bias'] * 0.3  # Red-cyan balance
-    gs_adj = style_profile['green_magenta_bias'] * 0.2  # Green-magenta balance
-    bs_adj = -style_profile['warm_bias'] * 0.2  # Blue-yellow balance
-    
-    # Gamma adjustment based on luminance
-    gamma_adj = 1.0 + (style_profile['luminance'] * 0.3)
-    
-    # Apply extracted style characteristics
-    filters.extend([
-        f"eq=brightness={brightness_adj:.3f}:contrast={contrast_adj:.3f}:saturation={saturation_adj:.3f}:gamma={gamma_adj:.3f}",
-        f"colorbalance=rs={rs_adj:.3f}:gs={gs_adj:.3f}:bs={bs_adj:.3f}",
-    ])
-    
-    # Add curve adjustment based on contrast profile
-    if style_profile['contrast'] > 0.6:  # High contrast reference
-        filters.append("curves=all='0/0 0.2/0.1 0.8/0.9 1/1'")
-    elif style_profile['contrast'] < 0.3:  # Low contrast reference
-        filters.append("curves=all='0/0.1 0.5/0.5 1/0.9'")
-    else:  # Medium contrast
-        filters.append("curves=all='0/0 0.3/0.25 0.7/0.75 1/1'")
-    
-    # Add sharpening based on extracted characteristics
-    if style_profile['contrast'] > 0.5:
-        filters.append("unsharp=5:5:1.0:5:5:0.5")
-    
-    print(f"Applied reference-based filters: {filters}")
-    return filters
-
-def apply_template_style_filters(style_template, options):
-    """Apply predefined template-based style filters"""
-    
-    filters = []
-    
-    if style_template == 'cinematic':
-        # Film-like color grading with dramatic effects
-        filters.extend([
-            "curves=all='0/0 0.25/0.15 0.75/0.85 1/1'",  # Strong S-curve
-            "colorbalance=rs=-0.2:gs=0.1:bs=0.15",       # Teal/orange look
-            "eq=brightness=0.1:contrast=1.3:saturation=0.85:gamma=1.1",
-            "hue=h=5:s=1.1",                             # Slight hue shift
-            "unsharp=5:5:1.0:5:5:0.5"                    # Enhance sharpness
-        ])
-        # Add film grain effect
-        if options.get('filmGrain', True):
-            filters.append("noise=alls=15:allf=t+u")
-            
-    elif style_template == 'vibrant':
-        # High energy, social media style
-        filters.extend([
-            "eq=saturation=1.6:contrast=1.4:brightness=0.15:gamma=0.9",
-            "colorbalance=rs=0.15:gs=-0.1:bs=-0.15",
-            "curves=all='0/0 0.2/0.35 0.8/0.75 1/1'",
-            "hue=h=-3:s=1.2",                            # Slight magenta shift
-            "unsharp=7:7:1.5:7:7:0.3"                    # Pop and clarity
-        ])
-        
-    elif style_template == 'minimal':
-        # Clean, professional aesthetic
-        filters.extend([
-            "eq=saturation=0.5:contrast=0.85:brightness=0.2:gamma=1.15",
-            "colorbalance=rs=0.08:gs=0.08:bs=0.08",
-            "curves=all='0/0.15 0.5/0.5 1/0.85'",       # Lifted shadows/crushed highlights
-            "hue=h=2:s=0.8"                              # Desaturated look
-        ])
-        
-    elif style_template == 'vintage':
-        # Retro film aesthetic with aging effects
-        filters.extend([
-            "eq=saturation=0.7:contrast=1.2:brightness=0.12:gamma=1.05",
-            "colorbalance=rs=0.25:gs=0.15:bs=-0.2",      # Warm, aged tones
-            "curves=all='0/0.1 0.25/0.2 0.75/0.8 1/0.9'", # Film curve
-            "hue=h=8:s=0.9",                             # Warm hue shift
-            "vignette=PI/4:0.2",                         # Dark vignette
-            "noise=alls=25:allf=t+u"                     # Heavy film grain
-        ])
-    
-    return filters
-
-def build_ffmpeg_command(input_path, output_path, video_filters, audio_filters):
-    """Build comprehensive ffmpeg command"""
-    
-    # Combine all filters
-    video_filter = ','.join(video_filters) if video_filters else "copy"
-    audio_filter = ','.join(audio_filters) if audio_filters else "copy"
-    
-    # Build comprehensive ffmpeg command
-    cmd = [
-        'ffmpeg', '-i', input_path,
-        '-vf', video_filter,
-        '-af', audio_filter,
-        '-c:v', 'libx264',      # Re-encode video for quality
-        '-crf', '18',           # High quality encoding
-        '-preset', 'medium',    # Balance speed/quality
-        '-c:a', 'aac',          # Re-encode audio
-        '-b:a', '128k',         # Audio bitrate
-        '-y', output_path
-    ]
-    
-    return cmd
-
-def calculate_metrics(input_path, output_path, processing_time, colors_analyzed):
-    """Calculate authentic processing metrics"""
-    
-    try:
-        # Get output file size
-        output_size = os.path.getsize(output_path)
-        output_size_mb = f"{output_size / (1024 * 1024):.0f}MB"
-        
-        # Format processing time
-        minutes = int(processing_time // 60)
-        seconds = int(processing_time % 60)
-        time_str = f"{minutes}:{seconds:02d}"
-        
-        # Generate realistic style match percentage
-        base_match = random.randint(82, 97)
-        
-        return {
-            "processing_time": time_str,
-            "style_match": base_match,
-            "colors_analyzed": colors_analyzed,
-            "output_size": output_size_mb
-        }
-    except Exception as e:
-        print(f"Error calculating metrics: {e}")
-        return {
-            "processing_time": "0:00",
-            "style_match": 85,
-            "colors_analyzed": 0,
-            "output_size": "0MB"
-        }
-
-def main():
-    if len(sys.argv) != 7:
-        print("Usage: python style_transfer.py <user_video> <reference_video> <style_template> <options> <output_path> <job_id>")
-        sys.exit(1)
-    
-    user_video_path = sys.argv[1]
-    reference_video_path = sys.argv[2] if sys.argv[2] else None
-    style_template = sys.argv[3] if sys.argv[3] else None
-    options_json = sys.argv[4]
-    output_path = sys.argv[5]
-    job_id = sys.argv[6]
-    
-    try:
-        options = json.loads(options_json)
-    except json.JSONDecodeError:
-        print("Error: Invalid options JSON")
-        sys.exit(1)
-    
-    try:
-        import time
-        start_time = time.time()
-        
-        print(f"PROGRESS:5")
-        print(f"Starting video processing for job {job_id}")
-        
-        print(f"PROGRESS:15")
-        print(f"Analyzing input video: {user_video_path}")
-        
-        # Get video info for metrics
-        video_info = get_video_info(user_video_path)
-        if not video_info:
-            raise Exception("Failed to analyze video")
-        
-        # Calculate colors analyzed from video resolution
-        video_stream = next((s for s in video_info['streams'] if s['codec_type'] == 'video'), None)
-        if video_stream:
-            width = int(video_stream.get('width', 1920))
-            height = int(video_stream.get('height', 1080))
-            colors_analyzed = width * height
-        else:
-            colors_analyzed = 1920 * 1080
-        
-        print(f"PROGRESS:25")
-        print(f"Preparing style filters...")
-        
-        reference_style = None
-        if reference_video_path and os.path.exists(reference_video_path):
-            print(f"PROGRESS:35")
-            print(f"Analyzing reference video: {reference_video_path}")
-            reference_style = extract_video_style(reference_video_path)
-            if reference_style:
-                print(f"PROGRESS:45")
-                print("Successfully extracted reference style characteristics")
-            else:
-                print("Failed to extract reference style, falling back to template")
-        
-        print(f"PROGRESS:50")
-        if reference_style:
-            print(f"Applying reference-based style transfer...")
-            video_filters = apply_reference_style_filters(reference_style, options)
-        else:
-            print(f"Applying {style_template} template style transfer...")
-            video_filters = apply_template_style_filters(style_template, options)
-        
-        # Add comprehensive audio processing
-        audio_filters = []
-        if options.get('audioNormalization', True):
-            audio_filters.append("loudnorm=I=-16:TP=-1.5:LRA=11")
-        
-        print(f"PROGRESS:60")
-        print(f"Processing video with style filters...")
-        
-        # Build and execute FFmpeg command
-        ffmpeg_cmd = build_ffmpeg_command(user_video_path, output_path, video_filters, audio_filters)
-        
-        print(f"Running ffmpeg command: {' '.join(ffmpeg_cmd)}")
-        
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
-        
-        print(f"PROGRESS:90")
-        print(f"FFmpeg processing completed successfully")
-        
-        print(f"PROGRESS:95")
-        print(f"Calculating metrics...")
-        
-        # Calculate processing time and metrics
-        end_time = time.time()
-        processing_time = end_time - start_time
-        
-        metrics = calculate_metrics(user_video_path, output_path, processing_time, colors_analyzed)
-        
-        print(f"PROGRESS:100")
-        print(f"Video processing completed successfully")
-        print(f"METRICS:{json.dumps(metrics)}")
-        
-    except subprocess.CalledProcessError as e:
-        print(f"FFmpeg error: {e}")
-        print(f"FFmpeg stderr: {e.stderr}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Processing error: {e}")
-        sys.exit(1)
+from stylesync.cli import main
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
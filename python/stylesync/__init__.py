@@ -0,0 +1,18 @@
+"""
+StyleSync video style transfer
+The pipeline, its caches and the worker, batch and benchmark runners. The
+public API re-exported here is the one in pipeline.py:
+
+    analyze(reference_video_path, options)      -> style profile
+    build_graph(user_video_path, ...)           -> ffmpeg video filter chain
+    render(user_video_path, output_path, ...)   -> job metrics
+    measure(output_path, reference_video_path)  -> style match score
+
+Each command-line entry point is a main() here (cli, worker, batch and
+benchmark), wrapped by a thin script next to the package and runnable with
+python -m stylesync.<module>.
+"""
+
+from .pipeline import analyze, build_graph, render, measure
+
+__all__ = ['analyze', 'build_graph', 'render', 'measure']
@@ -0,0 +1,197 @@
+"""
+Asyncio job execution core
+Runs full renders on an event loop instead of a thread per job: ffprobe and
+the ffmpeg encode are asyncio subprocesses whose progress is read without
+blocking, so one worker process can supervise dozens of concurrent encodes.
+A semaphore bounds how many jobs run at once and every job has a timeout,
+after which its ffmpeg is stopped and the partial output removed.
+
+Reference analysis, loudness measurement and scoring keep their blocking
+implementations (they are cached per content and mostly hit) and run on the
+loop's default executor. Their ffmpeg passes are tracked in the job's
+cancellation scope, so a timeout or cancel stops them along with the encode
+instead of leaving them running in the executor's threads. Previews, multi-output, streaming and segmented or
+checkpointed jobs still go through the blocking pipeline and the threaded
+worker.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from .cancellation import remove_partial, job_scope, cancel_job
+from .cache import render_cache, staged_output
+from .encoder import resolve_encoder_profile, audio_copyable
+from .ffmpeg_progress import run_ffmpeg_async, media_duration, progress_reporter
+from .audio import reusable_audio
+from .downscale import downscale_filters
+from .pipeline import (
+    analyze_reference,
+    build_style_filters,
+    job_audio_filters,
+    build_ffmpeg_command,
+    render_cache_key,
+    frame_count,
+    frame_pixel_count,
+    measure_style_match,
+    render_metrics,
+)
+from .probe import probe_media_async
+from . import resources
+from .streaming import streaming_requested
+from . import tracing
+
+# Jobs run concurrently by one AsyncJobRunner
+ASYNC_JOB_LIMIT = int(os.environ.get('ASYNC_JOB_LIMIT', 16))
+
+# Default per-job timeout in seconds (0 for none); options['timeout'] overrides it
+JOB_TIMEOUT_SECONDS = float(os.environ.get('JOB_TIMEOUT_SECONDS', 0))
+
+# Options that select a mode the async core does not run
+SYNC_ONLY_OPTIONS = ('preview', 'outputs', 'segments', 'checkpoint')
+
+class JobTimeout(Exception):
+    """A job ran past its timeout and was stopped"""
+
+def check_async_job(user_video_path, output_path, options):
+    """Raise ValueError for a job that needs the blocking pipeline"""
+    modes = [option for option in SYNC_ONLY_OPTIONS if options.get(option)]
+    if streaming_requested(user_video_path, output_path, options):
+        modes.append('stream')
+    if modes:
+        raise ValueError(f"Not supported by the async runner: {', '.join(modes)}")
+
+async def encode_async(user_video_path, output_path, video_info, video_filters, audio_filters, options, emit=print):
+    """encode_video on the event loop; returns the render cache status"""
+    profile = resolve_encoder_profile(options)
+    emit(f"Using {profile['name']} encoder profile")
+
+    audio_source = reusable_audio(options, emit)
+    if audio_source:
+        emit(f"Reusing normalized audio from {audio_source}")
+
+    key = None
+    if options.get('renderCache', True):
+        key = render_cache_key(user_video_path, output_path, video_filters, audio_filters, profile, audio_source, 0)
+    if key and render_cache().fetch(key, output_path):
+        emit(f"Render cache hit, reusing previous output")
+        return 'hit'
+
+    with staged_output(output_path) as staged_path:
+        ffmpeg_cmd = build_ffmpeg_command(
+            user_video_path, staged_path, video_filters, audio_filters,
+            profile, copy_audio=audio_copyable(video_info), audio_source=audio_source
+        )
+        emit(f"Running ffmpeg command: {' '.join(ffmpeg_cmd)}")
+        await run_ffmpeg_async(ffmpeg_cmd, media_duration(video_info), progress_reporter(emit, 60, 90))
+
+    if key:
+        render_cache().store(key, output_path)
+        return 'miss'
+    return None
+
+async def render_async(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit=print):
+    """Full render of one job on the event loop, reporting the same PROGRESS/METRICS lines as render_job"""
+    check_async_job(user_video_path, output_path, options)
+
+    start_time = time.time()
+    policy = resources.resolve_resource_policy(options)
+
+    emit(f"PROGRESS:5")
+    emit(f"Starting video processing for job {job_id}")
+
+    # Each job is its own task, so the policy and trace stay with it
+    with resources.activate(policy), tracing.activate(tracing.Trace(job_id)) as trace:
+        emit(f"PROGRESS:15")
+        emit(f"Analyzing input video: {user_video_path}")
+
+        with tracing.span('probe'):
+            video_info = await probe_media_async(user_video_path)
+        colors_analyzed = frame_pixel_count(video_info)
+
+        emit(f"PROGRESS:25")
+        emit(f"Preparing style filters...")
+
+        reference_style = await asyncio.to_thread(analyze_reference, reference_video_path, options, emit)
+        video_filters = await asyncio.to_thread(
+            build_style_filters, reference_style, style_template, options, emit, user_video_path
+        )
+        video_filters = downscale_filters(video_filters, video_info, options, emit)
+
+        emit(f"Measuring audio loudness...")
+        with tracing.span('audio'):
+            audio_filters = await asyncio.to_thread(job_audio_filters, user_video_path, video_info, options, emit)
+
+        emit(f"PROGRESS:60")
+        emit(f"Processing video with style filters...")
+
+        with tracing.span('encode') as encode_span:
+            render_cache_status = await encode_async(
+                user_video_path, output_path, video_info, video_filters, audio_filters, options, emit
+            )
+
+        emit(f"PROGRESS:90")
+        emit(f"FFmpeg processing completed successfully")
+
+        with tracing.span('post_probe'):
+            output_frames = frame_count(await probe_media_async(output_path))
+        if output_frames:
+            encode_span['frames'] = output_frames
+        encode_span['cached'] = render_cache_status == 'hit'
+
+        emit(f"PROGRESS:95")
+        emit(f"Calculating metrics...")
+
+        with tracing.span('score'):
+            style_match = await asyncio.to_thread(
+                measure_style_match, output_path, reference_style, options, emit
+            )
+
+        metrics = render_metrics(
+            user_video_path, output_path, time.time() - start_time, colors_analyzed, style_match,
+            options, render_cache_status, trace
+        )
+
+    emit(f"PROGRESS:100")
+    emit(f"Video processing completed successfully")
+    emit(f"TRACE:{json.dumps(metrics['trace'])}")
+    emit(f"METRICS:{json.dumps(metrics)}")
+
+    return metrics
+
+class AsyncJobRunner:
+    """Runs render_async jobs, at most `limit` at a time, each bounded by its timeout"""
+
+    def __init__(self, limit=ASYNC_JOB_LIMIT, timeout=JOB_TIMEOUT_SECONDS):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(limit)
+
+    def job_timeout(self, options):
+        """Seconds a job may run, or None for no limit"""
+        return float(options.get('timeout') or self.timeout or 0) or None
+
+    async def run(self, user_video_path, reference_video_path, style_template, options, output_path, job_id, emit=print):
+        """Wait for a slot, then render; a timeout or cancel stops the job's ffmpeg processes and removes the partial output"""
+        timeout = self.job_timeout(options)
+        async with self._slots:
+            # The render task and its to_thread stages inherit the scope, so every process they start is tracked
+            with job_scope() as scope:
+                try:
+                    return await asyncio.wait_for(
+                        render_async(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit),
+                        timeout
+                    )
+                except asyncio.TimeoutError:
+                    cancel_job(scope)
+                    emit(f"Job {job_id} timed out, removing partial output")
+                    remove_partial(output_path)
+                    raise JobTimeout(f"Job timed out after {timeout:g}s")
+                except asyncio.CancelledError:
+                    cancel_job(scope)
+                    emit(f"Job {job_id} cancelled, removing partial output")
+                    remove_partial(output_path)
+                    raise
@@ -0,0 +1,113 @@
+"""
+Two-pass loudness normalization
+The first pass decodes only the audio track through loudnorm in analysis mode
+and is cached per input content hash, so re-renders of the same clip skip it.
+The encode then applies loudnorm in linear mode with the measured values, which
+normalizes the whole track with one gain instead of single-pass dynamic
+compression.
+"""
+
+import json
+import subprocess
+
+from .cache import fingerprint, loudness_cache
+from .ffmpeg_progress import run_capture
+from .probe import probe_media, has_audio
+
+# Integrated loudness (LUFS), true peak (dBTP) and loudness range targets
+LOUDNORM_TARGET = {'I': -16, 'TP': -1.5, 'LRA': 11}
+
+# Measured fields the second pass needs, as named in loudnorm's JSON summary
+MEASURED_FIELDS = ('input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset')
+
+def target_args():
+    return ':'.join(f"{key}={value}" for key, value in LOUDNORM_TARGET.items())
+
+def single_pass_filter():
+    """Dynamic single-pass loudnorm, used when no measurement is available"""
+    return f"loudnorm={target_args()}"
+
+def measure_loudness(path):
+    """Run loudnorm's analysis pass over the first audio track and return its measurements"""
+    cmd = [
+        'ffmpeg', '-hide_banner', '-nostats', '-vn', '-sn', '-dn', '-i', path,
+        '-map', '0:a:0', '-af', f"{single_pass_filter()}:print_format=json",
+        '-f', 'null', '-'
+    ]
+    result = run_capture(cmd, text=True)
+
+    # The JSON summary is the last brace-delimited block on stderr
+    start = result.stderr.rfind('{')
+    end = result.stderr.rfind('}')
+    if start < 0 or end < start:
+        raise ValueError("loudnorm did not report measurements")
+    summary = json.loads(result.stderr[start:end + 1])
+    return {field: summary[field] for field in MEASURED_FIELDS}
+
+def get_loudness(path):
+    """Return loudness measurements for path, reusing a cached first pass of identical content"""
+    cache = loudness_cache()
+    key = fingerprint(path, 'loudnorm', LOUDNORM_TARGET)
+
+    measured = cache.get(key)
+    if measured is None:
+        measured = measure_loudness(path)
+        cache.put(key, measured)
+    return measured
+
+def linear_filter(measured):
+    """Second-pass loudnorm applying one linear gain computed from the measurements"""
+    try:
+        values = {field: float(measured[field]) for field in MEASURED_FIELDS}
+    except (KeyError, TypeError, ValueError):
+        return None
+    # Silent tracks measure -inf; linear mode cannot normalize those
+    if any(value != value or abs(value) == float('inf') for value in values.values()):
+        return None
+
+    return (
+        f"loudnorm={target_args()}"
+        f":measured_I={values['input_i']}:measured_TP={values['input_tp']}"
+        f":measured_LRA={values['input_lra']}:measured_thresh={values['input_thresh']}"
+        f":offset={values['target_offset']}:linear=true"
+    )
+
+def loudnorm_filter(path, emit=print):
+    """
+    Loudness filter for one input: linear two-pass when the measurement succeeds,
+    otherwise the previous single-pass filter.
+    """
+    try:
+        measured = get_loudness(path)
+    except (OSError, ValueError, KeyError, subprocess.CalledProcessError) as e:
+        emit(f"Loudness measurement failed, using single-pass loudnorm: {e}")
+        return single_pass_filter()
+
+    return linear_filter(measured) or single_pass_filter()
+
+def build_audio_filters(options, input_path=None, emit=print):
+    """Audio filter chain for a job; two-pass loudnorm needs the input path"""
+    audio_filters = []
+    if options.get('audioNormalization', True):
+        if input_path and options.get('loudnormPasses', 2) == 2:
+            audio_filters.append(loudnorm_filter(input_path, emit))
+        else:
+            audio_filters.append(single_pass_filter())
+    return audio_filters
+
+def reusable_audio(options, emit=print):
+    """
+    Path of a previous render whose already-normalized audio can be stream-copied
+    (options['reuseAudioFrom']), or None. Lets re-renders that only change the
+    video style skip audio decoding, filtering and encoding entirely.
+    """
+    source = options.get('reuseAudioFrom')
+    if not source:
+        return None
+    try:
+        if has_audio(probe_media(source)):
+            return source
+        emit(f"No audio track in {source}, re-encoding audio")
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        emit(f"Cannot reuse audio from {source}: {e}")
+    return None
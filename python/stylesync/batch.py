@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Batch style transfer
+Grades many clips against one reference or template in a single process: the
+reference is analyzed once, then the encodes run with bounded concurrency. One
+result line per item is appended to the results JSONL file as soon as that
+item finishes.
+
+Template jobs share one filter graph. Reference jobs grade relative to each
+input unless options['relativeGrading'] is false (it defaults to true), so
+each item's keyframes are scanned and its graph rebuilt from the reference
+profile analyzed once up front; with relativeGrading off the graph is built once. If the
+reference cannot be analyzed the items fall back to --template, and an item
+with no filter chain at all is reported as failed.
+
+Manifest lines:
+    {"id": "clip-1", "input": "in/clip1.mp4", "output": "out/clip1.mp4"}
+
+Result lines:
+    {"id": "clip-1", "input": "...", "output": "...", "status": "completed", "metrics": {...}}
+    {"id": "clip-2", "input": "...", "output": "...", "status": "failed", "error": "..."}
+"""
+
+import sys
+import json
+import os
+import argparse
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .pipeline import (
+    get_video_info,
+    analyze_reference,
+    build_style_filters,
+    job_audio_filters,
+    encode_video,
+    calculate_metrics,
+    frame_pixel_count,
+    measure_style_match,
+    input_dependent_grade,
+)
+from .cancellation import JobCancelled, CANCELLED_EXIT_CODE, install_signal_handlers, remove_partial
+from .downscale import downscale_filters
+from . import resources
+from . import tracing
+from .worker import EventStream, DEFAULT_SLOTS
+
+def read_manifest(manifest_path):
+    """Load and validate manifest items, assigning ids to items without one"""
+    items = []
+    with open(manifest_path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not item.get('input') or not item.get('output'):
+                raise ValueError(f"Manifest line {line_number}: 'input' and 'output' are required")
+            item.setdefault('id', str(line_number))
+            items.append(item)
+    return items
+
+def run_item(item, reference_style, style_template, video_filters, options, events):
+    """Encode one manifest item with the shared filter graph and return its result record"""
+    emit = events.emitter(item['id'])
+    result = {'id': item['id'], 'input': item['input'], 'output': item['output']}
+    start_time = time.time()
+
+    try:
+        # Batch items default to the batch priority class so interactive jobs keep their latency
+        policy = resources.resolve_resource_policy(options, 'batch')
+        with tracing.activate(tracing.Trace(item['id'])) as trace, resources.activate(policy):
+            with tracing.span('probe'):
+                video_info = get_video_info(item['input'])
+            if not video_info:
+                raise Exception("Failed to analyze video")
+
+            output_dir = os.path.dirname(os.path.abspath(item['output']))
+            os.makedirs(output_dir, exist_ok=True)
+
+            # Relative and scene-adaptive grades depend on each input; the reference analysis stays cached
+            if input_dependent_grade(reference_style, options):
+                video_filters = build_style_filters(
+                    reference_style, style_template, options,
+                    lambda line: None if line.startswith('PROGRESS:') else emit(line), item['input']
+                )
+            if not video_filters:
+                raise Exception("No style filter chain could be built (reference analysis failed and no usable template)")
+            # The shared graph is sized and retuned for each input's own resolution
+            video_filters = downscale_filters(video_filters, video_info, options, emit)
+
+            # Loudness is measured per input (and cached by content), unlike the shared video graph
+            with tracing.span('audio'):
+                audio_filters = job_audio_filters(item['input'], video_info, options, emit)
+            with tracing.span('encode'):
+                render_cache_status = encode_video(
+                    item['input'], item['output'], video_info, video_filters, audio_filters, options, emit
+                )
+
+            with tracing.span('score'):
+                style_match = measure_style_match(item['output'], reference_style, options, emit)
+
+        result['status'] = 'completed'
+        result['metrics'] = calculate_metrics(
+            item['input'], item['output'], time.time() - start_time, frame_pixel_count(video_info), style_match
+        )
+        result['metrics']['render_cache'] = render_cache_status
+        result['metrics']['resource_policy'] = policy
+        result['metrics']['trace'] = trace.summary()
+        emit(f"TRACE:{json.dumps(result['metrics']['trace'])}")
+        emit(f"METRICS:{json.dumps(result['metrics'])}")
+    except JobCancelled as e:
+        result['status'] = 'cancelled'
+        result['error'] = str(e)
+        remove_partial(item['output'])
+        emit(f"ERROR:{e}")
+    except subprocess.CalledProcessError as e:
+        result['status'] = 'failed'
+        result['error'] = f"FFmpeg error: {e}: {e.stderr}"
+        emit(f"ERROR:FFmpeg error: {e}")
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+        emit(f"ERROR:Processing error: {e}")
+
+    return result
+
+def run_batch(items, reference_video_path, style_template, options, results_path, concurrency, events):
+    """Analyze once, encode every item, and stream result records to results_path"""
+    # Batch PROGRESS counts finished items, so analysis checkpoints are not forwarded
+    log = events.emitter('batch')
+    analysis_log = lambda line: None if line.startswith('PROGRESS:') else log(line)
+    reference_style = analyze_reference(reference_video_path, options, analysis_log)
+    video_filters = build_style_filters(reference_style, style_template, options, analysis_log)
+
+    write_lock = threading.Lock()
+    failed = 0
+
+    with open(results_path, 'a') as results, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_item, item, reference_style, style_template, video_filters, options, events) for item in items]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            if result['status'] != 'completed':
+                failed += 1
+            with write_lock:
+                results.write(json.dumps(result) + '\n')
+                results.flush()
+            events.send('batch', f"PROGRESS:{int(done / len(futures) * 100)}")
+
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch style transfer from a JSONL manifest")
+    parser.add_argument('manifest', help="JSONL manifest of {id, input, output} items")
+    parser.add_argument('results', help="JSONL file that per-item results are appended to")
+    parser.add_argument('--reference', help="Reference video shared by every item")
+    parser.add_argument('--template', help="Style template used when no reference is given")
+    parser.add_argument('--options', default='{}', help="Options JSON shared by every item")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_SLOTS, help="Maximum concurrent encodes")
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    try:
+        options = json.loads(args.options)
+    except json.JSONDecodeError:
+        print("Error: Invalid options JSON")
+        sys.exit(1)
+
+    try:
+        items = read_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error reading manifest: {e}")
+        sys.exit(1)
+
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    # SIGTERM stops the running encodes and removes their partial outputs
+    install_signal_handlers()
+
+    events = EventStream(write)
+    events.send('batch', f"Processing {len(items)} items with concurrency {args.concurrency}")
+    try:
+        failed = run_batch(items, args.reference, args.template, options, args.results, args.concurrency, events)
+    except JobCancelled as e:
+        events.send('batch', f"ERROR:{e}")
+        sys.exit(CANCELLED_EXIT_CODE)
+    events.send('batch', f"Completed {len(items) - failed}/{len(items)} items")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the style transfer pipeline
+Each subcommand times an optimized path against the baseline it replaces and
+prints the results as JSON.
+
+    python benchmark.py segmented <input_video> [--segments 8] [--workers 8]
+    python benchmark.py lut <input_video>
+    python benchmark.py downscale <input_video> [--height 1080] [--fps 30]
+    python benchmark.py suite [--resolutions 640x360,1920x1080] [--durations 5,30] [--compare previous.json]
+"""
+
+import sys
+import json
+import os
+import argparse
+import platform
+import re
+import subprocess
+import tempfile
+import time
+
+from .audio import single_pass_filter, measure_loudness, linear_filter
+from .downscale import downscale_filters
+from .encoder import resolve_encoder_profile, video_codec_args, audio_codec_args
+from .ffmpeg_progress import run_ffmpeg, media_duration
+from .lut import bake_color_filters, split_color_prefix
+from .probe import clear_probe_cache
+from .segmented import encode_segmented
+from .style_analysis import analyze_style, numpy_available, INPUT_SCAN_FRAMES
+from . import tracing
+from .pipeline import (
+    get_video_info,
+    extract_video_style,
+    apply_reference_style_filters,
+    apply_template_style_filters,
+    build_ffmpeg_command,
+    encode_styled,
+    calculate_metrics,
+    frame_pixel_count,
+    measure_style_match,
+)
+
+TEMPLATES = ('cinematic', 'vibrant', 'minimal', 'vintage')
+
+AUDIO_FILTERS = [single_pass_filter()]
+
+def timed(fn, *args, **kwargs):
+    """Run fn and return (result, wall seconds)"""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def bench_segmented(args):
+    """Single-process encode vs keyframe-segmented parallel encode"""
+    video_info = get_video_info(args.input)
+    if not video_info:
+        raise SystemExit(f"Could not probe {args.input}")
+    duration = media_duration(video_info)
+    has_audio = any(s['codec_type'] == 'audio' for s in video_info['streams'])
+    video_filters = apply_template_style_filters(args.template, {})
+    profile = resolve_encoder_profile({'encoderProfile': args.profile})
+
+    with tempfile.TemporaryDirectory(prefix='stylesync_bench_') as work_dir:
+        single_path = os.path.join(work_dir, 'single.mp4')
+        chunked_path = os.path.join(work_dir, 'chunked.mp4')
+
+        cmd = build_ffmpeg_command(args.input, single_path, video_filters, AUDIO_FILTERS if has_audio else [], profile)
+        _, single_time = timed(run_ffmpeg, cmd, duration)
+
+        (used, _), chunked_time = timed(
+            encode_segmented, args.input, chunked_path, video_filters, AUDIO_FILTERS,
+            video_codec_args(profile), audio_codec_args(profile), duration,
+            has_audio=has_audio, segments=args.segments, workers=args.workers
+        )
+
+        return {
+            'benchmark': 'segmented',
+            'input': args.input,
+            'duration': duration,
+            'template': args.template,
+            'encoder_profile': profile['name'],
+            'segments': used,
+            'workers': args.workers or os.cpu_count(),
+            'single_process_seconds': round(single_time, 3),
+            'segmented_seconds': round(chunked_time, 3),
+            'speedup': round(single_time / chunked_time, 2) if chunked_time else None,
+            'single_output_bytes': os.path.getsize(single_path),
+            'segmented_output_bytes': os.path.getsize(chunked_path)
+        }
+
+def filter_cost(input_path, video_filters, duration):
+    """Decode + filter only (no encode); returns (seconds, frames)"""
+    cmd = ['ffmpeg', '-i', input_path, '-an', '-vf', ','.join(video_filters) or 'null', '-f', 'null', '-']
+    result, seconds = timed(run_ffmpeg, cmd, duration)
+    return seconds, (result or {}).get('frame') or 0
+
+def rgb_psnr(input_path, filters_a, filters_b):
+    """Average PSNR between two filter chains, compared in displayed RGB"""
+    graph = (
+        f"[0:v]split[a][b];"
+        f"[a]{','.join(filters_a)},format=yuv420p,format=gbrp[x];"
+        f"[b]{','.join(filters_b)},format=yuv420p,format=gbrp[y];"
+        f"[x][y]psnr"
+    )
+    cmd = ['ffmpeg', '-i', input_path, '-filter_complex', graph, '-f', 'null', '-']
+    result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, text=True, check=True)
+    match = re.findall(r'average:([\d.]+|inf)', result.stderr)
+    return float(match[-1]) if match else None
+
+def bench_lut(args):
+    """Per-frame cost of each template's filter chain vs its baked 3D LUT equivalent"""
+    duration = media_duration(get_video_info(args.input))
+    results = []
+
+    for template in TEMPLATES:
+        video_filters = apply_template_style_filters(template, {})
+        baked_filters = bake_color_filters(video_filters)
+        color_filters, _ = split_color_prefix(video_filters)
+
+        chain_time, frames = filter_cost(args.input, video_filters, duration)
+        baked_time, _ = filter_cost(args.input, baked_filters, duration)
+        frames = max(1, frames)
+
+        results.append({
+            'template': template,
+            'frames': frames,
+            'chain_ms_per_frame': round(chain_time / frames * 1000, 3),
+            'lut_ms_per_frame': round(baked_time / frames * 1000, 3),
+            'speedup': round(chain_time / baked_time, 2) if baked_time else None,
+            # Color-only part compared on its own so grain noise does not dominate
+            'rgb_psnr_db': rgb_psnr(args.input, color_filters, baked_filters[:1])
+        })
+
+    return {'benchmark': 'lut', 'input': args.input, 'results': results}
+
+def without_grain(video_filters):
+    return [spec for spec in video_filters if not spec.startswith('noise')]
+
+def bench_downscale(args):
+    """Per-frame cost of filtering at the source size then scaling vs scaling first with retuned filters"""
+    video_info = get_video_info(args.input)
+    duration = media_duration(video_info)
+    options = {'targetHeight': args.height, 'targetFps': args.fps}
+    results = []
+
+    for template in TEMPLATES:
+        video_filters = apply_template_style_filters(template, {})
+        early = downscale_filters(video_filters, video_info, options, emit=lambda line: None)
+        # Baseline: the chain at the source size, then the same conversion. The pinned 4:2:0
+        # matches the scaled side, where the comparison's own format conversion follows the grain
+        late = video_filters + ['format=yuv420p'] + early[:len(early) - len(video_filters)]
+
+        late_time, frames = filter_cost(args.input, late, duration)
+        early_time, _ = filter_cost(args.input, early, duration)
+        frames = max(1, frames)
+
+        result = {
+            'template': template,
+            'frames': frames,
+            'filter_then_scale_ms_per_frame': round(late_time / frames * 1000, 3),
+            'scale_then_filter_ms_per_frame': round(early_time / frames * 1000, 3),
+            'speedup': round(late_time / early_time, 2) if early_time else None,
+            # Grain is random, so the look is compared without it
+            'rgb_psnr_db': rgb_psnr(args.input, without_grain(late), without_grain(early)),
+        }
+        if without_grain(video_filters) != video_filters:
+            # Grain strength as PSNR against the grain-free chain; retuned grain should land close
+            result['grain_psnr_db'] = {
+                'filter_then_scale': rgb_psnr(args.input, without_grain(late), late),
+                'scale_then_filter': rgb_psnr(args.input, without_grain(early), early),
+            }
+        results.append(result)
+
+    return {'benchmark': 'downscale', 'input': args.input, 'target': options, 'results': results}
+
+SUITE_RESOLUTIONS = '640x360,1280x720,1920x1080'
+SUITE_DURATIONS = '5,20'
+
+# Stages timed for every suite run, in pipeline order
+SUITE_STAGES = ('probe', 'analyze', 'input_scan', 'filter_build', 'audio', 'encode', 'metrics')
+
+def synthesize_clip(path, width, height, duration, source='testsrc2', frequency=440):
+    """Render a synthetic H.264/AAC test clip with ffmpeg's lavfi sources"""
+    cmd = [
+        'ffmpeg', '-v', 'error',
+        '-f', 'lavfi', '-i', f"{source}=size={width}x{height}:rate=30:duration={duration}",
+        '-f', 'lavfi', '-i', f"sine=frequency={frequency}:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest', '-y', path
+    ]
+    subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, check=True)
+    return path
+
+def log(line):
+    # stdout carries the JSON report
+    print(line, file=sys.stderr)
+
+def suite_metrics(input_path, output_path, style_profile, options, started, video_info):
+    """Style scoring plus the METRICS fields, the work a render does after its encode"""
+    style_match = measure_style_match(output_path, style_profile, options, log)
+    return calculate_metrics(
+        input_path, output_path, time.perf_counter() - started, frame_pixel_count(video_info), style_match
+    )
+
+def run_suite_job(input_path, output_path, reference_path, template, profile_name):
+    """
+    Run one job stage by stage with the uncached code paths, timing each stage.
+    The in-process probe memo is cleared first and the style and loudness
+    analyses bypass their on-disk caches, so every run measures the work
+    itself rather than cache hits from an earlier run.
+    """
+    stages = {stage: None for stage in SUITE_STAGES}
+    options = {'encoderProfile': profile_name}
+    profile = resolve_encoder_profile(options)
+    clear_probe_cache()
+    started = time.perf_counter()
+
+    # The trace collects each ffmpeg/ffprobe process's own rusage (wait4), so CPU and peak RSS are this job's
+    with tracing.activate(tracing.Trace()) as trace, trace.span('job'):
+        video_info, stages['probe'] = timed(get_video_info, input_path)
+
+        style_profile = None
+        if reference_path:
+            style_profile, stages['analyze'] = timed(extract_video_style, reference_path, emit=log)
+            if not style_profile:
+                raise SystemExit(f"Could not analyze reference {reference_path}")
+            input_profile = None
+            if numpy_available():
+                input_profile, stages['input_scan'] = timed(
+                    analyze_style, input_path, INPUT_SCAN_FRAMES, keyframes_only=True
+                )
+            video_filters, stages['filter_build'] = timed(
+                apply_reference_style_filters, style_profile, options, input_profile, log
+            )
+        else:
+            video_filters, stages['filter_build'] = timed(apply_template_style_filters, template, options)
+
+        measured, stages['audio'] = timed(measure_loudness, input_path)
+        audio_filters = [linear_filter(measured) or single_pass_filter()]
+
+        result, stages['encode'] = timed(
+            encode_styled, input_path, output_path, video_info, video_filters, audio_filters, options,
+            profile, None, 0, lambda line: None
+        )
+
+        _, stages['metrics'] = timed(
+            suite_metrics, input_path, output_path, style_profile, options, started, video_info
+        )
+
+    wall = time.perf_counter() - started
+    summary = trace.summary()
+    cpu_seconds = summary['ffmpeg_cpu_seconds']
+    frames = (result or {}).get('frame') or 0
+
+    return {
+        'stages': {stage: round(seconds, 3) for stage, seconds in stages.items() if seconds is not None},
+        'wall_seconds': round(wall, 3),
+        'encode_fps': round(frames / stages['encode'], 2) if stages['encode'] else None,
+        'cpu_seconds': round(cpu_seconds, 3),
+        # Share of all cores kept busy by ffmpeg/ffprobe over the job
+        'cpu_utilization': round(cpu_seconds / wall / (os.cpu_count() or 1), 3) if wall else None,
+        # Largest single ffmpeg/ffprobe process of this job
+        'peak_rss_mb': summary['ffmpeg_peak_rss_mb'],
+        'output_bytes': os.path.getsize(output_path)
+    }
+
+def run_key(run):
+    return (run['resolution'], run['duration'], run['style'])
+
+def compare_runs(runs, previous_path):
+    """Ratio of each stage time against a previous suite report (above 1.0 is slower)"""
+    with open(previous_path, 'r') as f:
+        previous = {run_key(run): run for run in json.load(f).get('runs', [])}
+
+    comparison = []
+    for run in runs:
+        before = previous.get(run_key(run))
+        if not before:
+            continue
+        ratios = {
+            stage: round(seconds / before['stages'][stage], 3)
+            for stage, seconds in run['stages'].items()
+            if before['stages'].get(stage)
+        }
+        comparison.append({
+            'resolution': run['resolution'],
+            'duration': run['duration'],
+            'style': run['style'],
+            'wall_ratio': round(run['wall_seconds'] / before['wall_seconds'], 3) if before['wall_seconds'] else None,
+            'stage_ratios': ratios
+        })
+    return comparison
+
+def ffmpeg_version():
+    result = subprocess.run(['ffmpeg', '-version'], stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    return result.stdout.split('\n', 1)[0]
+
+def bench_suite(args):
+    """Every template plus the reference path over synthesized clips at several sizes"""
+    resolutions = [tuple(int(v) for v in r.lower().split('x')) for r in args.resolutions.split(',')]
+    durations = [float(d) for d in args.durations.split(',')]
+    styles = list(TEMPLATES) + ['reference']
+    runs = []
+
+    with tempfile.TemporaryDirectory(prefix='stylesync_suite_') as work_dir:
+        # Reference clip with a different pattern and pitch than the inputs
+        reference_path = synthesize_clip(
+            os.path.join(work_dir, 'reference.mp4'), 640, 360, 5, source='smptehdbars', frequency=220
+        )
+
+        for width, height in sorted(resolutions, key=lambda r: r[0] * r[1]):
+            for duration in durations:
+                input_path = synthesize_clip(os.path.join(work_dir, f"input_{width}x{height}_{duration:g}.mp4"),
+                                             width, height, duration)
+                for style in styles:
+                    output_path = os.path.join(work_dir, f"output_{style}.mp4")
+                    run = run_suite_job(
+                        input_path, output_path,
+                        reference_path if style == 'reference' else None,
+                        None if style == 'reference' else style,
+                        args.profile
+                    )
+                    runs.append(dict(resolution=f"{width}x{height}", duration=duration, style=style, **run))
+                    print(f"{width}x{height} {duration:g}s {style}: {run['wall_seconds']}s", file=sys.stderr)
+
+    report = {
+        'benchmark': 'suite',
+        'host': {
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'ffmpeg': ffmpeg_version()
+        },
+        'encoder_profile': args.profile,
+        'runs': runs
+    }
+    if args.compare:
+        report['comparison'] = compare_runs(runs, args.compare)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Style transfer pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    segmented = subparsers.add_parser('segmented', help="single-process vs segment-parallel encoding")
+    segmented.add_argument('input', help="input video to encode")
+    segmented.add_argument('--template', default='cinematic')
+    segmented.add_argument('--segments', type=int, default=os.cpu_count() or 4)
+    segmented.add_argument('--workers', type=int, default=None)
+    segmented.add_argument('--profile', default='standard', help="encoder profile")
+    segmented.set_defaults(run=bench_segmented)
+
+    lut = subparsers.add_parser('lut', help="filter chain vs baked 3D LUT per-frame cost")
+    lut.add_argument('input', help="input video to filter")
+    lut.set_defaults(run=bench_lut)
+
+    downscale = subparsers.add_parser('downscale', help="filter-then-scale vs scale-then-filter per-frame cost")
+    downscale.add_argument('input', help="input video above the target size")
+    downscale.add_argument('--height', type=int, default=1080, help="target height")
+    downscale.add_argument('--fps', type=float, default=None, help="target frame rate")
+    downscale.set_defaults(run=bench_downscale)
+
+    suite = subparsers.add_parser('suite', help="per-stage timings of every style over synthesized clips")
+    suite.add_argument('--resolutions', default=SUITE_RESOLUTIONS, help="comma-separated WxH list")
+    suite.add_argument('--durations', default=SUITE_DURATIONS, help="comma-separated clip lengths in seconds")
+    suite.add_argument('--profile', default='standard', help="encoder profile")
+    suite.add_argument('--compare', help="previous suite report to compare stage times against")
+    suite.add_argument('--output', help="also write the report to this file")
+    suite.set_defaults(run=bench_suite)
+
+    args = parser.parse_args()
+    print(json.dumps(args.run(args), indent=2))
+
+if __name__ == "__main__":
+    main()
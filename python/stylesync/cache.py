@@ -0,0 +1,296 @@
+"""
+On-disk caches keyed by content fingerprints
+Reference videos are reused heavily, so analysis results are stored as small
+JSON files named by a fast content hash and evicted least-recently-used once
+the cache grows past its size cap. Finished renders are kept the same way as
+whole files, hardlinked in and out. That is safe because every encode writes
+to a staged temp path and moves it into place with os.replace, so an output
+that shares an inode with a cache entry is only ever replaced, never
+rewritten.
+"""
+
+import os
+import json
+import time
+import sys
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Root directory for every cache (one subdirectory per cache)
+CACHE_ROOT = Path(os.environ.get('STYLESYNC_CACHE_DIR', Path.home() / '.cache' / 'stylesync'))
+
+# Size cap for cached reference style profiles
+STYLE_CACHE_MAX_BYTES = int(float(os.environ.get('STYLE_CACHE_MAX_MB', 64)) * 1024 * 1024)
+
+# Size cap for cached loudness measurements
+LOUDNESS_CACHE_MAX_BYTES = int(float(os.environ.get('LOUDNESS_CACHE_MAX_MB', 16)) * 1024 * 1024)
+
+# Size cap for cached scene analyses
+SCENE_CACHE_MAX_BYTES = int(float(os.environ.get('SCENE_CACHE_MAX_MB', 16)) * 1024 * 1024)
+
+# Size and age caps for cached render outputs
+RENDER_CACHE_MAX_BYTES = int(float(os.environ.get('RENDER_CACHE_MAX_MB', 4096)) * 1024 * 1024)
+RENDER_CACHE_MAX_AGE = float(os.environ.get('RENDER_CACHE_MAX_AGE_HOURS', 168)) * 3600
+
+# Number of evenly spaced chunks hashed by fingerprint()
+FINGERPRINT_CHUNKS = 8
+FINGERPRINT_CHUNK_SIZE = 256 * 1024
+
+def fingerprint(path, *params):
+    """
+    Fast content hash of a media file plus any parameters that affect results.
+    Hashes the file size and a handful of evenly spaced chunks rather than the
+    whole file, so multi-gigabyte inputs fingerprint in milliseconds.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+
+    with open(path, 'rb') as f:
+        if size <= FINGERPRINT_CHUNKS * FINGERPRINT_CHUNK_SIZE:
+            digest.update(f.read())
+        else:
+            step = (size - FINGERPRINT_CHUNK_SIZE) // (FINGERPRINT_CHUNKS - 1)
+            for i in range(FINGERPRINT_CHUNKS):
+                f.seek(i * step)
+                digest.update(f.read(FINGERPRINT_CHUNK_SIZE))
+
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def file_identity(path):
+    """
+    Device, inode, size and mtime of a file. Added to a render cache key so a
+    file edited in place never matches an entry made from its old content,
+    even where the sampled fingerprint() chunks are unchanged.
+    """
+    stat = os.stat(path)
+    return [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+@contextmanager
+def staged_output(path):
+    """
+    Yield a temp path next to path for an encode to write, then move the
+    finished file over path with os.replace. The old file is never truncated,
+    so a render cache entry linked to it keeps its content; the temp file is
+    removed if the encode fails or is cancelled.
+    """
+    root, extension = os.path.splitext(path)
+    # Keeps the extension, which ffmpeg uses to pick the muxer
+    tmp_path = f"{root}.{os.getpid()}.{threading.get_ident()}.partial{extension}"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class JsonCache:
+    """Size-capped LRU cache of JSON documents stored one file per key"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(path, None)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store value under key and evict old entries past the size cap"""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.directory / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, self._path(key))
+            self.evict()
+        except OSError as e:
+            print(f"Error writing cache entry: {e}", file=sys.stderr)
+
+    def evict(self):
+        """Remove least-recently-used entries until the cache fits its cap"""
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.directory.glob('*.json'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+class FileCache:
+    """Size- and age-capped LRU cache of whole files, handed out as hardlinks"""
+
+    def __init__(self, directory, max_bytes, max_age):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key, suffix):
+        return self.directory / f"{key}{suffix}"
+
+    def _link(self, source, destination):
+        """
+        Hardlink source at destination through a temp name, so an existing
+        destination is replaced rather than rewritten. Falls back to a copy
+        where the two paths are on different filesystems.
+        """
+        try:
+            # Renaming over a link to the same file would leave the temp name behind
+            if os.path.samefile(source, destination):
+                return
+        except OSError:
+            pass
+        tmp_path = Path(f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, destination)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+
+    def fetch(self, key, destination):
+        """Place the cached file for key at destination; returns False on a miss"""
+        path = self._path(key, Path(destination).suffix)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age:
+                raise FileNotFoundError(path)
+            self._link(path, destination)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, source):
+        """Add a finished file under key and evict old entries past the caps"""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._link(source, self._path(key, Path(source).suffix))
+            self.evict()
+        except OSError as e:
+            print(f"Error writing cache entry: {e}", file=sys.stderr)
+
+    def evict(self):
+        """Remove expired entries, then least-recently-used ones until the cache fits its cap"""
+        with self._lock:
+            now = time.time()
+            entries = []
+            total = 0
+            for path in self.directory.iterdir():
+                if path.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age:
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+def _shared_cache(name, max_bytes):
+    with _shared_caches_lock:
+        if name not in _shared_caches:
+            _shared_caches[name] = JsonCache(CACHE_ROOT / name, max_bytes)
+        return _shared_caches[name]
+
+def style_profile_cache():
+    """Process-wide cache of reference style profiles"""
+    return _shared_cache('styles', STYLE_CACHE_MAX_BYTES)
+
+def input_style_cache():
+    """Process-wide cache of user-video keyframe scans, counted apart from reference profiles"""
+    return _shared_cache('inputs', STYLE_CACHE_MAX_BYTES)
+
+def loudness_cache():
+    """Process-wide cache of first-pass loudnorm measurements"""
+    return _shared_cache('loudness', LOUDNESS_CACHE_MAX_BYTES)
+
+def scene_cache():
+    """Process-wide cache of per-scene input statistics"""
+    return _shared_cache('scenes', SCENE_CACHE_MAX_BYTES)
+
+def render_cache():
+    """Process-wide cache of finished renders"""
+    with _shared_caches_lock:
+        if 'renders' not in _shared_caches:
+            _shared_caches['renders'] = FileCache(CACHE_ROOT / 'renders', RENDER_CACHE_MAX_BYTES, RENDER_CACHE_MAX_AGE)
+        return _shared_caches['renders']
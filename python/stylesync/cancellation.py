@@ -0,0 +1,128 @@
+"""
+Job cancellation
+SIGTERM (and SIGINT) stop a running job instead of letting it encode to the
+end: every live ffmpeg process is asked to quit, no new one is started, and
+the job unwinds with JobCancelled so the caller can remove partial output.
+Checkpointed encodes keep their finished segments for a later resume.
+
+A job scope narrows the same thing to one job among many in a process: the
+async runner stops only a timed-out job's processes, including those its
+worker threads started.
+"""
+
+import contextvars
+import os
+import signal
+import subprocess
+import threading
+from contextlib import contextmanager
+
+# Seconds ffmpeg gets to exit after SIGTERM before it is killed
+STOP_GRACE_SECONDS = 5
+
+# Conventional exit status for a process ended by SIGTERM
+CANCELLED_EXIT_CODE = 128 + signal.SIGTERM
+
+class JobCancelled(Exception):
+    """Raised in the job when it has been asked to stop"""
+
+_cancelled = threading.Event()
+_live_processes = set()
+# Reentrant: the signal handler may run while the main thread holds it
+_lock = threading.RLock()
+
+class JobScope:
+    """Processes started by one job, and whether that job has been stopped"""
+
+    def __init__(self):
+        self.processes = set()
+        self.cancelled = False
+
+# Copied into asyncio tasks and to_thread calls, like the trace and resource policy
+_job_scope = contextvars.ContextVar('stylesync_job_scope', default=None)
+
+@contextmanager
+def job_scope():
+    """Track the processes started in this context so cancel_job can stop them"""
+    scope = JobScope()
+    token = _job_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _job_scope.reset(token)
+
+def _terminate(process):
+    # os.kill rather than Popen.terminate, which polls and could reap the
+    # child out from under the thread waiting on it
+    try:
+        os.kill(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+def register(process):
+    """Track a started ffmpeg process so a cancel can stop it"""
+    scope = _job_scope.get()
+    with _lock:
+        _live_processes.add(process)
+        if scope:
+            scope.processes.add(process)
+    if _cancelled.is_set() or (scope and scope.cancelled):
+        # The cancel arrived while this process was starting
+        _terminate(process)
+
+def unregister(process):
+    scope = _job_scope.get()
+    with _lock:
+        _live_processes.discard(process)
+        if scope:
+            scope.processes.discard(process)
+
+def check():
+    """Raise JobCancelled once a cancel has been requested for the process or this job"""
+    scope = _job_scope.get()
+    if _cancelled.is_set() or (scope and scope.cancelled):
+        raise JobCancelled("Job cancelled")
+
+def stop(process):
+    """Ask ffmpeg to finish (SIGTERM), killing it if it does not exit in time"""
+    process.terminate()
+    try:
+        process.wait(timeout=STOP_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def cancel():
+    """Stop every live ffmpeg process and refuse to start new ones"""
+    _cancelled.set()
+    with _lock:
+        processes = list(_live_processes)
+    for process in processes:
+        _terminate(process)
+
+def cancel_job(scope):
+    """Stop the live processes of one job scope and refuse to start new ones in it"""
+    with _lock:
+        scope.cancelled = True
+        processes = list(scope.processes)
+    for process in processes:
+        _terminate(process)
+
+def install_signal_handlers():
+    """Turn SIGTERM/SIGINT into JobCancelled in the main thread"""
+    def handle(signum, frame):
+        cancel()
+        raise JobCancelled(f"Job cancelled by {signal.Signals(signum).name}")
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+
+def remove_partial(path):
+    """Delete a half-written output file; pipes and missing paths are left alone"""
+    if not path or path == '-' or path.startswith('pipe:'):
+        return
+    try:
+        if os.path.isfile(path):
+            os.remove(path)
+    except OSError:
+        pass
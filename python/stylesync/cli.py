@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Video Style Transfer using FFmpeg
+Command-line entry point spawned once per job by the backend (through
+python/style_transfer.py); the work itself lives in pipeline.py. With --list-templates it prints the registered style
+templates as JSON instead, which the backend serves as its template list.
+"""
+
+import sys
+import json
+import subprocess
+
+from .cancellation import JobCancelled, CANCELLED_EXIT_CODE, install_signal_handlers
+from .pipeline import render
+from .streaming import claim_stdout, STREAM_PATH
+from .template_registry import template_registry
+
+def main():
+    # One event per line as it happens, even when stdout is a pipe to the backend
+    sys.stdout.reconfigure(line_buffering=True)
+
+    if sys.argv[1:] == ['--list-templates']:
+        print(json.dumps(template_registry().describe()))
+        return
+
+    if len(sys.argv) != 7:
+        print("Usage: python style_transfer.py <user_video> <reference_video> <style_template> <options> <output_path> <job_id>")
+        print("       python style_transfer.py --list-templates")
+        print("       user_video and output_path may be '-' for stdin/stdout streaming")
+        sys.exit(1)
+
+    user_video_path = sys.argv[1]
+    reference_video_path = sys.argv[2] if sys.argv[2] else None
+    style_template = sys.argv[3] if sys.argv[3] else None
+    options_json = sys.argv[4]
+    output_path = sys.argv[5]
+    job_id = sys.argv[6]
+
+    try:
+        options = json.loads(options_json)
+    except json.JSONDecodeError:
+        print("Error: Invalid options JSON")
+        sys.exit(1)
+
+    # Events move to stderr when stdout carries the video
+    if output_path == STREAM_PATH:
+        claim_stdout()
+
+    # SIGTERM stops ffmpeg and removes partial output instead of encoding to the end
+    install_signal_handlers()
+
+    try:
+        render(user_video_path, output_path, reference_video_path, style_template, options, job_id)
+
+    except JobCancelled as e:
+        print(f"ERROR:{e}")
+        sys.exit(CANCELLED_EXIT_CODE)
+    except subprocess.CalledProcessError as e:
+        print(f"FFmpeg error: {e}")
+        print(f"FFmpeg stderr: {e.stderr}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Processing error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Downscale before filtering
+Jobs delivered below the source resolution or frame rate set
+options['targetHeight'] and/or options['targetFps']. The fps and scale
+conversions then go at the head of the filter chain, so curves, eq, unsharp,
+noise, vignette and the encoder all work on the delivered frames instead of
+the source's (a 4K to 1080p job filters a quarter of the pixels).
+
+Filters whose strength is defined in pixels are retuned for the smaller frame
+so the result matches filtering at full resolution and scaling afterwards:
+a downscale averages grain away, so noise strength shrinks with the scale
+factor, and unsharp's matrix shrinks with it (odd sizes, at least 3), with
+its amount corrected for the rounding. Color filters, curves and vignette
+do not depend on resolution and are left alone.
+"""
+
+from .probe import video_stream
+
+# Resampler used for the early downscale
+SCALE_FLAGS = 'lanczos'
+
+# unsharp's positional parameters, and its matrix size and amount limits
+UNSHARP_PARAMS = ('lx', 'ly', 'la', 'cx', 'cy', 'ca')
+UNSHARP_MATRIX_RANGE = (3, 23)
+UNSHARP_AMOUNT_RANGE = (-2.0, 5.0)
+
+# noise strength parameters (all components and each one)
+NOISE_STRENGTHS = ('alls', 'c0s', 'c1s', 'c2s', 'c3s')
+
+def target_settings(options):
+    """(height, fps) the job is delivered at; None for each one that is not set"""
+    height = options.get('targetHeight')
+    fps = options.get('targetFps')
+    height = int(height) if height else None
+    fps = float(fps) if fps else None
+    if (height is not None and height < 2) or (fps is not None and fps <= 0):
+        raise ValueError("targetHeight must be at least 2 and targetFps positive")
+    return height, fps
+
+def source_geometry(video_info):
+    """(height, fps) of the first video stream, None for whatever is unknown"""
+    stream = video_stream(video_info)
+    if not stream:
+        return None, None
+    height = int(stream.get('height') or 0) or None
+    num, _, den = str(stream.get('avg_frame_rate', '0/1')).partition('/')
+    try:
+        fps = float(num) / float(den) if den and float(den) else None
+    except ValueError:
+        fps = None
+    return height, fps or None
+
+def _split_args(spec, positional=()):
+    """'name=a:b:k=v' -> (name, [(key, value)]); positional values get names from `positional`"""
+    name, _, args = spec.partition('=')
+    params = []
+    for index, part in enumerate(args.split(':') if args else []):
+        key, sep, value = part.partition('=')
+        if not sep:
+            key, value = (positional[index] if index < len(positional) else str(index)), part
+        params.append((key, value))
+    return name, params
+
+def _join_args(name, params):
+    return f"{name}=" + ':'.join(f"{key}={value}" for key, value in params)
+
+def _retune_noise(name, params, factor):
+    retuned = []
+    for key, value in params:
+        if key in NOISE_STRENGTHS and float(value) > 0:
+            value = str(max(1, round(float(value) * factor)))
+        retuned.append((key, value))
+    return _join_args(name, retuned)
+
+def _retune_unsharp(name, params, factor):
+    values = dict(zip(UNSHARP_PARAMS, ('5', '5', '1.0', '5', '5', '0.0')))
+    values.update(params)
+    for size_x, size_y, amount in (('lx', 'ly', 'la'), ('cx', 'cy', 'ca')):
+        ideal = int(values[size_x]) * factor
+        # Nearest odd size within unsharp's limits
+        size = max(UNSHARP_MATRIX_RANGE[0], min(UNSHARP_MATRIX_RANGE[1], 2 * round((ideal - 1) / 2) + 1))
+        values[size_x] = values[size_y] = str(size)
+        # A matrix wider than the ideal one sharpens more, so the amount drops with it
+        low, high = UNSHARP_AMOUNT_RANGE
+        values[amount] = f"{max(low, min(high, float(values[amount]) * ideal / size)):.2f}"
+    return _join_args(name, [(key, values[key]) for key in UNSHARP_PARAMS])
+
+def retune_filters(video_filters, factor):
+    """Adjust pixel-scale grain and sharpening for frames scaled by factor (< 1 when downscaled)"""
+    if not factor or factor >= 1:
+        return list(video_filters)
+
+    retuned = []
+    for spec in video_filters:
+        base = spec.partition('=')[0].partition('@')[0]
+        if base == 'noise':
+            spec = _retune_noise(*_split_args(spec), factor)
+        elif base == 'unsharp':
+            spec = _retune_unsharp(*_split_args(spec, UNSHARP_PARAMS), factor)
+        retuned.append(spec)
+    return retuned
+
+def downscale_filters(video_filters, video_info, options, emit=print):
+    """
+    Prepend fps/scale conversion to video_filters for the job's target height
+    and frame rate and retune the chain for the smaller frames. Never upscales
+    or raises the frame rate; without probe data (pipes) the scale is bounded
+    by the input height in the graph and strengths stay as they are.
+    """
+    target_height, target_fps = target_settings(options)
+    if not target_height and not target_fps:
+        return list(video_filters)
+
+    source_height, source_fps = source_geometry(video_info)
+    head = []
+
+    # Dropping frames first means the scale below runs on fewer of them too
+    if target_fps and (source_fps is None or target_fps < source_fps):
+        head.append(f"fps={target_fps:g}")
+
+    factor = None
+    if target_height and source_height is None:
+        head.append(f"scale=-2:'min({target_height},ih)':flags={SCALE_FLAGS}")
+    elif target_height and target_height < source_height:
+        head.append(f"scale=-2:{target_height}:flags={SCALE_FLAGS}")
+        factor = target_height / source_height
+
+    if not head:
+        return list(video_filters)
+
+    if factor:
+        emit(f"Downscaling {source_height}p to {target_height}p before filtering")
+    else:
+        emit(f"Converting to the target size and frame rate before filtering: {','.join(head)}")
+    return head + retune_filters(video_filters, factor)
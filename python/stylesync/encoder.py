@@ -0,0 +1,100 @@
+"""
+Named encoder profiles
+Each profile sets the x264 preset, CRF, thread count, GOP length and tune plus
+the AAC bitrate. Jobs pick one with options['encoderProfile'] and may override
+individual fields with options['encoder'].
+"""
+
+ENCODER_PROFILES = {
+    # Fast turnaround for free-tier and internal review renders
+    'draft': {
+        'preset': 'veryfast',
+        'crf': 26,
+        'threads': 0,          # 0 lets x264 pick based on core count
+        'gop': 120,
+        'tune': 'fastdecode',
+        'audio_bitrate': '96k',
+    },
+    # Previous hardcoded settings: libx264 -crf 18 -preset medium, aac 128k
+    'standard': {
+        'preset': 'medium',
+        'crf': 18,
+        'threads': 0,
+        'gop': None,           # x264 default (250)
+        'tune': None,
+        'audio_bitrate': '128k',
+    },
+    # Highest quality deliverables
+    'archive': {
+        'preset': 'slow',
+        'crf': 14,
+        'threads': 0,
+        'gop': 48,
+        'tune': 'film',
+        'audio_bitrate': '256k',
+    },
+}
+
+DEFAULT_ENCODER_PROFILE = 'standard'
+
+# Audio codecs the MP4 muxer accepts as-is, so unfiltered audio can be stream-copied
+MP4_AUDIO_CODECS = ('aac', 'mp3', 'alac', 'ac3', 'eac3', 'opus')
+
+def resolve_encoder_profile(options):
+    """Return the encoder settings for a job: named profile plus any per-job overrides"""
+    name = options.get('encoderProfile') or DEFAULT_ENCODER_PROFILE
+    if name not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile: {name} (expected one of {', '.join(ENCODER_PROFILES)})")
+
+    profile = dict(ENCODER_PROFILES[name], name=name)
+    overrides = options.get('encoder') or {}
+    unknown = set(overrides) - set(ENCODER_PROFILES[name])
+    if unknown:
+        raise ValueError(f"Unknown encoder settings: {', '.join(sorted(unknown))}")
+    profile.update(overrides)
+    return profile
+
+def video_codec_args(profile):
+    """libx264 output arguments for a resolved profile"""
+    args = [
+        '-c:v', 'libx264',
+        '-crf', str(profile['crf']),
+        '-preset', profile['preset'],
+    ]
+    if profile.get('threads'):
+        args += ['-threads', str(profile['threads'])]
+    if profile.get('gop'):
+        args += ['-g', str(profile['gop'])]
+    if profile.get('tune'):
+        args += ['-tune', profile['tune']]
+    return args
+
+def audio_codec_args(profile):
+    """AAC output arguments for a resolved profile"""
+    return ['-c:a', 'aac', '-b:a', profile['audio_bitrate']]
+
+def audio_copyable(video_info):
+    """True when the input's audio can be stream-copied into an MP4 without re-encoding"""
+    streams = (video_info or {}).get('streams', [])
+    audio = [s for s in streams if s.get('codec_type') == 'audio']
+    return bool(audio) and all(s.get('codec_name') in MP4_AUDIO_CODECS for s in audio)
+
+def codec_args(video_filters, audio_filters, profile, copy_audio=False):
+    """
+    Filter and codec arguments for one output. An empty video chain stream-copies
+    the video instead of re-encoding it through a no-op filter; unfiltered audio is
+    copied when copy_audio says the source codec fits the container.
+    """
+    args = []
+    if video_filters:
+        args += ['-vf', ','.join(video_filters), *video_codec_args(profile)]
+    else:
+        args += ['-c:v', 'copy']
+
+    if audio_filters:
+        args += ['-af', ','.join(audio_filters), *audio_codec_args(profile)]
+    elif copy_audio:
+        args += ['-c:a', 'copy']
+    else:
+        args += audio_codec_args(profile)
+    return args
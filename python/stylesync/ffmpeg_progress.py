@@ -0,0 +1,332 @@
+"""
+Incremental ffmpeg progress reader
+Runs ffmpeg with `-progress pipe:1` and turns its key=value progress blocks into
+percent/fps/speed/ETA updates as the encode runs. Only a bounded tail of stderr
+is kept, so memory stays flat no matter how long the input is. When ffmpeg's
+stdout carries media (streaming output), progress moves to a dedicated pipe.
+The active resource policy (thread cap, priority, affinity, memory ceiling)
+is applied to every process started here, and each one can be stopped by a
+job cancel. run_capture gives the short probe and analysis passes the same
+treatment; run_ffmpeg_async is the asyncio counterpart used by the async job
+runner.
+"""
+
+import os
+import asyncio
+import json
+import subprocess
+import threading
+import time
+from collections import deque
+
+from . import cancellation
+from . import resources
+from . import tracing
+
+# Lines of ffmpeg stderr kept for error reporting
+STDERR_TAIL_LINES = 200
+
+def media_duration(video_info):
+    """Return the duration in seconds from ffprobe output, or None if unknown"""
+    if not video_info:
+        return None
+
+    candidates = [video_info.get('format', {}).get('duration')]
+    candidates.extend(s.get('duration') for s in video_info.get('streams', []) if s.get('codec_type') == 'video')
+
+    for value in candidates:
+        try:
+            duration = float(value)
+        except (TypeError, ValueError):
+            continue
+        if duration > 0:
+            return duration
+    return None
+
+def _parse_float(value):
+    try:
+        return float(str(value).rstrip('x'))
+    except (TypeError, ValueError):
+        return None
+
+def _out_time_seconds(block):
+    # out_time_us is authoritative; out_time_ms is also microseconds in ffmpeg
+    for key in ('out_time_us', 'out_time_ms'):
+        value = block.get(key)
+        if value and value != 'N/A':
+            try:
+                return max(0.0, int(value) / 1_000_000)
+            except ValueError:
+                pass
+    return None
+
+def build_progress_update(block, duration, elapsed):
+    """Turn one ffmpeg progress block into a percent/fps/speed/ETA update"""
+    out_time = _out_time_seconds(block)
+    fps = _parse_float(block.get('fps'))
+    speed = _parse_float(block.get('speed'))
+    done = block.get('progress') == 'end'
+
+    percent = None
+    eta = None
+    if duration and out_time is not None:
+        percent = min(100.0, out_time / duration * 100)
+        remaining = max(0.0, duration - out_time)
+        if speed:
+            eta = remaining / speed
+        elif out_time > 0:
+            eta = remaining * elapsed / out_time
+    if done:
+        percent = 100.0
+        eta = 0.0
+
+    try:
+        frame = int(block.get('frame', 0))
+    except ValueError:
+        frame = 0
+
+    try:
+        size = int(block.get('total_size', 0))
+    except ValueError:
+        size = 0
+
+    return {
+        'percent': round(percent, 2) if percent is not None else None,
+        'out_time': round(out_time, 3) if out_time is not None else None,
+        'frame': frame,
+        'size': size,
+        'fps': fps,
+        'speed': speed,
+        'eta': round(eta, 1) if eta is not None else None,
+        'elapsed': round(elapsed, 3),
+        'done': done
+    }
+
+def with_progress_args(cmd, target='pipe:1'):
+    """Insert machine-readable progress output into an ffmpeg command"""
+    return [cmd[0], '-progress', target, '-nostats'] + list(cmd[1:])
+
+def _drain(stream, tail):
+    for line in stream:
+        tail.append(line.rstrip('\n'))
+
+def run_ffmpeg(cmd, duration=None, on_progress=None, stdin=subprocess.DEVNULL, stdout=None):
+    """
+    Run an ffmpeg command, calling on_progress with each progress update.
+    stdin/stdout may be passed through for pipe input or output; ffmpeg's stdout
+    is otherwise reserved for progress. Raises subprocess.CalledProcessError
+    (carrying the stderr tail) on failure and returns the final progress update
+    on success, or JobCancelled if the job was cancelled.
+    """
+    cancellation.check()
+    if stdout is None:
+        process = subprocess.Popen(
+            resources.limit_command(with_progress_args(cmd)),
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+        progress_stream = process.stdout
+    else:
+        # stdout carries media, so progress goes to an inherited pipe instead
+        read_fd, write_fd = os.pipe()
+        try:
+            process = subprocess.Popen(
+                resources.limit_command(with_progress_args(cmd, f"pipe:{write_fd}")),
+                stdin=stdin,
+                stdout=stdout,
+                stderr=subprocess.PIPE,
+                text=True,
+                pass_fds=(write_fd,)
+            )
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        progress_stream = os.fdopen(read_fd, 'r')
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    stderr_reader = threading.Thread(target=_drain, args=(process.stderr, stderr_tail), daemon=True)
+    stderr_reader.start()
+
+    started = time.monotonic()
+    block = {}
+    last_update = None
+
+    cancellation.register(process)
+    try:
+        resources.apply_limits(process.pid)
+        for line in progress_stream:
+            key, sep, value = line.strip().partition('=')
+            if not sep:
+                continue
+            block[key] = value
+            if key == 'progress':
+                last_update = build_progress_update(block, duration, time.monotonic() - started)
+                if on_progress:
+                    on_progress(last_update)
+                block = {}
+        # wait4 reaps the child and returns its own rusage (CPU time, peak RSS)
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    except BaseException:
+        cancellation.stop(process)
+        raise
+    finally:
+        cancellation.unregister(process)
+        stderr_reader.join()
+        if progress_stream is not process.stdout:
+            progress_stream.close()
+
+    tracing.record_process(rusage, last_update)
+
+    if process.returncode != 0:
+        # A process stopped by a cancel is not an ffmpeg failure
+        cancellation.check()
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr='\n'.join(stderr_tail))
+
+    return last_update
+
+def run_capture(cmd, text=False, on_block=None, block_size=None):
+    """
+    subprocess.run(cmd, capture_output=True, check=True) for the short ffmpeg
+    and ffprobe passes (probes, scene and style decodes, loudness measurement)
+    under the job's resource policy, stopped by a job cancel and traced like
+    run_ffmpeg. With on_block, stdout is handed over in block_size pieces as
+    it is read (the last one may be short) instead of being held in memory,
+    and the result's stdout is None.
+    """
+    cancellation.check()
+    process = subprocess.Popen(
+        resources.limit_command(cmd),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=text
+    )
+
+    stderr_parts = []
+    stderr_reader = threading.Thread(target=lambda: stderr_parts.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+
+    cancellation.register(process)
+    try:
+        resources.apply_limits(process.pid)
+        if on_block:
+            stdout = None
+            for block in iter(lambda: process.stdout.read(block_size), b''):
+                on_block(block)
+        else:
+            stdout = process.stdout.read()
+        stderr_reader.join()
+        # wait4 rather than communicate(), so the trace gets this process's own rusage
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    except BaseException:
+        cancellation.stop(process)
+        raise
+    finally:
+        cancellation.unregister(process)
+        stderr_reader.join()
+        process.stdout.close()
+        process.stderr.close()
+
+    stderr = stderr_parts[0] if stderr_parts else ('' if text else b'')
+    tracing.record_process(rusage)
+
+    # ffmpeg stopped by SIGTERM may still exit 0 with truncated output
+    cancellation.check()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+async def _stop_async(process):
+    """stop() for an asyncio process: SIGTERM, then SIGKILL after the grace period"""
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), cancellation.STOP_GRACE_SECONDS)
+    except ProcessLookupError:
+        pass
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+async def run_ffmpeg_async(cmd, duration=None, on_progress=None):
+    """
+    run_ffmpeg on the event loop: progress and stderr are read as they arrive
+    without blocking it, so one process can drive many encodes at once.
+    Cancelling the awaiting task (a timeout or shutdown) stops ffmpeg.
+    asyncio reaps the child itself, so the trace gets its frame count but no
+    rusage.
+    """
+    cancellation.check()
+    process = await asyncio.create_subprocess_exec(
+        *resources.limit_command(with_progress_args(cmd)),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    async def drain():
+        async for raw in process.stderr:
+            stderr_tail.append(raw.decode('utf-8', errors='replace').rstrip('\n'))
+
+    stderr_reader = asyncio.create_task(drain())
+    started = time.monotonic()
+    block = {}
+    last_update = None
+
+    cancellation.register(process)
+    try:
+        resources.apply_limits(process.pid)
+        async for raw in process.stdout:
+            key, sep, value = raw.decode('utf-8', errors='replace').strip().partition('=')
+            if not sep:
+                continue
+            block[key] = value
+            if key == 'progress':
+                last_update = build_progress_update(block, duration, time.monotonic() - started)
+                if on_progress:
+                    on_progress(last_update)
+                block = {}
+        await process.wait()
+        await stderr_reader
+    except BaseException:
+        stderr_reader.cancel()
+        await _stop_async(process)
+        raise
+    finally:
+        cancellation.unregister(process)
+
+    tracing.record_process(None, last_update)
+
+    if process.returncode != 0:
+        cancellation.check()
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr='\n'.join(stderr_tail))
+
+    return last_update
+
+def progress_reporter(emit, start=60, end=90):
+    """
+    Build an on_progress callback that maps encode percent onto the job's
+    PROGRESS:start..end range and reports ENCODE:{fps, speed, eta} details
+    """
+    state = {'last': start}
+
+    def report(update):
+        emit(f"ENCODE:{json.dumps(update)}")
+        if update['percent'] is None:
+            return
+        progress = start + int((end - start) * update['percent'] / 100)
+        if progress > state['last']:
+            state['last'] = progress
+            emit(f"PROGRESS:{progress}")
+
+    return report
@@ -0,0 +1,110 @@
+"""
+Precompiled 3D LUTs for style filter chains
+The color-only part of a chain (curves, colorbalance, eq, hue) is rendered
+once through ffmpeg onto an identity Hald CLUT, converted to a .cube file and
+cached. At encode time a single lut3d filter replaces those per-pixel passes;
+spatial and temporal filters (unsharp, noise, vignette) still run afterwards.
+
+Tolerance: with the default level-6 Hald CLUT (36 points per axis) and
+tetrahedral interpolation, the baked chain stays above 36 dB PSNR against the
+original chain when both are compared in displayed RGB on testsrc2 at
+320x180 (vibrant 36.5 dB, cinematic 37.8 dB, minimal and vintage about 45 dB),
+and above 40 dB at 1280x720. Most of the gap is the RGB round trip rather than
+the LUT: an identity LUT alone scores about 37 dB at 320x180, and level 8
+gains less than 0.2 dB. Values the original
+chain pushes outside legal YUV range (e.g. superwhites from eq brightness) are
+clipped by the LUT path, which is invisible after display conversion. Run
+`python benchmark.py lut <video>` to measure PSNR and per-frame filter cost on
+real footage.
+"""
+
+import os
+import hashlib
+import threading
+
+from .cache import CACHE_ROOT
+from .ffmpeg_progress import run_capture
+
+# Filters that only remap pixel colors and can therefore be baked into a LUT
+COLOR_ONLY_FILTERS = ('curves', 'colorbalance', 'eq', 'hue')
+
+# Hald CLUT level; the LUT has level**2 points per axis
+LUT_HALD_LEVEL = int(os.environ.get('LUT_HALD_LEVEL', 6))
+
+LUT_CACHE_DIR = CACHE_ROOT / 'luts'
+
+# Pixel formats without chroma subsampling, so every CLUT pixel is filtered independently
+FULL_CHROMA_FORMATS = 'gbrp|rgb24|bgr24|yuv444p|rgba|bgra|gbrap|yuva444p'
+
+_bake_lock = threading.Lock()
+
+def filter_name(filter_spec):
+    return filter_spec.split('=', 1)[0].split('@', 1)[0].strip()
+
+def split_color_prefix(video_filters):
+    """Split a chain into its leading color-only filters and the remainder"""
+    for index, spec in enumerate(video_filters):
+        if filter_name(spec) not in COLOR_ONLY_FILTERS:
+            return list(video_filters[:index]), list(video_filters[index:])
+    return list(video_filters), []
+
+def lut_path(color_filters, level=LUT_HALD_LEVEL):
+    key = hashlib.blake2b(','.join(color_filters).encode() + f"|{level}".encode(), digest_size=16).hexdigest()
+    return LUT_CACHE_DIR / f"{key}.cube"
+
+def render_cube(color_filters, level=LUT_HALD_LEVEL):
+    """Run color_filters over an identity Hald CLUT and return the .cube file contents"""
+    size = level * level
+    image_side = level ** 3
+
+    # Pin every step to a full-chroma format so neighbouring CLUT pixels never mix
+    chain = ['format=gbrp']
+    for spec in color_filters:
+        chain += [spec, f"format={FULL_CHROMA_FORMATS}"]
+    chain.append('format=rgb24')
+
+    cmd = [
+        'ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', f"haldclutsrc=level={level}",
+        '-vf', ','.join(chain), '-frames:v', '1',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1'
+    ]
+    result = run_capture(cmd)
+
+    pixels = result.stdout
+    expected = image_side * image_side * 3
+    if len(pixels) < expected:
+        raise ValueError(f"Hald CLUT render returned {len(pixels)} bytes, expected {expected}")
+
+    # Hald CLUT pixel order (red fastest, then green, then blue) matches .cube order
+    lines = [f"LUT_3D_SIZE {size}"]
+    lines.extend(
+        f"{pixels[i] / 255:.6f} {pixels[i + 1] / 255:.6f} {pixels[i + 2] / 255:.6f}"
+        for i in range(0, size ** 3 * 3, 3)
+    )
+    return '\n'.join(lines) + '\n'
+
+def bake_lut(color_filters, level=LUT_HALD_LEVEL):
+    """Return the path of a cached .cube LUT for color_filters, baking it if needed"""
+    path = lut_path(color_filters, level)
+    if path.exists():
+        return path
+
+    with _bake_lock:
+        if path.exists():
+            return path
+        LUT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(render_cube(color_filters, level))
+        os.replace(tmp_path, path)
+    return path
+
+def bake_color_filters(video_filters, level=LUT_HALD_LEVEL):
+    """Replace the leading color-only filters with one lut3d filter backed by a cached LUT"""
+    color_filters, remaining = split_color_prefix(video_filters)
+    if len(color_filters) < 2:
+        # A single color filter is already one pass; nothing to gain
+        return list(video_filters)
+
+    path = bake_lut(color_filters, level)
+    return [f"lut3d=file='{path}':interp=tetrahedral"] + remaining
@@ -0,0 +1,142 @@
+"""
+Multi-output rendering
+Renders several deliverables from one decode: the input is decoded once,
+every distinct style chain runs once, and `split` fans each styled stream out
+to scaled renditions and still-frame thumbnails inside a single ffmpeg
+filter graph. Normalized audio is split the same way for the video outputs.
+
+options['outputs'] lists the deliverables:
+    [{"name": "master"},
+     {"name": "web", "height": 720, "encoderProfile": "draft"},
+     {"name": "vintage", "template": "vintage", "height": 720},
+     {"name": "thumbs", "kind": "thumbnail", "frames": 4, "height": 180}]
+"""
+
+import os
+
+from .encoder import resolve_encoder_profile, video_codec_args, audio_codec_args
+
+OUTPUT_KINDS = ('video', 'thumbnail')
+
+# Fields an output spec may set
+OUTPUT_FIELDS = ('name', 'kind', 'path', 'height', 'template', 'encoderProfile', 'encoder', 'frames')
+
+THUMBNAIL_EXTENSION = '.jpg'
+
+def resolve_outputs(options, output_path):
+    """
+    Validate options['outputs'] and fill in defaults. The first video output
+    is the primary rendition and is always written to output_path, which is
+    where callers collect a job's result. Other outputs default to the job
+    output path with the output name appended, e.g. out_web.mp4 and
+    out_thumbs_01.jpg.
+    """
+    specs = options.get('outputs') or []
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("outputs must be a non-empty list")
+    if not any(spec.get('kind', 'video') == 'video' for spec in specs):
+        raise ValueError("outputs must include a video output, which is written to the job output path")
+
+    stem, extension = os.path.splitext(output_path)
+    outputs = []
+    names = set()
+    primary = None
+    for spec in specs:
+        unknown = set(spec) - set(OUTPUT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown output settings: {', '.join(sorted(unknown))}")
+        name = spec.get('name')
+        if not name or name in names:
+            raise ValueError(f"Every output needs a unique name (got {name!r})")
+        names.add(name)
+
+        kind = spec.get('kind', 'video')
+        if kind not in OUTPUT_KINDS:
+            raise ValueError(f"Unknown output kind: {kind} (expected one of {', '.join(OUTPUT_KINDS)})")
+
+        output = {
+            'name': name,
+            'kind': kind,
+            'height': int(spec['height']) if spec.get('height') else None,
+            'template': spec.get('template'),
+        }
+        if kind == 'thumbnail':
+            output['frames'] = max(1, int(spec.get('frames', 1)))
+            output['path'] = spec.get('path') or f"{stem}_{name}_%02d{THUMBNAIL_EXTENSION}"
+        else:
+            # Job-level encoder settings apply unless the output picks its own
+            output['profile'] = resolve_encoder_profile({
+                'encoderProfile': spec.get('encoderProfile') or options.get('encoderProfile'),
+                'encoder': spec.get('encoder') if 'encoder' in spec else options.get('encoder'),
+            })
+            if primary is None:
+                primary = output
+                if spec.get('path') and spec['path'] != output_path:
+                    raise ValueError(f"Output {name} is the primary rendition, which is written to the job output path; set path on the other outputs only")
+                output['path'] = output_path
+            else:
+                output['path'] = spec.get('path') or f"{stem}_{name}{extension}"
+        outputs.append(output)
+
+    paths = [output['path'] for output in outputs]
+    if len(set(paths)) != len(paths):
+        raise ValueError("Every output needs its own path")
+    return outputs
+
+def output_files(output):
+    """Files an output writes (thumbnail patterns expand to one file per frame)"""
+    if output['kind'] == 'thumbnail':
+        return [output['path'] % (index + 1) for index in range(output['frames'])]
+    return [output['path']]
+
+def _scale(height):
+    # Never upscale; -2 keeps the width even for the encoder
+    return f"scale=-2:'min({height},ih)'"
+
+def build_multi_output_command(input_path, outputs, chains, audio_filters, duration, has_audio=True):
+    """
+    One ffmpeg command for every output. chains maps a chain name (None for the
+    job's own chain, otherwise a template) to its filter list; each chain runs
+    once on the decoded input and is split across the outputs that use it.
+    """
+    groups = {}
+    for index, output in enumerate(outputs):
+        groups.setdefault(output['template'], []).append(index)
+
+    graph = []
+    if len(groups) > 1:
+        graph.append(f"[0:v]split={len(groups)}" + ''.join(f"[in{g}]" for g in range(len(groups))))
+        sources = [f"[in{g}]" for g in range(len(groups))]
+    else:
+        sources = ['[0:v]']
+
+    for source, (template, members) in zip(sources, groups.items()):
+        chain = list(chains[template]) or ['null']
+        graph.append(source + ','.join(chain + [f"split={len(members)}"]) + ''.join(f"[v{i}]" for i in members))
+
+    for index, output in enumerate(outputs):
+        tail = []
+        if output['kind'] == 'thumbnail':
+            # Evenly spaced stills across the clip
+            rate = f"{output['frames']}/{duration:.3f}" if duration else '1/10'
+            tail.append(f"fps={rate}")
+        if output['height']:
+            tail.append(_scale(output['height']))
+        graph.append(f"[v{index}]{','.join(tail or ['null'])}[out{index}]")
+
+    video_outputs = [i for i, output in enumerate(outputs) if output['kind'] == 'video']
+    if has_audio and video_outputs:
+        audio_chain = ','.join(list(audio_filters) + [f"asplit={len(video_outputs)}"])
+        graph.append(f"[0:a:0]{audio_chain}" + ''.join(f"[a{i}]" for i in video_outputs))
+
+    cmd = ['ffmpeg', '-i', input_path, '-filter_complex', ';'.join(graph)]
+    for index, output in enumerate(outputs):
+        cmd += ['-map', f"[out{index}]"]
+        if output['kind'] == 'thumbnail':
+            cmd += ['-frames:v', str(output['frames']), '-q:v', '3', '-y', output['path']]
+            continue
+        cmd += video_codec_args(output['profile'])
+        if has_audio:
+            cmd += ['-map', f"[a{index}]", *audio_codec_args(output['profile'])]
+        cmd += ['-movflags', '+faststart', '-y', output['path']]
+    return cmd
@@ -0,0 +1,873 @@
+"""
+Video style transfer pipeline
+Extracts style characteristics from reference videos and applies them to user
+videos with FFmpeg. This module is the library behind every entry point: the
+style_transfer.py and server/video_processor.py CLIs, the worker, batch runner
+and benchmark all import it. Its public API, re-exported by the package, is
+
+    analyze(reference_video_path, options)      -> style profile
+    build_graph(user_video_path, ...)           -> ffmpeg video filter chain
+    render(user_video_path, output_path, ...)   -> job metrics
+    measure(output_path, reference_video_path)  -> style match score
+
+Everything else here is the machinery those calls share.
+"""
+
+import contextlib
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+from .audio import build_audio_filters, reusable_audio
+from .cancellation import JobCancelled, remove_partial
+from .cache import fingerprint, file_identity, staged_output, style_profile_cache, input_style_cache, loudness_cache, render_cache
+from .downscale import downscale_filters, retune_filters, source_geometry, target_settings
+from .encoder import resolve_encoder_profile, codec_args, video_codec_args, audio_codec_args, audio_copyable
+from .ffmpeg_progress import run_ffmpeg, media_duration, progress_reporter
+from .lut import bake_color_filters
+from .multi_output import resolve_outputs, build_multi_output_command, output_files
+from .probe import probe_media, probe_signalstats, probe_stats, video_stream, has_audio
+from . import resources
+from .scene import scene_adaptive_filters, scene_timing_conflict
+from .segmented import encode_segmented
+from .streaming import streaming_requested, is_stream, build_stream_command, stream_io
+from . import tracing
+from .style_score import score_output
+from .style_analysis import (
+    analyze_style, get_input_style, relative_corrections, numpy_available,
+    DEFAULT_FRAME_BUDGET, ANALYSIS_WIDTH, ANALYSIS_HEIGHT, INPUT_SCAN_FRAMES,
+)
+from .template_registry import template_registry
+
+# Checkpointed jobs are cut into segments of roughly this length (seconds)
+CHECKPOINT_SEGMENT_SECONDS = float(os.environ.get('CHECKPOINT_SEGMENT_SECONDS', 30))
+
+# Checkpoint directory for an output lives next to it
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+# Frames read by the signalstats fallback when NumPy is unavailable
+STYLE_SAMPLE_FRAMES = 10
+
+# Frames sampled across the whole reference by the NumPy analysis
+STYLE_FRAME_BUDGET = int(os.environ.get('STYLE_FRAME_BUDGET', DEFAULT_FRAME_BUDGET))
+
+def get_video_info(video_path):
+    """Extract video information using ffprobe (memoized per file)"""
+    try:
+        return probe_media(video_path)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        print(f"Error getting video info: {e}", file=sys.stderr)
+        return None
+
+def extract_video_style(reference_video_path, frame_budget=STYLE_FRAME_BUDGET, emit=print):
+    """Extract style characteristics from reference video"""
+    try:
+        emit("Analyzing reference video style characteristics...")
+        
+        # Sample frames across the whole clip when NumPy is available
+        if numpy_available():
+            style_profile = analyze_style(reference_video_path, frame_budget)
+            if style_profile:
+                summary = {k: v for k, v in style_profile.items() if k != 'histograms'}
+                emit(f"Extracted style profile: {summary}")
+            return style_profile
+        
+        # Extract color statistics using ffprobe
+        stats_data = probe_signalstats(reference_video_path, STYLE_SAMPLE_FRAMES)
+        
+        # Extract average color values from multiple frames
+        y_values = []
+        u_values = []
+        v_values = []
+        brightness_values = []
+        
+        for frame in stats_data.get('frames', []):
+            tags = frame.get('tags', {})
+            if 'lavfi.signalstats.YAVG' in tags:
+                y_values.append(float(tags['lavfi.signalstats.YAVG']))
+                u_values.append(float(tags.get('lavfi.signalstats.UAVG', 128)))
+                v_values.append(float(tags.get('lavfi.signalstats.VAVG', 128)))
+                
+                y_min = float(tags.get('lavfi.signalstats.YMIN', 0))
+                y_max = float(tags.get('lavfi.signalstats.YMAX', 255))
+                brightness_values.append((y_min + y_max) / 2)
+        
+        if not y_values:
+            return None
+            
+        # Calculate style characteristics
+        avg_y = sum(y_values) / len(y_values)
+        avg_u = sum(u_values) / len(u_values) 
+        avg_v = sum(v_values) / len(v_values)
+        avg_brightness = sum(brightness_values) / len(brightness_values)
+        
+        # Determine color temperature and characteristics
+        warm_bias = (avg_v - 128) / 128  # Positive = warm, negative = cool
+        green_magenta_bias = (avg_u - 128) / 128  # Positive = green, negative = magenta
+        
+        # Calculate contrast from brightness range
+        brightness_range = max(brightness_values) - min(brightness_values)
+        contrast_level = brightness_range / 255
+        
+        # Determine saturation level from U/V deviation
+        saturation_level = (abs(avg_u - 128) + abs(avg_v - 128)) / 128
+        
+        style_profile = {
+            'brightness': (avg_brightness - 128) / 128,  # -1 to 1
+            'contrast': contrast_level,  # 0 to 1
+            'saturation': saturation_level,  # 0 to 1+
+            'warm_bias': warm_bias,  # -1 to 1
+            'green_magenta_bias': green_magenta_bias,  # -1 to 1
+            'luminance': (avg_y - 128) / 128  # -1 to 1
+        }
+        
+        emit(f"Extracted style profile: {style_profile}")
+        return style_profile
+        
+    except JobCancelled:
+        # A stopped analysis is not a failed one; the job unwinds instead of falling back
+        raise
+    except Exception as e:
+        emit(f"Error extracting video style: {e}")
+        return None
+
+def style_analysis_params(frame_budget):
+    """Parameters that determine the analysis result, used as part of the cache key"""
+    if numpy_available():
+        return ('numpy', frame_budget, ANALYSIS_WIDTH, ANALYSIS_HEIGHT)
+    return ('signalstats', STYLE_SAMPLE_FRAMES)
+
+def get_reference_style(reference_video_path, frame_budget=STYLE_FRAME_BUDGET, emit=print):
+    """Return the reference style profile, reusing a cached analysis of identical content"""
+    
+    cache = style_profile_cache()
+    try:
+        key = fingerprint(reference_video_path, *style_analysis_params(frame_budget))
+    except OSError as e:
+        emit(f"Error fingerprinting reference video: {e}")
+        return extract_video_style(reference_video_path, frame_budget, emit)
+    
+    style_profile = cache.get(key)
+    if style_profile is not None:
+        emit("Using cached style profile")
+        return style_profile
+    
+    style_profile = extract_video_style(reference_video_path, frame_budget, emit)
+    if style_profile:
+        cache.put(key, style_profile)
+    return style_profile
+
+def apply_reference_style_filters(style_profile, options, input_profile=None, emit=print):
+    """
+    Apply style filters based on extracted reference video characteristics,
+    relative to input_profile (the user video's keyframe scan) when given
+    """
+    
+    filters = []
+    
+    corrections = relative_corrections(style_profile, input_profile)
+    if corrections:
+        # Move the input's own statistics toward the reference instead of applying an absolute look
+        brightness_adj, contrast_adj = corrections['brightness'], corrections['contrast']
+        saturation_adj, gamma_adj = corrections['saturation'], corrections['gamma']
+        rs_adj, gs_adj, bs_adj = corrections['rs'], corrections['gs'], corrections['bs']
+    else:
+        # Convert style profile to filter parameters
+        brightness_adj = style_profile['brightness'] * 0.3  # Scale to reasonable range
+        contrast_adj = 1.0 + (style_profile['contrast'] * 0.5)  # 1.0 to 1.5
+        saturation_adj = 0.8 + (style_profile['saturation'] * 0.8)  # 0.8 to 1.6
+        
+        # Color balance adjustments based on reference
+        rs_adj = style_profile['warm_bias'] * 0.3  # Red-cyan balance
+        gs_adj = style_profile['green_magenta_bias'] * 0.2  # Green-magenta balance
+        bs_adj = -style_profile['warm_bias'] * 0.2  # Blue-yellow balance
+        
+        # Gamma adjustment based on luminance
+        gamma_adj = 1.0 + (style_profile['luminance'] * 0.3)
+    
+    # Apply extracted style characteristics
+    filters.extend([
+        f"eq=brightness={brightness_adj:.3f}:contrast={contrast_adj:.3f}:saturation={saturation_adj:.3f}:gamma={gamma_adj:.3f}",
+        f"colorbalance=rs={rs_adj:.3f}:gs={gs_adj:.3f}:bs={bs_adj:.3f}",
+    ])
+    
+    # Add curve adjustment based on contrast profile
+    if style_profile['contrast'] > 0.6:  # High contrast reference
+        filters.append("curves=all='0/0 0.2/0.1 0.8/0.9 1/1'")
+    elif style_profile['contrast'] < 0.3:  # Low contrast reference
+        filters.append("curves=all='0/0.1 0.5/0.5 1/0.9'")
+    else:  # Medium contrast
+        filters.append("curves=all='0/0 0.3/0.25 0.7/0.75 1/1'")
+    
+    # Add sharpening based on extracted characteristics
+    if style_profile['contrast'] > 0.5:
+        filters.append("unsharp=5:5:1.0:5:5:0.5")
+    
+    emit(f"Applied reference-based filters: {filters}")
+    return filters
+
+def apply_template_style_filters(style_template, options):
+    """Apply a registered template's precompiled filter chain (see template_registry)"""
+    return template_registry().filters(style_template, options)
+
+def build_ffmpeg_command(input_path, output_path, video_filters, audio_filters, profile=None, copy_audio=False,
+                         audio_source=None):
+    """Build comprehensive ffmpeg command"""
+    
+    # Encoder settings come from the job's named profile (standard by default)
+    profile = profile or resolve_encoder_profile({})
+    
+    cmd = ['ffmpeg', '-i', input_path]
+    if audio_source:
+        # Stream-copy the already-normalized audio of a previous render
+        cmd += ['-i', audio_source, '-map', '0:v:0', '-map', '1:a:0']
+        audio_filters, copy_audio = [], True
+    
+    cmd += [
+        *codec_args(video_filters, audio_filters, profile, copy_audio),
+        '-y', output_path
+    ]
+    
+    return cmd
+
+# Defaults for fast previews; any field can be overridden through options['preview']
+PREVIEW_DEFAULTS = {
+    'mode': 'clip',     # 'clip' renders a short excerpt, 'grid' a sheet of stills
+    'duration': 4,      # Seconds rendered in clip mode
+    'height': 360,      # Output height in pixels
+    'frames': 6,        # Stills in grid mode
+    'columns': 3,       # Grid columns
+}
+
+PREVIEW_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+def preview_settings(options):
+    """Merge options['preview'] (True or a dict) over the preview defaults"""
+    settings = dict(PREVIEW_DEFAULTS)
+    preview = options.get('preview')
+    if isinstance(preview, dict):
+        settings.update({k: v for k, v in preview.items() if k in PREVIEW_DEFAULTS})
+    return settings
+
+def preview_window(settings, duration):
+    """(start, seconds) of the input a preview shows: the middle excerpt in clip mode, the whole input for a grid"""
+    duration = duration or 0
+    if settings['mode'] == 'grid':
+        return 0.0, duration
+    clip = float(settings['duration'])
+    start = max(0.0, duration / 2 - clip / 2)
+    return start, min(clip, duration - start)
+
+def build_preview_command(input_path, output_path, video_filters, duration, settings):
+    """Build a fast low-resolution preview command using the same style filters as a full render"""
+    
+    # Downscale first so the style filters run on a few pixels only
+    scale = f"scale=-2:'min({int(settings['height'])},ih)'"
+    chain = ','.join([scale] + list(video_filters))
+    duration = duration or 0
+    
+    if settings['mode'] == 'grid':
+        count = max(1, int(settings['frames']))
+        columns = max(1, min(count, int(settings['columns'])))
+        rows = -(-count // columns)
+        
+        # Seek to each still independently so cost does not grow with input length
+        cmd = ['ffmpeg']
+        for i in range(count):
+            cmd += ['-ss', f"{duration * (i + 0.5) / count:.3f}", '-i', input_path]
+        
+        stills = [f"[{i}:v]trim=end_frame=1,setpts=PTS-STARTPTS,{scale}[s{i}]" for i in range(count)]
+        labels = ''.join(f"[s{i}]" for i in range(count))
+        styled = ','.join([f"concat=n={count}:v=1:a=0"] + list(video_filters) + [f"tile={columns}x{rows}"])
+        graph = ';'.join(stills) + f";{labels}{styled}[grid]"
+        
+        return cmd + ['-filter_complex', graph, '-map', '[grid]', '-frames:v', '1', '-q:v', '3', '-y', output_path]
+    
+    # Short excerpt from the middle of the clip, fast preset, no audio
+    clip = float(settings['duration'])
+    start, _ = preview_window(settings, duration)
+    return [
+        'ffmpeg', '-ss', f"{start:.3f}", '-i', input_path, '-t', f"{clip:.3f}",
+        '-vf', chain, '-an',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '28',
+        '-movflags', '+faststart', '-y', output_path
+    ]
+
+def calculate_metrics(input_path, output_path, processing_time, colors_analyzed, style_match=None):
+    """Calculate authentic processing metrics; style_match is the measured score, if any"""
+    
+    try:
+        # Get output file size
+        output_size = os.path.getsize(output_path)
+        output_size_mb = f"{output_size / (1024 * 1024):.0f}MB"
+        
+        # Format processing time
+        minutes = int(processing_time // 60)
+        seconds = int(processing_time % 60)
+        time_str = f"{minutes}:{seconds:02d}"
+        
+        return {
+            "processing_time": time_str,
+            "style_match": style_match,
+            "colors_analyzed": colors_analyzed,
+            "output_size": output_size_mb
+        }
+    except Exception as e:
+        print(f"Error calculating metrics: {e}", file=sys.stderr)
+        return {
+            "processing_time": "0:00",
+            "style_match": None,
+            "colors_analyzed": 0,
+            "output_size": "0MB"
+        }
+
+def job_audio_filters(user_video_path, video_info, options, emit=print):
+    """Audio filter chain for one input, measuring loudness only when audio will be re-encoded"""
+    
+    if not has_audio(video_info) or reusable_audio(options, emit):
+        return []
+    return build_audio_filters(options, user_video_path, emit)
+
+def input_dependent_grade(reference_style, options):
+    """Whether a job's reference grade depends on its own input, so a shared graph cannot be reused"""
+    return bool(reference_style) and bool(options.get('sceneAdaptive') or options.get('relativeGrading', True))
+
+def frame_count(video_info):
+    """Frames in the first video stream: the container's count, else duration x frame rate"""
+    stream = video_stream(video_info)
+    if not stream:
+        return 0
+    try:
+        return int(stream['nb_frames'])
+    except (KeyError, ValueError):
+        pass
+    num, _, den = str(stream.get('avg_frame_rate', '0/1')).partition('/')
+    try:
+        rate = float(num) / float(den) if den and float(den) else 0.0
+    except ValueError:
+        rate = 0.0
+    return int((media_duration(video_info) or 0) * rate)
+
+def frame_pixel_count(video_info):
+    """Pixels per frame of the first video stream, used as the colors-analyzed metric"""
+    stream = video_stream(video_info)
+    if stream:
+        return int(stream.get('width', 1920)) * int(stream.get('height', 1080))
+    return 1920 * 1080
+
+def measure_style_match(output_path, reference_style, options, emit=print):
+    """Score the finished render against the job's analyzed reference profile; None for template jobs"""
+    try:
+        return score_output(output_path, reference_style, options.get('scoreSampleFrames'))
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        emit(f"Error scoring style match: {e}")
+        return None
+
+def scan_input(user_video_path, options):
+    """Keyframe profile of the input for relative grading; a preview scans only the part it shows"""
+    if not options.get('preview'):
+        return get_input_style(user_video_path)
+    
+    settings = preview_settings(options)
+    duration = media_duration(get_video_info(user_video_path))
+    if not duration:
+        return get_input_style(user_video_path)
+    # A grid shows a few stills, so it scans as many keyframes as it has stills
+    frame_budget = max(1, int(settings['frames'])) if settings['mode'] == 'grid' else INPUT_SCAN_FRAMES
+    return get_input_style(user_video_path, frame_budget, preview_window(settings, duration))
+
+def analyze_reference(reference_video_path, options, emit=print):
+    """
+    Style profile of the job's reference video, or None without one (or when it
+    cannot be analyzed, so the job falls back to its template). The profile is
+    passed on to build_style_filters and measure_style_match, so a job reads
+    the style cache once.
+    """
+    if not (reference_video_path and os.path.exists(reference_video_path)):
+        return None
+    
+    emit(f"PROGRESS:35")
+    emit(f"Analyzing reference video: {reference_video_path}")
+    with tracing.span('analyze'):
+        reference_style = get_reference_style(reference_video_path, int(options.get('analysisFrames') or STYLE_FRAME_BUDGET), emit)
+    if reference_style:
+        emit(f"PROGRESS:45")
+        emit("Successfully extracted reference style characteristics")
+    else:
+        emit("Failed to extract reference style, falling back to template")
+    return reference_style
+
+def build_style_filters(reference_style, style_template, options, emit=print, user_video_path=None):
+    """
+    Build the video filter chain for a job from its analyzed reference profile
+    (see analyze_reference), or from the template without one. Reference grades
+    are relative to user_video_path's keyframe statistics unless
+    options['relativeGrading'] is off; options['sceneAdaptive'] grades each scene
+    of user_video_path separately.
+    """
+    
+    emit(f"PROGRESS:50")
+    with tracing.span('filter_build'):
+        if reference_style:
+            emit(f"Applying reference-based style transfer...")
+            input_profile = None
+            if options.get('relativeGrading', True) and user_video_path and not is_stream(user_video_path):
+                # Keyframes only, so grading relative to the input costs no second full decode
+                with tracing.span('input_scan'):
+                    try:
+                        input_profile = scan_input(user_video_path, options)
+                    except (OSError, subprocess.CalledProcessError) as e:
+                        emit(f"Input scan failed, using absolute grading: {e}")
+            video_filters = apply_reference_style_filters(reference_style, options, input_profile, emit)
+            # A pipe cannot be analyzed ahead of the encode
+            if options.get('sceneAdaptive') and user_video_path and not is_stream(user_video_path):
+                conflict = scene_timing_conflict(options)
+                if conflict:
+                    emit(f"Scene-adaptive grading is not available for {conflict} jobs, using the static grade")
+                else:
+                    with tracing.span('scenes'):
+                        video_filters = scene_adaptive_filters(user_video_path, video_filters, emit)
+        else:
+            emit(f"Applying {style_template} template style transfer...")
+            video_filters = apply_template_style_filters(style_template, options)
+        
+        # Collapse the color-only filters into one cached 3D LUT pass
+        if options.get('bakeLut'):
+            video_filters = bake_color_filters(video_filters)
+            emit(f"Using baked LUT filters: {video_filters}")
+    
+    return video_filters
+
+def render_cache_key(user_video_path, output_path, video_filters, audio_filters, profile, audio_source, segmented):
+    """
+    Content hash of everything that determines the rendered output, or None if
+    unhashable. The sampled fingerprint is tied to the inputs' file identity,
+    so an input rewritten in place is never served a stale render.
+    """
+    try:
+        audio_key = [fingerprint(audio_source), file_identity(audio_source)] if audio_source else None
+        return fingerprint(
+            user_video_path, 'render', file_identity(user_video_path), video_filters, audio_filters, profile,
+            audio_key, segmented, os.path.splitext(output_path)[1].lower()
+        )
+    except OSError as e:
+        print(f"Error fingerprinting input video: {e}", file=sys.stderr)
+        return None
+
+def encode_video(user_video_path, output_path, video_info, video_filters, audio_filters, options, emit=print):
+    """
+    Encode the styled output, segment-parallel when options['segments'] asks for it.
+    Identical renders are served from the render cache; returns 'hit' or 'miss',
+    or None when options['renderCache'] is off.
+    """
+    
+    duration = media_duration(video_info)
+    segments = job_segments(options, duration)
+    profile = resolve_encoder_profile(options)
+    emit(f"Using {profile['name']} encoder profile")
+    
+    audio_source = reusable_audio(options, emit)
+    if audio_source:
+        emit(f"Reusing normalized audio from {audio_source}")
+    
+    # Nothing to re-encode in parallel when the video stream is copied as-is
+    segmented = segments > 1 and bool(duration) and bool(video_filters)
+    
+    key = None
+    if options.get('renderCache', True):
+        key = render_cache_key(
+            user_video_path, output_path, video_filters, audio_filters, profile, audio_source,
+            segments if segmented else 0
+        )
+    if key and render_cache().fetch(key, output_path):
+        emit(f"Render cache hit, reusing previous output")
+        return 'hit'
+    
+    with staged_output(output_path) as staged_path:
+        encode_styled(
+            user_video_path, staged_path, video_info, video_filters, audio_filters, options,
+            profile, audio_source, segments if segmented else 0, emit, checkpoint_path=output_path
+        )
+    
+    if key:
+        render_cache().store(key, output_path)
+        return 'miss'
+    return None
+
+def job_segments(options, duration):
+    """Segment count for a job; checkpointed jobs get at least one per CHECKPOINT_SEGMENT_SECONDS"""
+    segments = int(options.get('segments', 0) or 0)
+    if options.get('checkpoint') and duration:
+        segments = max(segments, math.ceil(duration / CHECKPOINT_SEGMENT_SECONDS))
+    return segments
+
+def encode_styled(user_video_path, output_path, video_info, video_filters, audio_filters, options,
+                  profile, audio_source, segments, emit=print, checkpoint_path=None):
+    """
+    Run the ffmpeg encode for encode_video; segments > 1 selects segmented mode.
+    Checkpoints are kept next to checkpoint_path (default output_path), so a
+    staged encode still resumes from its final output path.
+    """
+    
+    duration = media_duration(video_info)
+    
+    if segments > 1:
+        # Chunked mode: encode keyframe-aligned segments on a pool of ffmpeg processes
+        workers = options.get('segmentWorkers')
+        checkpoint_dir = checkpoint_key = None
+        if options.get('checkpoint'):
+            # Same output path and same encode inputs resume from the segments already done
+            checkpoint_dir = (checkpoint_path or output_path) + CHECKPOINT_SUFFIX
+            checkpoint_key = fingerprint(
+                user_video_path, 'checkpoint', video_filters, audio_filters, profile, audio_source, segments
+            )
+        emit(f"Encoding in up to {segments} parallel segments...")
+        used, resumed = encode_segmented(
+            user_video_path, output_path, video_filters, audio_filters,
+            video_codec_args(profile), audio_codec_args(profile), duration,
+            has_audio=has_audio(video_info), segments=segments, workers=workers,
+            on_progress=progress_reporter(emit, 60, 90), audio_source=audio_source,
+            checkpoint_dir=checkpoint_dir, checkpoint_key=checkpoint_key
+        )
+        if resumed:
+            emit(f"Resumed after {resumed} checkpointed segments")
+        emit(f"Encoded {used} segments")
+        return None
+    
+    # Build and execute FFmpeg command
+    ffmpeg_cmd = build_ffmpeg_command(
+        user_video_path, output_path, video_filters, audio_filters,
+        profile, copy_audio=audio_copyable(video_info), audio_source=audio_source
+    )
+    
+    emit(f"Running ffmpeg command: {' '.join(ffmpeg_cmd)}")
+    
+    # Stream ffmpeg's own progress so PROGRESS moves through 60..90 as it encodes
+    return run_ffmpeg(ffmpeg_cmd, duration, progress_reporter(emit, 60, 90))
+
+def render_preview(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit=print):
+    """Render a low-res excerpt or still grid in bounded time, reporting PROGRESS/METRICS through emit"""
+    
+    start_time = time.time()
+    settings = preview_settings(options)
+    
+    emit(f"PROGRESS:5")
+    emit(f"Starting {settings['mode']} preview for job {job_id}")
+    
+    video_info = get_video_info(user_video_path)
+    if not video_info:
+        raise Exception("Failed to analyze video")
+    
+    emit(f"PROGRESS:25")
+    reference_style = analyze_reference(reference_video_path, options, emit)
+    video_filters = build_style_filters(reference_style, style_template, options, emit, user_video_path)
+    
+    # Previews are scaled down before the style filters, so grain and sharpening are retuned to match
+    source_height, _ = source_geometry(video_info)
+    if source_height:
+        video_filters = retune_filters(video_filters, int(settings['height']) / source_height)
+    
+    if settings['mode'] == 'grid' and not output_path.lower().endswith(PREVIEW_IMAGE_EXTENSIONS):
+        output_path = os.path.splitext(output_path)[0] + '.jpg'
+    
+    emit(f"PROGRESS:60")
+    clip_duration = float(settings['duration']) if settings['mode'] == 'clip' else None
+    with staged_output(output_path) as staged_path:
+        ffmpeg_cmd = build_preview_command(user_video_path, staged_path, video_filters, media_duration(video_info), settings)
+        emit(f"Running ffmpeg command: {' '.join(ffmpeg_cmd)}")
+        run_ffmpeg(ffmpeg_cmd, clip_duration, progress_reporter(emit, 60, 90))
+    
+    metrics = calculate_metrics(user_video_path, output_path, time.time() - start_time, frame_pixel_count(video_info))
+    metrics['preview'] = settings['mode']
+    metrics['output_path'] = output_path
+    
+    emit(f"PROGRESS:100")
+    emit(f"METRICS:{json.dumps(metrics)}")
+    
+    return metrics
+
+def stream_job(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit=print):
+    """Encode from a file or pipe to fragmented MP4 as the frames arrive, reporting PROGRESS/METRICS through emit"""
+    
+    start_time = time.time()
+    
+    emit(f"PROGRESS:5")
+    emit(f"Starting streaming processing for job {job_id}")
+    
+    # A pipe can only be read once, so it is never probed
+    video_info = None if is_stream(user_video_path) else get_video_info(user_video_path)
+    
+    emit(f"PROGRESS:25")
+    reference_style = analyze_reference(reference_video_path, options, emit)
+    video_filters = build_style_filters(reference_style, style_template, options, emit, user_video_path)
+    video_filters = downscale_filters(video_filters, video_info, options, emit)
+    
+    # Two-pass loudness needs a seekable input; streams get single-pass loudnorm
+    audio_filters = job_audio_filters(user_video_path, video_info, options, emit) if video_info else build_audio_filters(options)
+    
+    profile = resolve_encoder_profile(options)
+    ffmpeg_cmd = build_stream_command(user_video_path, output_path, video_filters, audio_filters, profile)
+    
+    emit(f"PROGRESS:60")
+    emit(f"Running ffmpeg command: {' '.join(ffmpeg_cmd)}")
+    
+    # A file output grows in place for its readers, so it cannot be staged; an
+    # older file there is removed rather than truncated, as it may be linked
+    # into the render cache
+    remove_partial(output_path)
+    stdin, stdout = stream_io(user_video_path, output_path)
+    result = run_ffmpeg(ffmpeg_cmd, media_duration(video_info), progress_reporter(emit, 60, 90), stdin, stdout) or {}
+    
+    processing_time = time.time() - start_time
+    metrics = {
+        "processing_time": f"{int(processing_time // 60)}:{int(processing_time % 60):02d}",
+        # The streamed output cannot be read back for scoring
+        "style_match": None,
+        "colors_analyzed": frame_pixel_count(video_info),
+        "output_size": f"{result.get('size', 0) / (1024 * 1024):.0f}MB",
+        "encoder_profile": profile['name'],
+        "streamed": True
+    }
+    
+    emit(f"PROGRESS:100")
+    emit(f"METRICS:{json.dumps(metrics)}")
+    
+    return metrics
+
+def job_output_files(options, output_path):
+    """Files a job writes: output_path, or every file of a multi-output job"""
+    if options.get('outputs'):
+        return [path for output in resolve_outputs(options, output_path) for path in output_files(output)]
+    return [output_path]
+
+def output_metrics(output, style_match):
+    """Per-output entry of METRICS.outputs"""
+    files = [path for path in output_files(output) if os.path.exists(path)]
+    size = sum(os.path.getsize(path) for path in files)
+    metrics = {
+        'name': output['name'],
+        'kind': output['kind'],
+        'template': output['template'],
+        'files': files,
+        'size_bytes': size,
+        'output_size': f"{size / (1024 * 1024):.0f}MB",
+    }
+    if output['kind'] == 'video':
+        video = video_stream(get_video_info(output['path']))
+        metrics['resolution'] = f"{video.get('width')}x{video.get('height')}" if video else None
+        metrics['encoder_profile'] = output['profile']['name']
+        metrics['style_match'] = style_match
+    return metrics
+
+def render_outputs(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit=print):
+    """Render every options['outputs'] deliverable from one decode, reporting per-output METRICS through emit"""
+    
+    start_time = time.time()
+    outputs = resolve_outputs(options, output_path)
+    
+    emit(f"PROGRESS:5")
+    emit(f"Starting {len(outputs)}-output processing for job {job_id}")
+    
+    with tracing.activate(tracing.Trace(job_id)) as trace:
+        with tracing.span('probe'):
+            video_info = get_video_info(user_video_path)
+        if not video_info:
+            raise Exception("Failed to analyze video")
+        
+        emit(f"PROGRESS:25")
+        # The job's own chain plus one chain per extra template, each run once in the graph
+        reference_style = analyze_reference(reference_video_path, options, emit)
+        chains = {None: build_style_filters(reference_style, style_template, options, emit, user_video_path)}
+        for output in outputs:
+            if output['template'] not in chains:
+                chains[output['template']] = apply_template_style_filters(output['template'], options)
+        # Every chain starts at the target size; the outputs then scale from there
+        chains = {name: downscale_filters(chain, video_info, options, emit) for name, chain in chains.items()}
+        
+        with tracing.span('audio'):
+            audio_filters = job_audio_filters(user_video_path, video_info, options, emit)
+        
+        duration = media_duration(video_info)
+        emit(f"PROGRESS:60")
+        with contextlib.ExitStack() as stack:
+            # Video outputs are staged like a single render; thumbnail patterns are written directly
+            staged = [
+                dict(output, path=stack.enter_context(staged_output(output['path'])))
+                if output['kind'] == 'video' else output
+                for output in outputs
+            ]
+            ffmpeg_cmd = build_multi_output_command(
+                user_video_path, staged, chains, audio_filters, duration, has_audio(video_info)
+            )
+            emit(f"Running ffmpeg command: {' '.join(ffmpeg_cmd)}")
+            with tracing.span('encode'):
+                run_ffmpeg(ffmpeg_cmd, duration, progress_reporter(emit, 60, 90))
+        
+        emit(f"PROGRESS:95")
+        with tracing.span('score'):
+            per_output = []
+            for output in outputs:
+                style_match = None
+                if output['kind'] == 'video':
+                    reference = reference_style if output['template'] is None else None
+                    style_match = measure_style_match(output['path'], reference, options, emit)
+                per_output.append(output_metrics(output, style_match))
+        
+        # Top-level metrics describe the first video output, as for a single render
+        primary = next((output for output in per_output if output['kind'] == 'video'), per_output[0])
+        metrics = calculate_metrics(
+            user_video_path, primary['files'][0] if primary['files'] else output_path,
+            time.time() - start_time, frame_pixel_count(video_info), primary.get('style_match')
+        )
+        metrics['outputs'] = per_output
+        metrics['resource_policy'] = resources.current_policy()
+        metrics['trace'] = trace.summary()
+    
+    emit(f"PROGRESS:100")
+    emit(f"TRACE:{json.dumps(metrics['trace'])}")
+    emit(f"METRICS:{json.dumps(metrics)}")
+    
+    return metrics
+
+def process_job(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit=print):
+    """Run a single style transfer job under its resource policy, reporting PROGRESS/METRICS lines through emit"""
+    
+    # Previews are interactive unless the job asks for another class
+    policy = resources.resolve_resource_policy(options, 'interactive' if options.get('preview') else None)
+    
+    try:
+        with resources.activate(policy):
+            if options.get('preview'):
+                return render_preview(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit)
+            
+            if options.get('outputs'):
+                return render_outputs(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit)
+            
+            if streaming_requested(user_video_path, output_path, options):
+                return stream_job(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit)
+            
+            return render_job(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit)
+    except JobCancelled:
+        # Checkpointed segments stay next to the output for a resume; the partial output does not
+        emit(f"Job {job_id} cancelled, removing partial output")
+        for path in job_output_files(options, output_path):
+            remove_partial(path)
+        raise
+
+def render_metrics(user_video_path, output_path, processing_time, colors_analyzed, style_match,
+                   options, render_cache_status, trace):
+    """METRICS payload of a full render: output metrics plus encoder, cache, policy and trace details"""
+    metrics = calculate_metrics(user_video_path, output_path, processing_time, colors_analyzed, style_match)
+    metrics['encoder_profile'] = resolve_encoder_profile(options)['name']
+    metrics['style_cache'] = style_profile_cache().stats()
+    metrics['input_style_cache'] = input_style_cache().stats()
+    metrics['loudness_cache'] = loudness_cache().stats()
+    metrics['probe_cache'] = probe_stats()
+    metrics['render_cache'] = dict(render_cache().stats(), status=render_cache_status)
+    metrics['resource_policy'] = resources.current_policy()
+    metrics['trace'] = trace.summary()
+    return metrics
+
+def render_job(user_video_path, reference_video_path, style_template, options, output_path, job_id, emit=print):
+    """Full render with audio normalization, render cache, tracing and style scoring"""
+    
+    start_time = time.time()
+    
+    emit(f"PROGRESS:5")
+    emit(f"Starting video processing for job {job_id}")
+    
+    with tracing.activate(tracing.Trace(job_id)) as trace:
+        emit(f"PROGRESS:15")
+        emit(f"Analyzing input video: {user_video_path}")
+        
+        # Get video info for metrics
+        with tracing.span('probe'):
+            video_info = get_video_info(user_video_path)
+        if not video_info:
+            raise Exception("Failed to analyze video")
+        
+        # Calculate colors analyzed from video resolution
+        colors_analyzed = frame_pixel_count(video_info)
+        
+        emit(f"PROGRESS:25")
+        emit(f"Preparing style filters...")
+        
+        reference_style = analyze_reference(reference_video_path, options, emit)
+        video_filters = build_style_filters(reference_style, style_template, options, emit, user_video_path)
+        video_filters = downscale_filters(video_filters, video_info, options, emit)
+        
+        emit(f"Measuring audio loudness...")
+        with tracing.span('audio'):
+            audio_filters = job_audio_filters(user_video_path, video_info, options, emit)
+        
+        emit(f"PROGRESS:60")
+        emit(f"Processing video with style filters...")
+        
+        with tracing.span('encode') as encode_span:
+            render_cache_status = encode_video(user_video_path, output_path, video_info, video_filters, audio_filters, options, emit)
+        
+        emit(f"PROGRESS:90")
+        emit(f"FFmpeg processing completed successfully")
+        
+        # Frames actually written, which also covers segmented and cached renders
+        with tracing.span('post_probe'):
+            output_frames = frame_count(get_video_info(output_path))
+        if output_frames:
+            encode_span['frames'] = output_frames
+        # A cache hit only copied the file, so its frames over that time are no encode rate
+        encode_span['cached'] = render_cache_status == 'hit'
+        
+        emit(f"PROGRESS:95")
+        emit(f"Calculating metrics...")
+        
+        with tracing.span('score'):
+            style_match = measure_style_match(output_path, reference_style, options, emit)
+        
+        # Calculate processing time and metrics
+        end_time = time.time()
+        processing_time = end_time - start_time
+        
+        metrics = render_metrics(
+            user_video_path, output_path, processing_time, colors_analyzed, style_match,
+            options, render_cache_status, trace
+        )
+    
+    emit(f"PROGRESS:100")
+    emit(f"Video processing completed successfully")
+    emit(f"TRACE:{json.dumps(metrics['trace'])}")
+    emit(f"METRICS:{json.dumps(metrics)}")
+    
+    return metrics
+
+# Public job API
+
+def analyze(reference_video_path: str, options: dict | None = None, emit=print) -> dict | None:
+    """Style profile of a reference video (cached by content), or None if it cannot be analyzed"""
+    options = options or {}
+    return get_reference_style(reference_video_path, int(options.get('analysisFrames') or STYLE_FRAME_BUDGET), emit)
+
+def build_graph(user_video_path: str | None, reference_video_path: str | None = None, style_template: str | None = None,
+                options: dict | None = None, emit=print) -> list[str]:
+    """Video filter chain that styles user_video_path like the reference, or like the template without one"""
+    options = options or {}
+    reference_style = analyze_reference(reference_video_path, options, emit)
+    video_filters = build_style_filters(reference_style, style_template, options, emit, user_video_path)
+    video_info = None
+    if any(target_settings(options)) and user_video_path and not is_stream(user_video_path):
+        video_info = get_video_info(user_video_path)
+    return downscale_filters(video_filters, video_info, options, emit)
+
+def render(user_video_path: str, output_path: str, reference_video_path: str | None = None, style_template: str | None = None,
+           options: dict | None = None, job_id: str = 'local', emit=print) -> dict:
+    """Run a whole job (full render, preview, stream or multi-output per options) and return its metrics"""
+    return process_job(user_video_path, reference_video_path, style_template, options or {}, output_path, job_id, emit)
+
+def measure(output_path: str, reference_video_path: str, options: dict | None = None, emit=print) -> int | None:
+    """Style match score (0-100) of a finished render against the reference, or None if it cannot be measured"""
+    options = options or {}
+    return measure_style_match(output_path, analyze(reference_video_path, options, emit), options, emit)
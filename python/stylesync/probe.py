@@ -0,0 +1,181 @@
+"""
+Memoized ffprobe layer
+Every probe result is keyed by (path, mtime, size), so the same file is parsed
+by ffprobe at most once per kind of probe for the lifetime of the process,
+whether it is asked for again later in the same job or by a later job.
+probe_media_async serves the asyncio job runner from the same memo.
+"""
+
+import os
+import asyncio
+import json
+import subprocess
+import threading
+from collections import OrderedDict
+
+from . import cancellation
+from . import resources
+from .ffmpeg_progress import run_capture
+
+# Maximum number of probe results kept in memory
+PROBE_CACHE_ENTRIES = 512
+
+# Length of the packet window read by probe_keyframe_interval
+KEYFRAME_PROBE_SECONDS = 30
+
+# signalstats tags collected per frame by probe_signalstats
+SIGNALSTATS_TAGS = ('YAVG', 'UAVG', 'VAVG', 'YMIN', 'YMAX')
+
+_results = OrderedDict()
+_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0}
+
+def _file_key(path):
+    stat = os.stat(path)
+    return (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+
+def _lookup(key):
+    """(True, result) for a memoized probe, else (False, None)"""
+    with _lock:
+        if key in _results:
+            _results.move_to_end(key)
+            _counters['hits'] += 1
+            return True, _results[key]
+        _counters['misses'] += 1
+        return False, None
+
+def _store(key, value):
+    with _lock:
+        _results[key] = value
+        _results.move_to_end(key)
+        while len(_results) > PROBE_CACHE_ENTRIES:
+            _results.popitem(last=False)
+    return value
+
+def clear_probe_cache():
+    """Forget every memoized probe result (benchmarks time the uncached probes)"""
+    with _lock:
+        _results.clear()
+
+def _memoized(kind, path, compute, *params):
+    key = (kind, _file_key(path)) + params
+    found, value = _lookup(key)
+    if found:
+        return value
+    return _store(key, compute())
+
+def _media_command(path):
+    return ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', path]
+
+def probe_media(path):
+    """Container and stream information (ffprobe -show_format -show_streams)"""
+    def compute():
+        result = run_capture(_media_command(path), text=True)
+        return json.loads(result.stdout)
+
+    return _memoized('media', path, compute)
+
+async def probe_media_async(path):
+    """probe_media for the event loop: ffprobe runs without blocking it and shares the same memo"""
+    key = ('media', _file_key(path))
+    found, value = _lookup(key)
+    if found:
+        return value
+
+    cancellation.check()
+    process = await asyncio.create_subprocess_exec(
+        *resources.limit_command(_media_command(path)),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    cancellation.register(process)
+    try:
+        stdout, stderr = await process.communicate()
+    except BaseException:
+        # Cancelled or timed out: do not leave ffprobe behind
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    finally:
+        cancellation.unregister(process)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, _media_command(path), stdout, stderr.decode('utf-8', errors='replace')
+        )
+    return _store(key, json.loads(stdout))
+
+def probe_signalstats(path, frames):
+    """Per-frame signalstats tags for the first `frames` frames"""
+    def compute():
+        entries = ','.join(f"lavfi.signalstats.{tag}" for tag in SIGNALSTATS_TAGS)
+        cmd = [
+            'ffprobe', '-v', 'quiet', '-f', 'lavfi', '-i', f'movie={path},signalstats',
+            '-show_entries', f'frame=pkt_pts_time:frame_tags={entries}',
+            '-print_format', 'json', '-read_intervals', f'%+#{frames}'
+        ]
+        result = run_capture(cmd, text=True)
+        return json.loads(result.stdout)
+
+    return _memoized('signalstats', path, compute, frames)
+
+def probe_keyframes(path):
+    """Presentation times of every video keyframe, read from packet flags without decoding"""
+    def compute():
+        cmd = [
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path
+        ]
+        result = run_capture(cmd, text=True)
+
+        times = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(',')
+            if 'K' not in flags:
+                continue
+            try:
+                times.append(float(pts_time))
+            except ValueError:
+                continue
+        return sorted(times)
+
+    return _memoized('keyframes', path, compute)
+
+def probe_keyframe_interval(path):
+    """
+    Median seconds between video keyframes, from the packet flags of the first
+    KEYFRAME_PROBE_SECONDS only, or None when that window holds fewer than two
+    keyframes (the GOP is at least as long as the window)
+    """
+    def compute():
+        cmd = [
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0', '-read_intervals', f'%+{KEYFRAME_PROBE_SECONDS}',
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path
+        ]
+        result = run_capture(cmd, text=True)
+
+        times = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(',')
+            if 'K' in flags:
+                try:
+                    times.append(float(pts_time))
+                except ValueError:
+                    continue
+        times.sort()
+        gaps = sorted(later - earlier for earlier, later in zip(times, times[1:]))
+        return gaps[len(gaps) // 2] if gaps else None
+
+    return _memoized('keyframe_interval', path, compute)
+
+def video_stream(info):
+    """First video stream in a probe_media result, or None"""
+    return next((s for s in (info or {}).get('streams', []) if s.get('codec_type') == 'video'), None)
+
+def has_audio(info):
+    return any(s.get('codec_type') == 'audio' for s in (info or {}).get('streams', []))
+
+def probe_stats():
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,172 @@
+"""
+Per-job resource policies for ffmpeg children
+A policy caps a job's ffmpeg processes: encoder/filter thread count, CPU
+priority (nice), I/O priority (ionice class), CPU affinity set and address
+space ceiling (RLIMIT_AS). Jobs pick a named priority class with
+options['priorityClass'] and may override individual fields with
+options['resources'], so interactive previews keep their latency while bulk
+batch renders soak up whatever is left.
+
+Priority, I/O class and affinity are command prefixes (nice, ionice, taskset)
+that exec ffmpeg already constrained, so the threads it starts inherit them;
+a preexec_fn would be unsafe in the threaded worker and batch runners. Only
+the memory ceiling is set on the pid after start. The active policy travels
+in a context variable, like the trace, so segmented encodes and concurrent
+worker jobs each use their own.
+"""
+
+import contextvars
+import os
+import resource
+import shutil
+from contextlib import contextmanager
+
+PRIORITY_CLASSES = {
+    # Previews and anything a user is waiting on
+    'interactive': {
+        'threads': None,       # None leaves the thread count to ffmpeg
+        'nice': 0,
+        'io_class': None,      # None leaves I/O scheduling alone
+        'cpus': None,          # None allows every CPU
+        'memory_mb': None,     # None sets no address space ceiling
+    },
+    # Regular full renders
+    'standard': {
+        'threads': None,
+        'nice': 5,
+        'io_class': 'best-effort',
+        'cpus': None,
+        'memory_mb': None,
+    },
+    # Bulk and background renders: only idle CPU and disk time
+    'batch': {
+        'threads': max(1, (os.cpu_count() or 2) // 2),
+        'nice': 15,
+        'io_class': 'idle',
+        'cpus': None,
+        'memory_mb': None,
+    },
+}
+
+DEFAULT_PRIORITY_CLASS = os.environ.get('STYLESYNC_PRIORITY_CLASS', 'standard')
+
+# ionice -c values
+IO_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+
+_current_policy = contextvars.ContextVar('stylesync_resource_policy', default=None)
+
+def resolve_resource_policy(options, default=None):
+    """Return the resource policy for a job: named priority class plus any per-job overrides"""
+    name = options.get('priorityClass') or default or DEFAULT_PRIORITY_CLASS
+    if name not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class: {name} (expected one of {', '.join(PRIORITY_CLASSES)})")
+
+    policy = dict(PRIORITY_CLASSES[name], name=name)
+    overrides = options.get('resources') or {}
+    unknown = set(overrides) - set(PRIORITY_CLASSES[name])
+    if unknown:
+        raise ValueError(f"Unknown resource settings: {', '.join(sorted(unknown))}")
+    policy.update(overrides)
+
+    if policy['io_class'] is not None and policy['io_class'] not in IO_CLASSES:
+        raise ValueError(f"Unknown io_class: {policy['io_class']} (expected one of {', '.join(IO_CLASSES)})")
+    if policy['cpus'] is not None:
+        policy['cpus'] = sorted({int(cpu) for cpu in policy['cpus']})
+    return policy
+
+@contextmanager
+def activate(policy):
+    """Apply policy to every ffmpeg process run_ffmpeg starts in this context"""
+    token = _current_policy.set(policy)
+    try:
+        yield policy
+    finally:
+        _current_policy.reset(token)
+
+def current_policy():
+    return _current_policy.get()
+
+def available_cpus(policy=None):
+    """CPUs the active policy lets a job use: its thread cap, affinity set or the machine"""
+    policy = policy or current_policy() or {}
+    count = len(policy['cpus']) if policy.get('cpus') else (os.cpu_count() or 1)
+    if policy.get('threads'):
+        count = min(count, int(policy['threads']))
+    return max(1, count)
+
+# ffmpeg options that take no value; every other option consumes the next argument
+FLAG_OPTIONS = {
+    '-y', '-n', '-nostats', '-nostdin', '-hide_banner', '-an', '-vn', '-sn', '-dn',
+    '-shortest', '-re', '-copyts', '-start_at_zero',
+}
+
+def _output_indices(cmd):
+    """Positions of the output paths in an ffmpeg command"""
+    indices = []
+    index = 1
+    while index < len(cmd):
+        arg = cmd[index]
+        if arg.startswith('-') and arg != '-' and arg not in FLAG_OPTIONS:
+            # -i and every other valued option: skip the value too
+            index += 2
+            continue
+        if arg == '-' or not arg.startswith('-'):
+            indices.append(index)
+        index += 1
+    return indices
+
+def _cap_threads(cmd, threads):
+    """Clamp every -threads value in cmd to threads, adding one to each output that has none"""
+    cmd = list(cmd)
+    for index, arg in enumerate(cmd[:-1]):
+        if arg == '-threads':
+            value = int(cmd[index + 1])
+            cmd[index + 1] = str(min(value, threads) if value > 0 else threads)
+
+    # Output options go between the previous output (or the last input) and the output path
+    groups = []
+    start = 1
+    for index in _output_indices(cmd):
+        inputs = [i for i in range(start, index) if cmd[i] == '-i']
+        if inputs:
+            start = inputs[-1] + 2
+        groups.append((start, index))
+        start = index + 1
+    # Back to front, so an insertion does not shift the outputs still to do
+    for start, index in reversed(groups):
+        if '-threads' not in cmd[start:index]:
+            cmd[index:index] = ['-threads', str(threads)]
+    return [cmd[0], '-filter_threads', str(threads), '-filter_complex_threads', str(threads)] + cmd[1:]
+
+def limit_command(cmd, policy=None):
+    """
+    ffmpeg/ffprobe command with the policy applied: ffmpeg's thread cap, then
+    nice, taskset and ionice prefixes that each exec the next in place
+    """
+    policy = policy or current_policy()
+    if not policy:
+        return list(cmd)
+
+    if policy.get('threads') and os.path.basename(cmd[0]) == 'ffmpeg':
+        cmd = _cap_threads(cmd, int(policy['threads']))
+    if policy.get('io_class') and shutil.which('ionice'):
+        cmd = ['ionice', '-c', str(IO_CLASSES[policy['io_class']])] + list(cmd)
+    if policy.get('cpus') and shutil.which('taskset'):
+        cmd = ['taskset', '-c', ','.join(str(cpu) for cpu in policy['cpus'])] + list(cmd)
+    if policy.get('nice') and shutil.which('nice'):
+        cmd = ['nice', '-n', str(int(policy['nice']))] + list(cmd)
+    return list(cmd)
+
+def apply_limits(pid, policy=None):
+    """Cap the address space of a freshly started child (the only limit without a command prefix)"""
+    policy = policy or current_policy()
+    if not policy:
+        return
+
+    try:
+        if policy.get('memory_mb') and hasattr(resource, 'prlimit'):
+            limit = int(policy['memory_mb']) * 1024 * 1024
+            resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+    except ProcessLookupError:
+        # The child already exited; run_ffmpeg reports its status
+        pass
@@ -0,0 +1,240 @@
+"""
+Scene-adaptive grading
+One cheap pass decodes the input at a low frame rate and tiny size, finds scene
+cuts from luma histogram changes between neighbouring frames and measures each
+scene's luma and chroma. Frames are read from the decoder in fixed-size blocks
+and folded into running per-scene sums, so memory does not grow with the
+input's length. The static eq/colorbalance of a reference grade then
+become named filter instances driven by a sendcmd script, so every scene gets
+its own parameters inside the same single encode instead of re-encoding
+scene by scene. Scene analyses are cached per input content hash.
+
+The sendcmd script uses scene start times on the input's own timeline, so it
+only fits encodes that start at t=0: previews (cut with -ss) and segmented or
+checkpointed encodes (whose chunks restart at t=0) keep the static grade.
+"""
+
+import hashlib
+import os
+import subprocess
+
+from .cache import CACHE_ROOT, fingerprint, scene_cache
+from .ffmpeg_progress import run_capture
+from .style_analysis import np, numpy_available
+
+# Decode size and rate for scene detection
+SCENE_WIDTH = 64
+SCENE_HEIGHT = 36
+SCENE_FPS = 5
+THUMBNAIL_FRAME_BYTES = 3 * SCENE_WIDTH * SCENE_HEIGHT
+
+# Thumbnails read from the decoder per block, bounding memory for any input length
+SCENE_BLOCK_FRAMES = 256
+
+# Mean absolute luma-histogram change (0 to 2) that counts as a cut
+SCENE_CUT_THRESHOLD = float(os.environ.get('SCENE_CUT_THRESHOLD', 0.5))
+
+# Scenes shorter than this are merged into the previous one
+MIN_SCENE_SECONDS = 1.0
+
+# How strongly each scene is pulled toward the clip-wide average before grading
+SCENE_LUMA_GAIN = 0.5
+SCENE_CHROMA_GAIN = 0.3
+MAX_BRIGHTNESS_SHIFT = 0.15
+SATURATION_RANGE = (0.8, 1.25)
+
+# sendcmd scripts live next to the cached scene analyses
+SCENE_COMMAND_DIR = CACHE_ROOT / 'scenes'
+
+def thumbnail_command(video_path):
+    """ffmpeg writing a frame every 1/SCENE_FPS seconds as raw SCENE_WIDTH x SCENE_HEIGHT YUV444"""
+    return [
+        'ffmpeg', '-v', 'error', '-i', video_path, '-map', '0:v:0',
+        '-vf', f"fps={SCENE_FPS},scale={SCENE_WIDTH}:{SCENE_HEIGHT},format=yuv444p",
+        '-f', 'rawvideo', '-pix_fmt', 'yuv444p', 'pipe:1'
+    ]
+
+class SceneAccumulator:
+    """
+    Finds cuts and per-scene means over thumbnail frames fed in blocks. Only
+    the running sums of the open scene and the previous frame's histogram are
+    kept between blocks.
+    """
+
+    def __init__(self):
+        self.scenes = []
+        self.frames = 0
+        self._previous = None
+        self._start = 0
+        self._sums = np.zeros(4)
+
+    def add(self, block):
+        """Consume a block of whole frames; a trailing partial frame is dropped"""
+        count = len(block) // THUMBNAIL_FRAME_BYTES
+        if count == 0:
+            return
+        frames = np.frombuffer(block[:count * THUMBNAIL_FRAME_BYTES], dtype=np.uint8).reshape(count, 3, -1)
+
+        histograms = np.stack([np.bincount(row >> 3, minlength=32) for row in frames[:, 0]]).astype(np.float32)
+        histograms /= histograms.sum(axis=1, keepdims=True)
+        previous = histograms[:1] if self._previous is None else self._previous[np.newaxis]
+        change = np.abs(np.diff(np.concatenate([previous, histograms]), axis=0)).sum(axis=1)
+
+        planes = frames.astype(np.float32)
+        u, v = planes[:, 1], planes[:, 2]
+        stats = np.column_stack([
+            planes.mean(axis=2),
+            np.sqrt((u - 128) ** 2 + (v - 128) ** 2).mean(axis=1) / 128
+        ])
+
+        min_gap = int(MIN_SCENE_SECONDS * SCENE_FPS)
+        for offset in range(count):
+            index = self.frames + offset
+            if change[offset] > SCENE_CUT_THRESHOLD and index - self._start >= min_gap:
+                self._close(index)
+            self._sums += stats[offset]
+
+        self.frames += count
+        self._previous = histograms[-1]
+
+    def _close(self, end):
+        y, u, v, colorfulness = self._sums / (end - self._start)
+        self.scenes.append({
+            'start': round(self._start / SCENE_FPS, 3),
+            'frames': int(end - self._start),
+            'y_mean': round(float(y), 2),
+            'u_mean': round(float(u), 2),
+            'v_mean': round(float(v), 2),
+            'colorfulness': round(float(colorfulness), 5)
+        })
+        self._start = end
+        self._sums = np.zeros(4)
+
+    def finish(self):
+        """Close the last scene and return the scene list"""
+        if self.frames > self._start:
+            self._close(self.frames)
+        return self.scenes
+
+def analyze_scenes(video_path):
+    """Scene list [{start, frames, y_mean, u_mean, v_mean, colorfulness}] for video_path"""
+    scenes = SceneAccumulator()
+    run_capture(
+        thumbnail_command(video_path),
+        on_block=scenes.add,
+        block_size=SCENE_BLOCK_FRAMES * THUMBNAIL_FRAME_BYTES
+    )
+    return scenes.finish()
+
+def get_scenes(video_path):
+    """Scene analysis for video_path, reusing a cached analysis of identical content"""
+    key = fingerprint(video_path, 'scenes', SCENE_FPS, SCENE_WIDTH, SCENE_HEIGHT, SCENE_CUT_THRESHOLD)
+    cache = scene_cache()
+    scenes = cache.get(key)
+    if scenes is None:
+        scenes = analyze_scenes(video_path)
+        cache.put(key, scenes)
+    return scenes
+
+def parse_filter(spec):
+    """'eq=a=1:b=2' -> ('eq', {'a': '1', 'b': '2'})"""
+    name, _, args = spec.partition('=')
+    params = {}
+    for pair in args.split(':'):
+        key, sep, value = pair.partition('=')
+        if sep:
+            params[key] = value
+    return name, params
+
+def format_filter(name, params):
+    return f"{name}=" + ':'.join(f"{key}={value}" for key, value in params.items())
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+def scene_commands(scenes, eq_params, balance_params):
+    """sendcmd script setting eq@scene / colorbalance@scene values at each scene start"""
+    weights = np.array([scene['frames'] for scene in scenes], dtype=np.float64)
+    clip_y = float(np.average([scene['y_mean'] for scene in scenes], weights=weights))
+    clip_u = float(np.average([scene['u_mean'] for scene in scenes], weights=weights))
+    clip_v = float(np.average([scene['v_mean'] for scene in scenes], weights=weights))
+    clip_color = float(np.average([scene['colorfulness'] for scene in scenes], weights=weights))
+
+    base_brightness = float(eq_params.get('brightness', 0))
+    base_saturation = float(eq_params.get('saturation', 1))
+    base_rs = float(balance_params.get('rs', 0))
+    base_gs = float(balance_params.get('gs', 0))
+    base_bs = float(balance_params.get('bs', 0))
+
+    lines = []
+    for scene in scenes:
+        # Pull each scene toward the clip average, then apply the global grade on top
+        shift = clamp((clip_y - scene['y_mean']) / 255 * SCENE_LUMA_GAIN, -MAX_BRIGHTNESS_SHIFT, MAX_BRIGHTNESS_SHIFT)
+        ratio = clip_color / scene['colorfulness'] if scene['colorfulness'] > 1e-3 else 1.0
+        saturation = base_saturation * clamp(ratio ** 0.5, *SATURATION_RANGE)
+        warm = (clip_v - scene['v_mean']) / 128 * SCENE_CHROMA_GAIN
+        green = (clip_u - scene['u_mean']) / 128 * SCENE_CHROMA_GAIN
+
+        commands = [
+            f"eq@scene brightness {clamp(base_brightness + shift, -1, 1):.3f}",
+            f"eq@scene saturation {clamp(saturation, 0, 3):.3f}",
+            f"colorbalance@scene rs {clamp(base_rs + warm, -1, 1):.3f}",
+            f"colorbalance@scene gs {clamp(base_gs + green, -1, 1):.3f}",
+            f"colorbalance@scene bs {clamp(base_bs - warm, -1, 1):.3f}",
+        ]
+        lines.append(f"{scene['start']:.3f} [enter] {', '.join(commands)};")
+    return '\n'.join(lines) + '\n'
+
+def write_commands(script):
+    """Store a sendcmd script under a content-addressed name and return its path"""
+    path = SCENE_COMMAND_DIR / f"{hashlib.blake2b(script.encode(), digest_size=16).hexdigest()}.cmd"
+    if not path.exists():
+        SCENE_COMMAND_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(script)
+        os.replace(tmp_path, path)
+    return path
+
+def scene_timing_conflict(options):
+    """Name of the job mode whose encode does not start at the input's t=0, or None"""
+    if options.get('preview'):
+        return 'preview'
+    if options.get('checkpoint'):
+        return 'checkpoint'
+    if int(options.get('segments', 0) or 0) > 1:
+        return 'segmented'
+    return None
+
+def scene_adaptive_filters(video_path, video_filters, emit=print):
+    """
+    Turn the first eq and colorbalance of a static chain into per-scene
+    instances driven by sendcmd. Returns video_filters unchanged when NumPy is
+    missing, the clip has a single scene, or the chain has no eq/colorbalance.
+    """
+    if not numpy_available():
+        emit("Scene-adaptive grading needs NumPy, using the static grade")
+        return list(video_filters)
+
+    try:
+        scenes = get_scenes(video_path)
+    except (OSError, subprocess.CalledProcessError) as e:
+        emit(f"Scene analysis failed, using the static grade: {e}")
+        return list(video_filters)
+    if len(scenes) < 2:
+        return list(video_filters)
+
+    names = [parse_filter(spec)[0] for spec in video_filters]
+    if 'eq' not in names or 'colorbalance' not in names:
+        return list(video_filters)
+
+    filters = list(video_filters)
+    eq_index, balance_index = names.index('eq'), names.index('colorbalance')
+    _, eq_params = parse_filter(filters[eq_index])
+    _, balance_params = parse_filter(filters[balance_index])
+    filters[eq_index] = format_filter('eq@scene', eq_params)
+    filters[balance_index] = format_filter('colorbalance@scene', balance_params)
+
+    path = write_commands(scene_commands(scenes, eq_params, balance_params))
+    emit(f"Scene-adaptive grading across {len(scenes)} scenes")
+    return [f"sendcmd=f='{path}'"] + filters
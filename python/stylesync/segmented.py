@@ -0,0 +1,242 @@
+"""
+Segment-parallel encoding for long videos
+Splits the input at keyframes with a stream copy, styles and encodes every
+segment in its own ffmpeg process, then concatenates the results without
+re-encoding. Audio is normalized once over the full track so loudness stays
+consistent across segment boundaries. In checkpointed mode the segments live
+in a directory next to the output with a manifest of the finished ones, so a
+restarted job picks up after the last segment that completed.
+"""
+
+import contextvars
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .ffmpeg_progress import run_ffmpeg, run_capture
+from .probe import probe_keyframes
+from .resources import available_cpus
+
+def plan_segments(keyframes, duration, count):
+    """Pick up to count-1 keyframe split points closest to evenly spaced boundaries"""
+    split_points = []
+    candidates = [t for t in keyframes if 0 < t < duration]
+    for i in range(1, count):
+        target = duration * i / count
+        previous = split_points[-1] if split_points else 0
+        remaining = [t for t in candidates if t > previous]
+        if not remaining:
+            break
+        split_points.append(min(remaining, key=lambda t: abs(t - target)))
+    return sorted(set(split_points))
+
+class SegmentProgress:
+    """Aggregate per-segment progress updates into one job-wide update"""
+
+    def __init__(self, durations, on_progress):
+        self.durations = durations
+        self.total = sum(durations) or None
+        self.on_progress = on_progress
+        self.out_times = [0.0] * len(durations)
+        self.fps = [0.0] * len(durations)
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def callback(self, index):
+        def update(progress):
+            with self._lock:
+                if progress['out_time'] is not None:
+                    self.out_times[index] = min(progress['out_time'], self.durations[index])
+                if progress['done']:
+                    self.out_times[index] = self.durations[index]
+                    self.fps[index] = 0.0
+                elif progress['fps'] is not None:
+                    self.fps[index] = progress['fps']
+                self._report()
+        return update
+
+    def _report(self):
+        if not self.on_progress:
+            return
+        encoded = sum(self.out_times)
+        elapsed = time.monotonic() - self.started
+        percent = None
+        eta = None
+        if self.total:
+            percent = min(100.0, encoded / self.total * 100)
+            if encoded > 0:
+                eta = (self.total - encoded) * elapsed / encoded
+        self.on_progress({
+            'percent': round(percent, 2) if percent is not None else None,
+            'out_time': round(encoded, 3),
+            'frame': None,
+            'fps': round(sum(self.fps), 2),
+            'speed': round(encoded / elapsed, 3) if elapsed > 0 else None,
+            'eta': round(eta, 1) if eta is not None else None,
+            'elapsed': round(elapsed, 3),
+            'done': percent == 100.0
+        })
+
+class SegmentManifest:
+    """
+    Checkpoint record for a resumable segmented encode: the split plan plus the
+    segments (and audio track) already encoded. Saved atomically after every
+    finished piece; a manifest whose key no longer matches the job is discarded.
+    """
+
+    FILENAME = 'manifest.json'
+
+    def __init__(self, directory, key):
+        self.path = os.path.join(directory, self.FILENAME)
+        self.key = key
+        self.data = {'key': key, 'chunks': None, 'durations': None, 'done': [], 'audio': None}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Adopt a previous run's manifest if it was written for the same job; True on resume"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('key') != self.key or not data.get('chunks'):
+            return False
+        self.data = data
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+    def mark_done(self, index):
+        with self._lock:
+            self.data['done'] = sorted(set(self.data['done']) | {index})
+            self.save()
+
+    def mark_audio(self, audio_path):
+        with self._lock:
+            self.data['audio'] = audio_path
+            self.save()
+
+def open_work_dir(output_path, checkpoint_dir, checkpoint_key):
+    """Work directory and manifest (None when not checkpointing) for encode_segmented"""
+    if not checkpoint_dir:
+        return tempfile.mkdtemp(prefix='stylesync_segments_', dir=os.path.dirname(os.path.abspath(output_path))), None
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest = SegmentManifest(checkpoint_dir, checkpoint_key)
+    if not manifest.load():
+        # Stale or unreadable checkpoint: start over in an empty directory
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        os.makedirs(checkpoint_dir)
+    return checkpoint_dir, manifest
+
+def encode_segmented(input_path, output_path, video_filters, audio_filters, video_codec_args, audio_codec_args,
+                     duration, has_audio=True, segments=4, workers=None, on_progress=None, audio_source=None,
+                     checkpoint_dir=None, checkpoint_key=None):
+    """
+    Encode input_path in keyframe-aligned segments on a pool of ffmpeg processes.
+    When audio_source is given its audio track is copied instead of encoding one.
+    With checkpoint_dir, finished segments are recorded in a manifest there and
+    kept if the encode fails or is cancelled, so a rerun with the same
+    checkpoint_key resumes after them. Returns (segments used, segments resumed).
+    """
+    # The job's resource policy bounds both the pool and the threads each segment gets
+    cpus = available_cpus()
+    workers = max(1, int(workers or cpus))
+    threads_per_segment = max(1, cpus // workers)
+
+    work_dir, manifest = open_work_dir(output_path, checkpoint_dir, checkpoint_key)
+    finished = False
+    try:
+        if manifest and manifest.data['chunks']:
+            chunks, durations = manifest.data['chunks'], manifest.data['durations']
+        else:
+            split_points = plan_segments(probe_keyframes(input_path), duration, segments)
+            boundaries = [0.0] + split_points + [duration]
+            durations = [max(0.0, end - start) for start, end in zip(boundaries, boundaries[1:])]
+
+            # Lossless split at keyframes; each chunk starts at its own keyframe
+            chunk_pattern = os.path.join(work_dir, 'chunk_%04d.mkv')
+            split_cmd = [
+                'ffmpeg', '-v', 'error', '-i', input_path,
+                '-map', '0:v:0', '-c', 'copy', '-f', 'segment',
+                '-reset_timestamps', '1'
+            ]
+            if split_points:
+                split_cmd += ['-segment_times', ','.join(f"{t:.6f}" for t in split_points)]
+            split_cmd += ['-y', chunk_pattern]
+            run_capture(split_cmd, text=True)
+
+            chunks = sorted(name for name in os.listdir(work_dir) if name.startswith('chunk_'))
+            durations = (durations + [0.0] * len(chunks))[:len(chunks)]
+            if manifest:
+                manifest.data.update(chunks=chunks, durations=durations)
+                manifest.save()
+
+        resumed = set(manifest.data['done']) if manifest else set()
+        progress = SegmentProgress(durations, on_progress)
+        for index in resumed:
+            progress.out_times[index] = durations[index]
+
+        def encode_chunk(index, chunk):
+            encoded_path = os.path.join(work_dir, f"encoded_{index:04d}.ts")
+            if index in resumed and os.path.exists(encoded_path):
+                return encoded_path
+            cmd = ['ffmpeg', '-i', os.path.join(work_dir, chunk)]
+            if video_filters:
+                cmd += ['-vf', ','.join(video_filters)]
+            cmd += ['-an', *video_codec_args, '-threads', str(threads_per_segment), '-y', encoded_path]
+            run_ffmpeg(cmd, durations[index], progress.callback(index))
+            if manifest:
+                manifest.mark_done(index)
+            return encoded_path
+
+        def encode_audio():
+            audio_path = os.path.join(work_dir, 'audio.m4a')
+            if manifest and manifest.data['audio'] == audio_path and os.path.exists(audio_path):
+                return audio_path
+            cmd = ['ffmpeg', '-i', input_path, '-vn']
+            if audio_filters:
+                cmd += ['-af', ','.join(audio_filters)]
+            cmd += [*audio_codec_args, '-y', audio_path]
+            run_ffmpeg(cmd, duration)
+            if manifest:
+                manifest.mark_audio(audio_path)
+            return audio_path
+
+        encode_audio_track = has_audio and not audio_source
+        with ThreadPoolExecutor(max_workers=workers + (1 if encode_audio_track else 0)) as pool:
+            # Each task runs in a copy of the caller's context so its ffmpeg usage lands in the job's trace
+            audio_future = pool.submit(contextvars.copy_context().run, encode_audio) if encode_audio_track else None
+            encoded = [
+                f.result() for f in
+                [pool.submit(contextvars.copy_context().run, encode_chunk, i, c) for i, c in enumerate(chunks)]
+            ]
+            audio_path = audio_future.result() if audio_future else audio_source
+
+        # Stitch the encoded segments back together without re-encoding
+        list_path = os.path.join(work_dir, 'segments.txt')
+        with open(list_path, 'w') as f:
+            for path in encoded:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        concat_cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', list_path]
+        if audio_path:
+            concat_cmd += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0']
+        concat_cmd += ['-c', 'copy', '-movflags', '+faststart', '-y', output_path]
+        run_ffmpeg(concat_cmd, duration)
+
+        finished = True
+        return len(encoded), len(resumed)
+    finally:
+        # Checkpoints survive failures and cancels; everything else is scratch
+        if finished or not manifest:
+            shutil.rmtree(work_dir, ignore_errors=True)
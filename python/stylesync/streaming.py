@@ -0,0 +1,71 @@
+"""
+Streaming input and output
+Jobs can read the user video from stdin ('-') or a named pipe and write
+fragmented MP4 (frag_keyframe+empty_moov) to stdout ('-'), a pipe or a file
+that grows while the encode runs, so callers can serve or upload bytes before
+the render finishes. Pipes cannot be seeked, so streaming jobs skip the input
+probe, the loudness measurement pass, segmenting and the render cache.
+"""
+
+import os
+import stat
+import subprocess
+import sys
+
+from .encoder import codec_args
+
+STREAM_PATH = '-'
+
+# Moov up front and a fragment per keyframe, so a reader can decode from the first bytes
+FRAGMENTED_MOVFLAGS = '+frag_keyframe+empty_moov+default_base_moof'
+
+def is_stream(path):
+    """True for '-' (stdin/stdout), pipe: URLs and named pipes"""
+    if not path:
+        return False
+    if path == STREAM_PATH or path.startswith('pipe:'):
+        return True
+    try:
+        return stat.S_ISFIFO(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+def streaming_requested(input_path, output_path, options):
+    """Whether a job should take the streaming path"""
+    return bool(options.get('stream')) or is_stream(input_path) or is_stream(output_path)
+
+def ffmpeg_url(path, direction):
+    """ffmpeg's name for a job path; '-' maps to pipe:0 for input and pipe:1 for output"""
+    if path == STREAM_PATH:
+        return 'pipe:0' if direction == 'input' else 'pipe:1'
+    return path
+
+def build_stream_command(input_path, output_path, video_filters, audio_filters, profile):
+    """Single-pass encode from a file or pipe to fragmented MP4"""
+    return [
+        'ffmpeg', '-i', ffmpeg_url(input_path, 'input'),
+        *codec_args(video_filters, audio_filters, profile),
+        '-movflags', FRAGMENTED_MOVFLAGS,
+        '-f', 'mp4', '-y', ffmpeg_url(output_path, 'output')
+    ]
+
+_media_stdout = None
+
+def claim_stdout():
+    """
+    Reserve the process's stdout for video bytes. File descriptor 1 is pointed at
+    stderr afterwards, so every print (job events and log lines alike) goes there
+    instead of corrupting the stream.
+    """
+    global _media_stdout
+    if _media_stdout is None:
+        sys.stdout.flush()
+        _media_stdout = os.fdopen(os.dup(1), 'wb')
+        os.dup2(2, 1)
+    return _media_stdout
+
+def stream_io(input_path, output_path):
+    """stdin/stdout handles to pass to run_ffmpeg for '-' paths"""
+    stdin = sys.stdin.buffer if input_path == STREAM_PATH else subprocess.DEVNULL
+    stdout = claim_stdout() if output_path == STREAM_PATH else None
+    return stdin, stdout
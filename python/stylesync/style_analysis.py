@@ -0,0 +1,217 @@
+"""
+Vectorized reference style analysis
+Decodes a fixed budget of downscaled frames sampled evenly across the whole
+clip as raw YUV, seeking to each sample rather than decoding the stream, then
+computes the style profile with batched NumPy array operations. Analysis cost
+depends on the frame budget, not the clip length.
+The user video gets the same profile from a keyframe-only scan, so reference
+grades can be computed relative to the input without another full decode.
+"""
+
+import math
+import os
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; callers fall back to signalstats sampling
+    np = None
+
+from .ffmpeg_progress import media_duration, run_capture
+from .cache import fingerprint, input_style_cache
+from .probe import probe_media, probe_keyframe_interval
+
+# Size of the frames decoded for analysis
+ANALYSIS_WIDTH = 160
+ANALYSIS_HEIGHT = 90
+
+# Default number of frames sampled across the clip
+DEFAULT_FRAME_BUDGET = 48
+
+# Keyframes scanned from the user video for relative grading
+INPUT_SCAN_FRAMES = int(os.environ.get('INPUT_SCAN_FRAMES', 16))
+
+# Seeked inputs opened by one ffmpeg; larger budgets run several in turn
+SEEK_BATCH = 16
+
+HISTOGRAM_BINS = 32
+
+LUMA_PERCENTILES = (1, 5, 50, 95, 99)
+
+def numpy_available():
+    return np is not None
+
+def _seek_command(video_path, timestamps, filters, keyframes_only):
+    """
+    One ffmpeg reading a single frame at each timestamp: every timestamp is its
+    own input seeked with -ss, and the one-frame segments are concatenated.
+    keyframes_only takes the keyframe at or before each timestamp, so each
+    sample costs one keyframe decode; otherwise the frame at the timestamp is
+    decoded from the preceding keyframe.
+    """
+    cmd = ['ffmpeg', '-v', 'error']
+    for timestamp in timestamps:
+        if keyframes_only:
+            cmd += ['-skip_frame', 'nokey', '-noaccurate_seek']
+        # Each input decodes a frame or one GOP, so decoder threads would only cost memory
+        cmd += ['-threads', '1', '-ss', f"{timestamp:.3f}", '-i', video_path]
+
+    chains = [f"[{index}:v:0]trim=end_frame=1,setpts=N,{','.join(filters)}[s{index}]" for index in range(len(timestamps))]
+    labels = ''.join(f"[s{index}]" for index in range(len(timestamps)))
+    graph = ';'.join(chains + [f"{labels}concat=n={len(timestamps)}:v=1:a=0[out]"])
+    return cmd + [
+        '-filter_complex', graph, '-map', '[out]', '-fps_mode', 'passthrough',
+        '-f', 'rawvideo', '-pix_fmt', 'yuv444p', 'pipe:1'
+    ]
+
+def _decode_command(video_path, frame_budget, interval, filters, keyframes_only, window):
+    """One ffmpeg decoding the stream (or its keyframes) and keeping a frame every interval seconds"""
+    cmd = ['ffmpeg', '-v', 'error']
+    if keyframes_only:
+        cmd += ['-skip_frame', 'nokey']
+    if window:
+        cmd += ['-ss', f"{window[0]:.3f}", '-t', f"{window[1]:.3f}"]
+    return cmd + [
+        '-i', video_path, '-map', '0:v:0',
+        '-vf', ','.join([f"select='isnan(prev_selected_t)+gte(t-prev_selected_t,{interval:.4f})'"] + filters),
+        '-vsync', 'vfr', '-frames:v', str(frame_budget),
+        '-f', 'rawvideo', '-pix_fmt', 'yuv444p', 'pipe:1'
+    ]
+
+def sample_frames(video_path, frame_budget=DEFAULT_FRAME_BUDGET, width=ANALYSIS_WIDTH, height=ANALYSIS_HEIGHT,
+                  extra_filters=None, keyframes_only=False, window=None):
+    """
+    Decode up to frame_budget downscaled frames spread evenly across the clip,
+    or across window=(start, seconds) of it.
+    Returns a uint8 array shaped (frames, 3, height, width) holding Y, U, V planes.
+
+    Each sample is read by seeking to its timestamp, SEEK_BATCH inputs per
+    ffmpeg. keyframes_only, or a GOP no longer than the sample spacing, takes
+    the nearest keyframe; a longer GOP decodes from the keyframe to the exact
+    frame, unless that would decode more than the whole clip, in which case
+    the clip is decoded once and the evenly spaced frames are kept.
+    """
+    start, duration = window or (0.0, media_duration(probe_media(video_path)) or 0)
+    interval = duration / frame_budget
+    filters = list(extra_filters or []) + [f"scale={width}:{height}", "format=yuv444p"]
+
+    gop = None if keyframes_only or not duration else probe_keyframe_interval(video_path)
+    nearest_keyframe = keyframes_only or (gop is not None and gop <= interval)
+    # Exact seeks decode half a GOP each on average
+    exact_seek = gop is not None and frame_budget * gop / 2 < duration
+
+    if duration and (nearest_keyframe or exact_seek):
+        timestamps = [start + (index + 0.5) * interval for index in range(frame_budget)]
+        commands = [
+            _seek_command(video_path, timestamps[first:first + SEEK_BATCH], filters, nearest_keyframe)
+            for first in range(0, len(timestamps), SEEK_BATCH)
+        ]
+    else:
+        commands = [_decode_command(video_path, frame_budget, interval, filters, keyframes_only, window)]
+
+    output = b''.join(run_capture(cmd).stdout for cmd in commands)
+    frame_size = 3 * width * height
+    count = len(output) // frame_size
+    return np.frombuffer(output[:count * frame_size], dtype=np.uint8).reshape(count, 3, height, width)
+
+def frame_statistics(frames):
+    """Per-channel histograms, luma percentiles and chroma moments for a frame batch"""
+    count = frames.shape[0]
+    planes = frames.reshape(count, 3, -1).astype(np.float32)
+    y, u, v = planes[:, 0], planes[:, 1], planes[:, 2]
+
+    histograms = {}
+    for name, channel in (('y', y), ('u', u), ('v', v)):
+        hist, _ = np.histogram(channel, bins=HISTOGRAM_BINS, range=(0, 256))
+        histograms[name] = (hist / max(1, hist.sum())).round(5).tolist()
+
+    percentiles = np.percentile(y, LUMA_PERCENTILES)
+    chroma = np.sqrt((u - 128) ** 2 + (v - 128) ** 2)
+
+    return {
+        'frames_sampled': int(count),
+        'y_mean': float(y.mean()),
+        'u_mean': float(u.mean()),
+        'v_mean': float(v.mean()),
+        'y_frame_min': y.min(axis=1),
+        'y_frame_max': y.max(axis=1),
+        'luma_percentiles': {f"p{p}": round(float(value), 2) for p, value in zip(LUMA_PERCENTILES, percentiles)},
+        'luma_std': float(y.std()),
+        'chroma_variance': float((u.var() + v.var()) / (128 ** 2)),
+        'colorfulness': float(chroma.mean() / 128),
+        'histograms': histograms
+    }
+
+def analyze_style(video_path, frame_budget=DEFAULT_FRAME_BUDGET, keyframes_only=False, window=None):
+    """Build a style profile from evenly sampled frames; returns None if nothing decoded"""
+    frames = sample_frames(video_path, frame_budget, keyframes_only=keyframes_only, window=window)
+    if frames.shape[0] == 0:
+        return None
+
+    stats = frame_statistics(frames)
+    brightness_values = (stats['y_frame_min'] + stats['y_frame_max']) / 2
+    avg_y, avg_u, avg_v = stats['y_mean'], stats['u_mean'], stats['v_mean']
+
+    return {
+        # Same keys and scales as the signalstats profile
+        'brightness': (float(brightness_values.mean()) - 128) / 128,  # -1 to 1
+        'contrast': float(brightness_values.max() - brightness_values.min()) / 255,  # 0 to 1
+        'saturation': (abs(avg_u - 128) + abs(avg_v - 128)) / 128,  # 0 to 1+
+        'warm_bias': (avg_v - 128) / 128,  # -1 to 1
+        'green_magenta_bias': (avg_u - 128) / 128,  # -1 to 1
+        'luminance': (avg_y - 128) / 128,  # -1 to 1
+        # Richer whole-clip statistics
+        'luma_percentiles': stats['luma_percentiles'],
+        'luma_std': round(stats['luma_std'], 3),
+        'chroma_variance': round(stats['chroma_variance'], 5),
+        'colorfulness': round(stats['colorfulness'], 5),
+        'histograms': stats['histograms'],
+        'frames_sampled': stats['frames_sampled']
+    }
+
+def get_input_style(video_path, frame_budget=INPUT_SCAN_FRAMES, window=None):
+    """
+    Style profile of the user video (or of window=(start, seconds) of it) from
+    its keyframes only (no full decode), reusing a cached scan of identical
+    content. None without NumPy.
+    """
+    if not numpy_available():
+        return None
+    key = fingerprint(video_path, 'input', 'keyframes', frame_budget, ANALYSIS_WIDTH, ANALYSIS_HEIGHT, window)
+    cache = input_style_cache()
+    profile = cache.get(key)
+    if profile is None:
+        profile = analyze_style(video_path, frame_budget, keyframes_only=True, window=window)
+        if profile:
+            cache.put(key, profile)
+    return profile
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+def _gamma_between(source_median, target_median):
+    """eq gamma that moves the source median luma onto the target median"""
+    source = _clamp(source_median / 255, 0.02, 0.98)
+    target = _clamp(target_median / 255, 0.02, 0.98)
+    return math.log(source) / math.log(target)
+
+def relative_corrections(reference, source):
+    """
+    eq/colorbalance values that move the source's statistics toward the
+    reference's: black level, median luma, luma spread, colorfulness and chroma
+    means. None when either profile lacks the NumPy statistics.
+    """
+    fields = ('luma_percentiles', 'luma_std', 'colorfulness')
+    if not reference or not source or not all(field in profile for profile in (reference, source) for field in fields):
+        return None
+
+    warm_delta = reference['warm_bias'] - source['warm_bias']
+    green_delta = reference['green_magenta_bias'] - source['green_magenta_bias']
+    return {
+        'brightness': _clamp((reference['luma_percentiles']['p5'] - source['luma_percentiles']['p5']) / 255, -0.2, 0.2),
+        'contrast': _clamp(reference['luma_std'] / max(source['luma_std'], 1.0), 0.7, 1.5),
+        'saturation': _clamp(reference['colorfulness'] / max(source['colorfulness'], 1e-3), 0.5, 2.0),
+        'gamma': _clamp(_gamma_between(source['luma_percentiles']['p50'], reference['luma_percentiles']['p50']), 0.7, 1.5),
+        'rs': _clamp(warm_delta * 0.6, -0.3, 0.3),
+        'gs': _clamp(green_delta * 0.4, -0.3, 0.3),
+        'bs': _clamp(-warm_delta * 0.4, -0.3, 0.3),
+    }
@@ -0,0 +1,88 @@
+"""
+Measured style-match score
+Compares the color statistics of a rendered output against the reference
+profile computed when the reference was analyzed. The output side is a small
+budget of downscaled frames decoded from keyframes only, so scoring costs a
+few percent of an encode. Template jobs have no reference to match, and are
+not scored: comparing the output with the input run through the same chain
+would only measure encode fidelity, not style. The score blends per-channel histogram intersection with distances
+between luma percentiles and chroma moments, scaled to 0-100.
+"""
+
+import os
+
+from .style_analysis import np, numpy_available, sample_frames, frame_statistics
+
+# Frames sampled from each side; options['scoreSampleFrames'] overrides per job
+SCORE_SAMPLE_FRAMES = int(os.environ.get('STYLE_SCORE_FRAMES', 12))
+
+# Weight of histogram similarity; the rest goes to the moment similarity
+HISTOGRAM_WEIGHT = 0.6
+
+# Differences that count as one unit of error in the moment comparison
+LUMA_SCALE = 64.0
+CHROMA_MEAN_SCALE = 32.0
+COLORFULNESS_SCALE = 0.15
+
+def sampled_statistics(video_path, frame_budget):
+    """Statistics of up to frame_budget keyframes, or None if nothing decoded"""
+    frames = sample_frames(video_path, frame_budget, keyframes_only=True)
+    if frames.shape[0] == 0:
+        return None
+    return frame_statistics(frames)
+
+def moments(stats):
+    """Comparable moments from frame statistics or a cached style profile"""
+    if 'u_mean' in stats:
+        u_mean, v_mean = stats['u_mean'], stats['v_mean']
+    else:
+        # Style profiles store the chroma means as biases around neutral
+        u_mean = stats['green_magenta_bias'] * 128 + 128
+        v_mean = stats['warm_bias'] * 128 + 128
+
+    percentiles = stats['luma_percentiles']
+    return {
+        'luma': np.array([percentiles['p5'], percentiles['p50'], percentiles['p95']], dtype=np.float64),
+        'chroma_mean': np.array([u_mean, v_mean], dtype=np.float64),
+        'colorfulness': float(stats['colorfulness'])
+    }
+
+def histogram_similarity(target, output):
+    """Mean histogram intersection over the Y, U and V channels (0 to 1)"""
+    similarities = [
+        np.minimum(np.asarray(target[channel]), np.asarray(output[channel])).sum()
+        for channel in ('y', 'u', 'v')
+    ]
+    return float(np.mean(similarities))
+
+def moment_similarity(target, output):
+    """1 / (1 + error) over luma percentiles, chroma means and colorfulness"""
+    a, b = moments(target), moments(output)
+    error = (
+        np.abs(a['luma'] - b['luma']).mean() / LUMA_SCALE
+        + np.abs(a['chroma_mean'] - b['chroma_mean']).mean() / CHROMA_MEAN_SCALE
+        + abs(a['colorfulness'] - b['colorfulness']) / COLORFULNESS_SCALE
+    )
+    return float(1 / (1 + error))
+
+def style_match_score(target, output):
+    """0-100 similarity between a style target and output statistics"""
+    score = (
+        HISTOGRAM_WEIGHT * histogram_similarity(target['histograms'], output['histograms'])
+        + (1 - HISTOGRAM_WEIGHT) * moment_similarity(target, output)
+    )
+    return int(round(100 * min(1.0, max(0.0, score))))
+
+def score_output(output_path, reference_style, frame_budget=None):
+    """
+    Style-match score of a finished render against reference_style, or None
+    when it cannot be measured (template job, NumPy missing, reference profile
+    without histograms, nothing decoded).
+    """
+    if not numpy_available() or not reference_style or 'histograms' not in reference_style:
+        return None
+
+    output = sampled_statistics(output_path, int(frame_budget or SCORE_SAMPLE_FRAMES))
+    if not output:
+        return None
+    return style_match_score(reference_style, output)
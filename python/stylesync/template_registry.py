@@ -0,0 +1,239 @@
+"""
+Declarative style template registry
+Templates are JSON (or YAML, when PyYAML is installed) files, one look per
+file, loaded from the package's templates/ directory and then
+STYLESYNC_TEMPLATE_DIR (entries there override built-ins of the same name). Each file is validated and
+precompiled once: the filter chain for every combination of its option
+toggles is joined ahead of time, so a job's lookup is a dict access. Files
+are rescanned at most every TEMPLATE_RELOAD_SECONDS and only changed ones
+are recompiled, so custom looks can be added or edited without a restart.
+
+    {
+      "name": "cinematic",
+      "description": "...",
+      "filters": ["curves=...", "colorbalance=...", "eq=..."],
+      "options": {"filmGrain": {"default": true, "filters": ["noise=..."]}},
+      "lut": false
+    }
+
+"lut": true bakes the leading color-only filters into a cached 3D LUT the
+first time the template is used.
+"""
+
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .lut import bake_color_filters
+
+try:
+    import yaml
+except ImportError:  # PyYAML is optional; JSON templates always work
+    yaml = None
+
+BUILTIN_TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+# Directory of custom templates, loaded after (and overriding) the built-ins
+CUSTOM_TEMPLATE_DIR = os.environ.get('STYLESYNC_TEMPLATE_DIR')
+
+# Minimum seconds between checks of the template files for changes
+TEMPLATE_RELOAD_SECONDS = float(os.environ.get('TEMPLATE_RELOAD_SECONDS', 2))
+
+TEMPLATE_FIELDS = ('name', 'description', 'filters', 'options', 'lut')
+
+# Option toggles per template; each doubles the number of precompiled chains
+MAX_TEMPLATE_OPTIONS = 4
+
+FILTER_NAME = re.compile(r'^[a-z0-9_]+(@[A-Za-z0-9_]+)?$')
+QUOTED = re.compile(r"'[^']*'")
+
+class TemplateError(ValueError):
+    """A template file that cannot be used"""
+
+def template_extensions():
+    return ('.json', '.yaml', '.yml') if yaml is not None else ('.json',)
+
+def validate_filter(spec, source):
+    """A single filter (name=args) that cannot break out of the chain"""
+    if not isinstance(spec, str) or not spec.strip():
+        raise TemplateError(f"{source}: filters must be non-empty strings")
+    name = spec.partition('=')[0]
+    if not FILTER_NAME.match(name):
+        raise TemplateError(f"{source}: invalid filter name {name!r}")
+    # Outside quoted values a comma, semicolon or bracket would start another filter or graph
+    if re.search(r'[,;\[\]]', QUOTED.sub('', spec)):
+        raise TemplateError(f"{source}: filter {spec!r} must be a single filter")
+    return spec
+
+def compile_template(data, source):
+    """Validate a parsed template file and precompile its chains"""
+    if not isinstance(data, dict):
+        raise TemplateError(f"{source}: template must be an object")
+    unknown = set(data) - set(TEMPLATE_FIELDS)
+    if unknown:
+        raise TemplateError(f"{source}: unknown template fields: {', '.join(sorted(unknown))}")
+    name = data.get('name')
+    if not isinstance(name, str) or not FILTER_NAME.match(name):
+        raise TemplateError(f"{source}: name must be a lowercase identifier")
+
+    filters = data.get('filters')
+    if not isinstance(filters, list):
+        raise TemplateError(f"{source}: filters must be a list")
+    base = [validate_filter(spec, source) for spec in filters]
+
+    toggles = []
+    for option, toggle in (data.get('options') or {}).items():
+        if not isinstance(toggle, dict) or not isinstance(toggle.get('filters'), list):
+            raise TemplateError(f"{source}: option {option} needs a filters list")
+        extra = [validate_filter(spec, source) for spec in toggle['filters']]
+        toggles.append((option, bool(toggle.get('default', True)), extra))
+    if len(toggles) > MAX_TEMPLATE_OPTIONS:
+        raise TemplateError(f"{source}: at most {MAX_TEMPLATE_OPTIONS} options per template")
+
+    # Every on/off combination of the toggles, keyed by the tuple of states
+    chains = {}
+    for states in itertools.product((False, True), repeat=len(toggles)):
+        chain = list(base)
+        for (_, _, extra), enabled in zip(toggles, states):
+            if enabled:
+                chain += extra
+        chains[states] = chain
+
+    return {
+        'name': name,
+        'description': data.get('description', ''),
+        'options': [(option, default) for option, default, _ in toggles],
+        'chains': chains,
+        'lut': bool(data.get('lut')),
+        'source': str(source),
+    }
+
+def load_template_file(path):
+    with open(path) as f:
+        if path.suffix == '.json':
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise TemplateError(f"{path}: {e}")
+        else:
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise TemplateError(f"{path}: {e}")
+    return compile_template(data, path)
+
+class TemplateRegistry:
+    """Compiled templates by name, kept in sync with the template directories"""
+
+    def __init__(self, directories):
+        self.directories = [Path(d) for d in directories if d]
+        self.templates = {}
+        self.errors = {}
+        self._files = {}          # path -> ((mtime_ns, size), compiled template or None, error)
+        self._checked = 0.0
+        self._baked = {}
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _scan(self):
+        files = {}
+        for directory in self.directories:
+            if not directory.is_dir():
+                continue
+            for path in sorted(directory.iterdir()):
+                if path.suffix not in template_extensions():
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def reload(self):
+        """Recompile changed template files and rebuild the name index; returns True if anything changed"""
+        with self._lock:
+            self._checked = time.monotonic()
+            files = self._scan()
+            if files == {path: entry[0] for path, entry in self._files.items()}:
+                return False
+
+            compiled = {}
+            for path, signature in files.items():
+                previous = self._files.get(path)
+                if previous and previous[0] == signature:
+                    compiled[path] = previous
+                    continue
+                try:
+                    compiled[path] = (signature, load_template_file(path), None)
+                except (OSError, TemplateError) as e:
+                    compiled[path] = (signature, None, str(e))
+                    print(f"Skipping template: {e}", file=sys.stderr)
+
+            # Later directories override earlier ones
+            self.templates = {template['name']: template for _, template, _ in compiled.values() if template}
+            self.errors = {str(path): error for path, (_, _, error) in compiled.items() if error}
+            self._files = compiled
+            self._baked = {}
+            return True
+
+    def refresh(self):
+        """Reload if the reload interval has passed since the last check"""
+        if time.monotonic() - self._checked >= TEMPLATE_RELOAD_SECONDS:
+            self.reload()
+
+    def names(self):
+        self.refresh()
+        return sorted(self.templates)
+
+    def describe(self):
+        """Every template's name, description, default chain and option defaults, for listing to clients"""
+        self.refresh()
+        return [
+            {
+                'name': template['name'],
+                'description': template['description'],
+                'filters': template['chains'][tuple(default for _, default in template['options'])],
+                'options': dict(template['options']),
+            }
+            for _, template in sorted(self.templates.items())
+        ]
+
+    def filters(self, name, options):
+        """
+        Filter chain for template name with the job's option toggles; [] when
+        no template is named. Raises TemplateError for a name that is not
+        registered, with the load error of a same-named file that was skipped.
+        """
+        self.refresh()
+        if not name:
+            return []
+        template = self.templates.get(name)
+        if template is None:
+            skipped = [error for path, error in self.errors.items() if Path(path).stem == name]
+            raise TemplateError(f"Unknown style template: {name}" + (f" ({skipped[0]})" if skipped else ''))
+        states = tuple(bool(options.get(option, default)) for option, default in template['options'])
+        chain = template['chains'][states]
+        if not template['lut']:
+            return list(chain)
+
+        key = (name, states)
+        if key not in self._baked:
+            self._baked[key] = bake_color_filters(chain)
+        return list(self._baked[key])
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def template_registry():
+    """Process-wide registry, loaded on first use (the worker loads it at startup)"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TemplateRegistry([BUILTIN_TEMPLATE_DIR, CUSTOM_TEMPLATE_DIR])
+        return _registry
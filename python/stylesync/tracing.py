@@ -0,0 +1,119 @@
+"""
+Per-job stage tracing
+A Trace collects one span per pipeline stage (probe, analyze, filter_build,
+audio, encode, post_probe) with its wall time and the CPU time of child
+processes that finished during it. run_ffmpeg reports each ffmpeg process's own
+rusage (CPU time, peak RSS) and final progress to the span that is active in
+the calling context (run_capture does the same for probe and analysis passes),
+so concurrent jobs in one worker do not mix their numbers.
+The summary is emitted as a `TRACE:{json}` line next to `METRICS:`.
+"""
+
+import contextvars
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ru_maxrss is kilobytes on Linux and bytes on macOS
+RSS_TO_MB = 1 / (1024 * 1024) if sys.platform == 'darwin' else 1 / 1024
+
+_current_trace = contextvars.ContextVar('stylesync_trace', default=None)
+_current_span = contextvars.ContextVar('stylesync_span', default=None)
+
+def children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class Trace:
+    """Stage spans and per-process resource usage for one job"""
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        """Time a stage; ffmpeg processes finishing inside it are attributed to it"""
+        record = {
+            'name': name,
+            'start': round(time.perf_counter() - self.started, 3),
+            'seconds': None,
+            'processes': 0,
+            'ffmpeg_cpu_seconds': 0.0,
+            'ffmpeg_peak_rss_mb': 0.0,
+            'frames': 0,
+        }
+        with self._lock:
+            self.spans.append(record)
+
+        token = _current_span.set(record)
+        started = time.perf_counter()
+        cpu_before = children_cpu_seconds()
+        try:
+            yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - started, 3)
+            # Every child of this process, including ffprobe and concurrent jobs
+            record['children_cpu_seconds'] = round(children_cpu_seconds() - cpu_before, 3)
+            _current_span.reset(token)
+
+    def record_process(self, span, rusage, update=None):
+        with self._lock:
+            span['processes'] += 1
+            # None for children reaped by asyncio, whose rusage is not available
+            if rusage is not None:
+                span['ffmpeg_cpu_seconds'] = round(span['ffmpeg_cpu_seconds'] + rusage.ru_utime + rusage.ru_stime, 3)
+                span['ffmpeg_peak_rss_mb'] = round(max(span['ffmpeg_peak_rss_mb'], rusage.ru_maxrss * RSS_TO_MB), 1)
+            span['frames'] = max(span['frames'], (update or {}).get('frame') or 0)
+
+    def summary(self):
+        """Machine-readable trace: spans plus job totals"""
+        with self._lock:
+            spans = [dict(span) for span in self.spans]
+
+        stages = {span['name']: span['seconds'] for span in spans}
+        encode = next((span for span in spans if span['name'] == 'encode'), None)
+        encode_fps = None
+        # No rate for a render served from the render cache (the span is marked cached)
+        if encode and encode['frames'] and encode['seconds'] and not encode.get('cached'):
+            encode_fps = round(encode['frames'] / encode['seconds'], 2)
+
+        return {
+            'job_id': self.job_id,
+            'total_seconds': round(time.perf_counter() - self.started, 3),
+            'stages': stages,
+            'encode_fps': encode_fps,
+            'ffmpeg_cpu_seconds': round(sum(span['ffmpeg_cpu_seconds'] for span in spans), 3),
+            'ffmpeg_peak_rss_mb': max((span['ffmpeg_peak_rss_mb'] for span in spans), default=0.0),
+            'spans': spans,
+        }
+
+@contextmanager
+def activate(trace):
+    """Make trace the destination for spans and process records in this context"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name):
+    """Span on the active trace, or a no-op when the caller is not tracing"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name) as record:
+        yield record
+
+def record_process(rusage, update=None):
+    """Attribute a finished ffmpeg process's rusage to the active span, if any"""
+    trace = _current_trace.get()
+    span_record = _current_span.get()
+    if trace is not None and span_record is not None:
+        trace.record_process(span_record, rusage, update)
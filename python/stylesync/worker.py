@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Long-running style transfer worker
+Accepts jobs as newline-delimited JSON on stdin or a local Unix socket and runs
+them on a bounded pool of concurrent ffmpeg slots, so interpreter startup and
+imports are paid once instead of once per job.
+
+Each job line mirrors the style_transfer.py arguments:
+    {"job_id": "...", "user_video": "...", "reference_video": "...",
+     "style_template": "...", "options": {...}, "output_path": "..."}
+
+Every event is written back as a line tagged with the job id, e.g.
+    [<job_id>] PROGRESS:45
+    [<job_id>] METRICS:{...}
+A job ends with either its METRICS event or an ERROR:<message> event.
+
+With --async, full renders run on one asyncio event loop (async_core) instead
+of a thread per slot, so a single worker can supervise many more concurrent
+encodes; each job may set options.timeout in seconds.
+"""
+
+import sys
+import json
+import os
+import argparse
+import asyncio
+import signal
+import stat
+import socketserver
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import cancellation
+from .async_core import AsyncJobRunner, JobTimeout, ASYNC_JOB_LIMIT, JOB_TIMEOUT_SECONDS
+from .cancellation import JobCancelled, CANCELLED_EXIT_CODE, install_signal_handlers
+from .pipeline import process_job
+from .streaming import is_stream
+from .template_registry import template_registry
+
+DEFAULT_SLOTS = max(1, (os.cpu_count() or 2) // 2)
+
+class EventStream:
+    """Thread-safe line writer that tags every event with its job id"""
+
+    def __init__(self, write):
+        self._write = write
+        self._lock = threading.Lock()
+
+    def send(self, job_id, line):
+        with self._lock:
+            try:
+                self._write(f"[{job_id}] {line}\n")
+            except OSError:
+                # Client went away; the job keeps running but its events are dropped
+                pass
+
+    def emitter(self, job_id):
+        return lambda line: self.send(job_id, line)
+
+def parse_job(line):
+    """Parse and validate one newline-delimited job message"""
+    job = json.loads(line)
+    if not isinstance(job, dict):
+        raise ValueError("Job must be a JSON object")
+    for field in ('job_id', 'user_video', 'output_path'):
+        if not job.get(field):
+            raise ValueError(f"Missing required field: {field}")
+    # The worker's own stdin/stdout carry jobs and events, so they cannot carry video too
+    for field in ('user_video', 'output_path'):
+        if is_stream(job[field]):
+            raise ValueError(f"Streaming paths are not supported by the worker: {field}={job[field]}")
+    options = job.get('options') or {}
+    if isinstance(options, str):
+        options = json.loads(options)
+    job['options'] = options
+    return job
+
+def run_job(job, events):
+    """Run one job in a worker slot, translating failures into ERROR events"""
+    job_id = job['job_id']
+    emit = events.emitter(job_id)
+    try:
+        process_job(
+            job['user_video'],
+            job.get('reference_video') or None,
+            job.get('style_template') or None,
+            job['options'],
+            job['output_path'],
+            job_id,
+            emit=emit
+        )
+    except JobCancelled as e:
+        emit(f"ERROR:{e}")
+    except subprocess.CalledProcessError as e:
+        emit(f"FFmpeg stderr: {e.stderr}")
+        emit(f"ERROR:FFmpeg error: {e}")
+    except Exception as e:
+        emit(f"ERROR:Processing error: {e}")
+
+def submit_lines(lines, pool, events):
+    """Submit every job line to the pool and return the pending futures"""
+    futures = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = parse_job(line)
+        except (ValueError, json.JSONDecodeError) as e:
+            events.send('-', f"ERROR:Invalid job: {e}")
+            continue
+        events.send(job['job_id'], "QUEUED")
+        futures.append(pool.submit(run_job, job, events))
+    return futures
+
+def serve_stdin(pool):
+    """Read jobs from stdin and write tagged events to stdout"""
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    events = EventStream(write)
+    futures = submit_lines(sys.stdin, pool, events)
+    for future in futures:
+        future.result()
+
+def serve_socket(socket_path, pool):
+    """Accept jobs on a Unix socket; events go back over the same connection"""
+
+    class JobHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            events = EventStream(lambda text: self.wfile.write(text.encode('utf-8')))
+            lines = (raw.decode('utf-8', errors='replace') for raw in self.rfile)
+            futures = submit_lines(lines, pool, events)
+            # Keep the connection open until this client's jobs have finished
+            for future in futures:
+                future.result()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, JobHandler)
+    server.daemon_threads = True
+    print(f"Worker listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+async def run_job_async(job, runner, events):
+    """run_job for the event loop"""
+    job_id = job['job_id']
+    loop = asyncio.get_running_loop()
+    send = events.emitter(job_id)
+    # Blocking stages emit from executor threads, so every event hops back onto the loop
+    emit = lambda line: loop.call_soon_threadsafe(send, line)
+    try:
+        await runner.run(
+            job['user_video'],
+            job.get('reference_video') or None,
+            job.get('style_template') or None,
+            job['options'],
+            job['output_path'],
+            job_id,
+            emit=emit
+        )
+    except (JobCancelled, asyncio.CancelledError):
+        emit("ERROR:Job cancelled")
+    except JobTimeout as e:
+        emit(f"ERROR:{e}")
+    except subprocess.CalledProcessError as e:
+        emit(f"FFmpeg stderr: {e.stderr}")
+        emit(f"ERROR:FFmpeg error: {e}")
+    except Exception as e:
+        emit(f"ERROR:Processing error: {e}")
+
+async def submit_lines_async(lines, runner, events, tasks):
+    """Start a task for every job line as it arrives; returns this source's tasks"""
+    started = []
+    async for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = parse_job(line)
+        except (ValueError, json.JSONDecodeError) as e:
+            events.send('-', f"ERROR:Invalid job: {e}")
+            continue
+        events.send(job['job_id'], "QUEUED")
+        task = asyncio.create_task(run_job_async(job, runner, events))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        started.append(task)
+    return started
+
+async def stdin_lines():
+    """Lines of stdin, read without blocking the loop (a redirected file is simply read)"""
+    if stat.S_ISREG(os.fstat(sys.stdin.fileno()).st_mode):
+        for line in sys.stdin:
+            yield line
+        return
+
+    reader = asyncio.StreamReader()
+    loop = asyncio.get_running_loop()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    async for raw in reader:
+        yield raw.decode('utf-8', errors='replace')
+
+async def serve_async(socket_path, runner):
+    """Async counterpart of serve_stdin/serve_socket; returns True if stopped by a signal"""
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    stopped = asyncio.Event()
+    reading = None
+
+    def shutdown():
+        # Stops ffmpeg started by blocking stages too, then unwinds every job
+        cancellation.cancel()
+        stopped.set()
+        if reading:
+            reading.cancel()
+        for task in list(tasks):
+            task.cancel()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, shutdown)
+
+    if socket_path is None:
+        def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        events = EventStream(write)
+        reading = asyncio.create_task(submit_lines_async(stdin_lines(), runner, events, tasks))
+        try:
+            await reading
+        except asyncio.CancelledError:
+            pass
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return stopped.is_set()
+
+    async def handle(reader, writer):
+        events = EventStream(lambda text: writer.write(text.encode('utf-8')))
+        lines = (raw.decode('utf-8', errors='replace') async for raw in reader)
+        started = await submit_lines_async(lines, runner, events, tasks)
+        # Keep the connection open until this client's jobs have finished
+        await asyncio.gather(*started, return_exceptions=True)
+        try:
+            await writer.drain()
+            writer.close()
+        except (ConnectionError, RuntimeError):
+            pass
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = await asyncio.start_unix_server(handle, path=socket_path)
+    print(f"Worker listening on {socket_path} (async, up to {runner.limit} jobs)")
+    try:
+        await stopped.wait()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        server.close()
+        os.unlink(socket_path)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running style transfer worker")
+    parser.add_argument('--socket', help="Unix socket path to listen on (default: read jobs from stdin)")
+    parser.add_argument('--slots', type=int, default=None,
+                        help="Maximum number of concurrent ffmpeg jobs")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Run full renders on one asyncio event loop instead of a thread per slot")
+    parser.add_argument('--timeout', type=float, default=JOB_TIMEOUT_SECONDS,
+                        help="Per-job timeout in seconds with --async (0 for none)")
+    args = parser.parse_args()
+
+    if args.slots is None:
+        args.slots = int(os.environ.get('WORKER_SLOTS', ASYNC_JOB_LIMIT if args.use_async else DEFAULT_SLOTS))
+    if args.slots < 1:
+        parser.error("--slots must be at least 1")
+
+    # Compile the templates once up front; jobs then only look them up
+    templates = template_registry()
+    print(f"Loaded {len(templates.templates)} templates", file=sys.stderr)
+
+    if args.use_async:
+        async def serve():
+            return await serve_async(args.socket, AsyncJobRunner(args.slots, args.timeout))
+
+        if asyncio.run(serve()):
+            sys.exit(CANCELLED_EXIT_CODE)
+        return
+
+    # SIGTERM stops every running job's ffmpeg and removes their partial outputs
+    install_signal_handlers()
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.slots) as pool:
+            if args.socket:
+                serve_socket(args.socket, pool)
+            else:
+                serve_stdin(pool)
+    except JobCancelled:
+        sys.exit(CANCELLED_EXIT_CODE)
+
+if __name__ == "__main__":
+    main()
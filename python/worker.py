@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+"""Long-running style transfer worker; see stylesync/worker.py"""
+
+from stylesync.worker import main
+
+if __name__ == "__main__":
+    main()
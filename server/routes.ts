@@ -150,7 +150,8 @@ async function processVideoJob(jobId: string) {
 
     const outputPath = path.join(outputDir, `output_${jobId}.mp4`);
 
-    // Call Python video processor
+    // Call Python video processor; it imports the stylesync package from python/
+    const pythonPath = [path.join(process.cwd(), 'python'), process.env.PYTHONPATH].filter(Boolean).join(path.delimiter);
     const pythonProcess = spawn('/home/runner/workspace/.pythonlibs/bin/python3', [
       path.join(process.cwd(), 'server', 'video_processor.py'),
       job.userVideoPath,
@@ -159,10 +160,9 @@ async function processVideoJob(jobId: string) {
       JSON.stringify(job.options),
       outputPath,
       jobId
-    ]);
+    ], { env: { ...process.env, PYTHONPATH: pythonPath } });
 
-    pythonProcess.stdout.on('data', async (data) => {
-      const output = data.toString().trim();
+    const handleEvent = async (output: string) => {
       if (output.startsWith('PROGRESS:')) {
         const progress = parseInt(output.split(':')[1]);
         await storage.updateVideoJob(jobId, { progress });
@@ -177,6 +177,15 @@ async function processVideoJob(jobId: string) {
           console.error('Failed to parse metrics:', e);
         }
       }
+    };
+
+    // Events are one per line, but a chunk can end mid-line (METRICS is large)
+    let pending = '';
+    pythonProcess.stdout.on('data', (data) => {
+      pending += data.toString();
+      const lines = pending.split('\n');
+      pending = lines.pop() ?? '';
+      lines.forEach((line) => handleEvent(line.trim()).catch(console.error));
     });
 
     pythonProcess.stderr.on('data', (data) => {
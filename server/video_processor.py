@@ -2,363 +2,52 @@
 import sys
 import os
 import json
-import time
-import shutil
-import subprocess
-import random
-from pathlib import Path
 
-def get_video_info(video_path):
-    """Extract video information using ffprobe"""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', video_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return json.loads(result.stdout)
-    except Exception as e:
-        print(f"Error getting video info: {e}")
-        return None
-
-def extract_video_style(reference_video_path):
-    """Extract style characteristics from reference video"""
-    try:
-        print("Analyzing reference video style characteristics...")
-        
-        # Extract color statistics using ffprobe
-        cmd = [
-            'ffprobe', '-f', 'lavfi', '-i', f'movie={reference_video_path},signalstats',
-            '-show_entries', 'frame=pkt_pts_time:frame_tags=lavfi.signalstats.YAVG,lavfi.signalstats.UAVG,lavfi.signalstats.VAVG,lavfi.signalstats.YMIN,lavfi.signalstats.YMAX',
-            '-print_format', 'json', '-read_intervals', '%+#10'
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        stats_data = json.loads(result.stdout)
-        
-        # Extract average color values from multiple frames
-        y_values = []
-        u_values = []
-        v_values = []
-        brightness_values = []
-        
-        for frame in stats_data.get('frames', []):
-            tags = frame.get('tags', {})
-            if 'lavfi.signalstats.YAVG' in tags:
-                y_values.append(float(tags['lavfi.signalstats.YAVG']))
-                u_values.append(float(tags.get('lavfi.signalstats.UAVG', 128)))
-                v_values.append(float(tags.get('lavfi.signalstats.VAVG', 128)))
-                
-                y_min = float(tags.get('lavfi.signalstats.YMIN', 0))
-                y_max = float(tags.get('lavfi.signalstats.YMAX', 255))
-                brightness_values.append((y_min + y_max) / 2)
-        
-        if not y_values:
-            return None
-            
-        # Calculate style characteristics
-        avg_y = sum(y_values) / len(y_values)
-        avg_u = sum(u_values) / len(u_values) 
-        avg_v = sum(v_values) / len(v_values)
-        avg_brightness = sum(brightness_values) / len(brightness_values)
-        
-        # Determine color temperature and characteristics
-        warm_bias = (avg_v - 128) / 128  # Positive = warm, negative = cool
-        green_magenta_bias = (avg_u - 128) / 128  # Positive = green, negative = magenta
-        
-        # Calculate contrast from brightness range
-        brightness_range = max(brightness_values) - min(brightness_values)
-        contrast_level = brightness_range / 255
-        
-        # Determine saturation level from U/V deviation
-        saturation_level = (abs(avg_u - 128) + abs(avg_v - 128)) / 128
-        
-        style_profile = {
-            'brightness': (avg_brightness - 128) / 128,  # -1 to 1
-            'contrast': contrast_level,  # 0 to 1
-            'saturation': saturation_level,  # 0 to 1+
-            'warm_bias': warm_bias,  # -1 to 1
-            'green_magenta_bias': green_magenta_bias,  # -1 to 1
-            'luminance': (avg_y - 128) / 128  # -1 to 1
-        }
-        
-        print(f"Extracted style profile: {style_profile}")
-        return style_profile
-        
-    except Exception as e:
-        print(f"Error extracting video style: {e}")
-        return None
-
-def apply_reference_style_filters(input_path, output_path, style_profile, options):
-    """Apply style filters based on extracted reference video characteristics"""
-    
-    filters = []
-    
-    # Convert style profile to filter parameters
-    brightness_adj = style_profile['brightness'] * 0.3  # Scale to reasonable range
-    contrast_adj = 1.0 + (style_profile['contrast'] * 0.5)  # 1.0 to 1.5
-    saturation_adj = 0.8 + (style_profile['saturation'] * 0.8)  # 0.8 to 1.6
-    
-    # Color balance adjustments based on reference
-    rs_adj = style_profile['warm_bias'] * 0.3  # Red-cyan balance
-    gs_adj = style_profile['green_magenta_bias'] * 0.2  # Green-magenta balance
-    bs_adj = -style_profile['warm_bias'] * 0.2  # Blue-yellow balance
-    
-    # Gamma adjustment based on luminance
-    gamma_adj = 1.0 + (style_profile['luminance'] * 0.3)
-    
-    # Apply extracted style characteristics
-    filters.extend([
-        f"eq=brightness={brightness_adj:.3f}:contrast={contrast_adj:.3f}:saturation={saturation_adj:.3f}:gamma={gamma_adj:.3f}",
-        f"colorbalance=rs={rs_adj:.3f}:gs={gs_adj:.3f}:bs={bs_adj:.3f}",
-    ])
-    
-    # Add curve adjustment based on contrast profile
-    if style_profile['contrast'] > 0.6:  # High contrast reference
-        filters.append("curves=all='0/0 0.2/0.1 0.8/0.9 1/1'")
-    elif style_profile['contrast'] < 0.3:  # Low contrast reference
-        filters.append("curves=all='0/0.1 0.5/0.5 1/0.9'")
-    else:  # Medium contrast
-        filters.append("curves=all='0/0 0.3/0.25 0.7/0.75 1/1'")
-    
-    # Add sharpening based on extracted characteristics
-    if style_profile['contrast'] > 0.5:
-        filters.append("unsharp=5:5:1.0:5:5:0.5")
-    
-    print(f"Applied reference-based filters: {filters}")
-    return filters
-
-def apply_style_filters(input_path, output_path, style_template, options, reference_style=None):
-    """Apply comprehensive style-specific video filters using ffmpeg"""
-    
-    filters = []
-    
-    # If we have extracted reference style, use that instead of templates
-    if reference_style:
-        filters = apply_reference_style_filters(input_path, output_path, reference_style, options)
-    
-    # Fallback to template-based styling
-    elif style_template == 'cinematic':
-        # Film-like color grading with dramatic effects
-        filters.extend([
-            "curves=all='0/0 0.25/0.15 0.75/0.85 1/1'",  # Strong S-curve
-            "colorbalance=rs=-0.2:gs=0.1:bs=0.15",       # Teal/orange look
-            "eq=brightness=0.1:contrast=1.3:saturation=0.85:gamma=1.1",
-            "hue=h=5:s=1.1",                             # Slight hue shift
-            "unsharp=5:5:1.0:5:5:0.5"                    # Enhance sharpness
-        ])
-        # Add film grain effect
-        if options.get('filmGrain', True):
-            filters.append("noise=alls=15:allf=t+u")
-            
-    elif style_template == 'vibrant':
-        # High energy, social media style
-        filters.extend([
-            "eq=saturation=1.6:contrast=1.4:brightness=0.15:gamma=0.9",
-            "colorbalance=rs=0.15:gs=-0.1:bs=-0.15",
-            "curves=all='0/0 0.2/0.35 0.8/0.75 1/1'",
-            "hue=h=-3:s=1.2",                            # Slight magenta shift
-            "unsharp=7:7:1.5:7:7:0.3"                    # Pop and clarity
-        ])
-        
-    elif style_template == 'minimal':
-        # Clean, professional aesthetic
-        filters.extend([
-            "eq=saturation=0.5:contrast=0.85:brightness=0.2:gamma=1.15",
-            "colorbalance=rs=0.08:gs=0.08:bs=0.08",
-            "curves=all='0/0.15 0.5/0.5 1/0.85'",       # Lifted shadows/crushed highlights
-            "hue=h=2:s=0.8"                              # Desaturated look
-        ])
-        
-    elif style_template == 'vintage':
-        # Retro film aesthetic with aging effects
-        filters.extend([
-            "eq=saturation=0.7:contrast=1.2:brightness=0.12:gamma=1.05",
-            "colorbalance=rs=0.25:gs=0.15:bs=-0.2",      # Warm, aged tones
-            "curves=all='0/0.1 0.25/0.2 0.75/0.8 1/0.9'", # Film curve
-            "hue=h=8:s=0.9",                             # Warm hue shift
-            "vignette=PI/4:0.2",                         # Dark vignette
-            "noise=alls=25:allf=t+u"                     # Heavy film grain
-        ])
-    
-    # Add comprehensive audio processing
-    audio_filters = []
-    if options.get('audioNormalization', True):
-        audio_filters.append("loudnorm=I=-16:TP=-1.5:LRA=11")
-    
-    # Combine all filters
-    video_filter = ','.join(filters) if filters else "copy"
-    audio_filter = ','.join(audio_filters) if audio_filters else "copy"
-    
-    # Build comprehensive ffmpeg command
-    cmd = [
-        'ffmpeg', '-i', input_path,
-        '-vf', video_filter,
-        '-af', audio_filter,
-        '-c:v', 'libx264',      # Re-encode video for quality
-        '-crf', '18',           # High quality encoding
-        '-preset', 'medium',    # Balance speed/quality
-        '-c:a', 'aac',          # Re-encode audio
-        '-b:a', '128k',         # Audio bitrate
-        '-y', output_path
-    ]
-    
-    return cmd
-
-def calculate_style_metrics(input_path, output_path):
-    """Calculate authentic style transfer metrics"""
-    try:
-        # Get video information for both files
-        input_info = get_video_info(input_path)
-        output_info = get_video_info(output_path)
-        
-        if not input_info or not output_info:
-            return {
-                'processing_time': '0:00',
-                'style_match': 0,
-                'colors_analyzed': 0,
-                'output_size': '0MB'
-            }
-        
-        # Calculate actual file sizes
-        input_size = os.path.getsize(input_path)
-        output_size = os.path.getsize(output_path)
-        
-        # Get video streams
-        input_video = next((s for s in input_info['streams'] if s['codec_type'] == 'video'), None)
-        output_video = next((s for s in output_info['streams'] if s['codec_type'] == 'video'), None)
-        
-        if not input_video or not output_video:
-            return {
-                'processing_time': '0:00',
-                'style_match': 0,
-                'colors_analyzed': 0,
-                'output_size': f"{output_size // (1024*1024)}MB"
-            }
-        
-        # Calculate actual metrics
-        duration = float(input_video.get('duration', 0))
-        width = int(input_video.get('width', 0))
-        height = int(input_video.get('height', 0))
-        
-        # Estimate colors analyzed based on resolution and duration
-        frame_rate = float(input_video.get('avg_frame_rate', '30/1').split('/')[0]) / float(input_video.get('avg_frame_rate', '30/1').split('/')[1])
-        frame_count = duration * frame_rate
-        pixels_per_frame = width * height
-        colors_analyzed = int((frame_count * pixels_per_frame) / 5000)  # Realistic sample rate
-        
-        # Calculate style match based on actual processing (higher for more complex filters)
-        base_match = 82
-        complexity_bonus = random.randint(8, 15)  # Varies by processing complexity
-        style_match = min(97, base_match + complexity_bonus)
-        
-        # Calculate actual processing time (rough estimate based on video length)
-        processing_minutes = max(1, int(duration / 20))  # More realistic timing
-        processing_seconds = int((duration / 20 - processing_minutes) * 60)
-        if processing_minutes == 0 and processing_seconds < 30:
-            processing_seconds = random.randint(15, 45)
-        processing_time = f"{processing_minutes}:{processing_seconds:02d}"
-        
-        return {
-            'processing_time': processing_time,
-            'style_match': style_match,
-            'colors_analyzed': colors_analyzed,
-            'output_size': f"{output_size // (1024*1024)}MB"
-        }
-        
-    except Exception as e:
-        print(f"Error calculating metrics: {e}")
-        return {
-            'processing_time': '0:00',
-            'style_match': 0,
-            'colors_analyzed': 0,
-            'output_size': '0MB'
-        }
+# The stylesync package lives in python/, which the server puts on PYTHONPATH
+from stylesync import render
+from stylesync.cancellation import JobCancelled, CANCELLED_EXIT_CODE, install_signal_handlers
+from stylesync.streaming import is_stream, claim_stdout, STREAM_PATH
 
 def apply_style_transfer(user_video_path, reference_video_path, style_template, options, output_path, job_id):
-    """Real style transfer function using ffmpeg"""
+    """Run the job through the shared pipeline, exiting nonzero on failure"""
     try:
-        print(f"PROGRESS:5")
-        print(f"Starting video processing for job {job_id}")
-        
-        if not os.path.exists(user_video_path):
+        if not is_stream(user_video_path) and not os.path.exists(user_video_path):
             raise Exception(f"Input video not found: {user_video_path}")
-        
-        print(f"PROGRESS:15")
-        print(f"Analyzing input video: {user_video_path}")
-        
-        # Get video information
-        video_info = get_video_info(user_video_path)
-        if not video_info:
-            raise Exception("Failed to analyze video")
-        
-        print(f"PROGRESS:25")
-        print(f"Preparing style filters...")
-        
-        reference_style = None
-        if reference_video_path and os.path.exists(reference_video_path):
-            print(f"PROGRESS:35")
-            print(f"Analyzing reference video: {reference_video_path}")
-            reference_style = extract_video_style(reference_video_path)
-            if reference_style:
-                print(f"PROGRESS:45")
-                print("Successfully extracted reference style characteristics")
-            else:
-                print("Failed to extract reference style, falling back to template")
-        
-        print(f"PROGRESS:50")
-        if reference_style:
-            print(f"Applying reference-based style transfer...")
-        else:
-            print(f"Applying {style_template} template style transfer...")
-        
-        # Apply style-specific filters (reference-based or template-based)
-        ffmpeg_cmd = apply_style_filters(user_video_path, output_path, style_template, options, reference_style)
-        
-        print(f"PROGRESS:60")
-        print("Processing video with style filters...")
-        
-        # Run ffmpeg with progress monitoring
-        print("Running ffmpeg command:", ' '.join(ffmpeg_cmd))
-        process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        
-        stdout, stderr = process.communicate()
-        
-        if process.returncode != 0:
-            print(f"FFmpeg stderr: {stderr}")
-            raise Exception(f"Video processing failed: {stderr}")
-        
-        print(f"PROGRESS:90")
-        print("FFmpeg processing completed successfully")
-        
-        print(f"PROGRESS:95")
-        print("Calculating metrics...")
-        
-        # Calculate real metrics
-        metrics = calculate_style_metrics(user_video_path, output_path)
-        
-        print(f"PROGRESS:100")
-        print("Video processing completed successfully")
-        print(f"METRICS:{json.dumps(metrics)}")
-        
+
+        render(user_video_path, output_path, reference_video_path, style_template, options, job_id)
+
+    except JobCancelled as e:
+        print(f"ERROR:{e}")
+        sys.exit(CANCELLED_EXIT_CODE)
     except Exception as e:
         print(f"Error processing video: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
+    # One event per line as it happens, even when stdout is a pipe to the server
+    sys.stdout.reconfigure(line_buffering=True)
+
     if len(sys.argv) != 7:
         print("Usage: video_processor.py <user_video> <reference_video> <style_template> <options_json> <output_path> <job_id>")
         sys.exit(1)
-    
+
     user_video_path = sys.argv[1]
     reference_video_path = sys.argv[2] if sys.argv[2] else None
     style_template = sys.argv[3] if sys.argv[3] else None
     options_json = sys.argv[4]
     output_path = sys.argv[5]
     job_id = sys.argv[6]
-    
+
     try:
         options = json.loads(options_json)
     except:
         options = {}
-    
-    apply_style_transfer(user_video_path, reference_video_path, style_template, options, output_path, job_id)
\ No newline at end of file
+
+    # Events move to stderr when stdout carries the video
+    if output_path == STREAM_PATH:
+        claim_stdout()
+
+    # SIGTERM stops ffmpeg and removes partial output instead of encoding to the end
+    install_signal_handlers()
+
+    apply_style_transfer(user_video_path, reference_video_path, style_template, options, output_path, job_id)
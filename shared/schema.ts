@@ -24,7 +24,7 @@ export const videoJobSchema = z.object({
   errorMessage: z.string().optional(),
   metadata: z.object({
     processing_time: z.string().optional(),
-    style_match: z.number().optional(),
+    style_match: z.number().nullable().optional(),
     colors_analyzed: z.number().optional(),
     output_size: z.string().optional(),
   }).optional(),
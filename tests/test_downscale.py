@@ -0,0 +1,27 @@
+from stylesync.downscale import retune_filters
+
+
+def test_retune_filters_keeps_chain_at_full_size():
+    chain = ['noise=alls=25:allf=t+u', 'unsharp=5:5:1.0']
+    assert retune_filters(chain, 1) == chain
+    assert retune_filters(chain, None) == chain
+
+
+def test_retune_filters_scales_grain_strength():
+    assert retune_filters(['noise=alls=25:allf=t+u'], 0.5) == ['noise=alls=12:allf=t+u']
+
+
+def test_retune_filters_keeps_zero_grain_and_a_minimum_of_one():
+    assert retune_filters(['noise@g=c0s=0:c1s=2'], 0.25) == ['noise@g=c0s=0:c1s=1']
+
+
+def test_retune_filters_shrinks_unsharp_matrix_and_amount():
+    assert retune_filters(['unsharp=lx=13:ly=13:la=1.5'], 0.5) == ['unsharp=lx=7:ly=7:la=1.39:cx=3:cy=3:ca=0.00']
+
+
+def test_retune_filters_names_positional_unsharp_args():
+    assert retune_filters(['unsharp=5:5:1.0'], 0.5) == ['unsharp=lx=3:ly=3:la=0.83:cx=3:cy=3:ca=0.00']
+
+
+def test_retune_filters_leaves_other_filters_alone():
+    assert retune_filters(['eq=contrast=1.1', 'hue=h=8'], 0.5) == ['eq=contrast=1.1', 'hue=h=8']
@@ -0,0 +1,50 @@
+import pytest
+
+from stylesync.multi_output import resolve_outputs, output_files
+
+
+def test_resolve_outputs_writes_the_first_video_to_the_job_path():
+    outputs = resolve_outputs({'outputs': [
+        {'name': 'thumbs', 'kind': 'thumbnail', 'frames': 2},
+        {'name': 'master'},
+        {'name': 'web', 'height': 720},
+    ]}, '/out/job.mp4')
+    assert [output['path'] for output in outputs] == [
+        '/out/job_thumbs_%02d.jpg', '/out/job.mp4', '/out/job_web.mp4',
+    ]
+    assert outputs[2]['height'] == 720
+    assert output_files(outputs[0]) == ['/out/job_thumbs_01.jpg', '/out/job_thumbs_02.jpg']
+
+
+def test_resolve_outputs_single_video_keeps_the_job_path():
+    [output] = resolve_outputs({'outputs': [{'name': 'master'}]}, '/out/job.mp4')
+    assert output['path'] == '/out/job.mp4'
+    assert output['kind'] == 'video'
+    assert output['template'] is None
+
+
+def test_resolve_outputs_honours_paths_of_other_outputs():
+    outputs = resolve_outputs({'outputs': [{'name': 'master'}, {'name': 'web', 'path': '/web/a.mp4'}]}, '/out/job.mp4')
+    assert outputs[1]['path'] == '/web/a.mp4'
+
+
+def test_resolve_outputs_applies_job_encoder_settings():
+    outputs = resolve_outputs({'encoderProfile': 'draft', 'outputs': [
+        {'name': 'master'}, {'name': 'archive', 'encoderProfile': 'archive'},
+    ]}, '/out/job.mp4')
+    assert outputs[0]['profile']['name'] == 'draft'
+    assert outputs[1]['profile']['name'] == 'archive'
+
+
+@pytest.mark.parametrize('specs', [
+    [],
+    [{'name': 'thumbs', 'kind': 'thumbnail'}],
+    [{'name': 'master'}, {'name': 'master'}],
+    [{'name': 'master', 'kind': 'audio'}],
+    [{'name': 'master', 'bitrate': '5M'}],
+    [{'name': 'master', 'path': '/elsewhere.mp4'}],
+    [{'name': 'master'}, {'name': 'copy', 'path': '/out/job.mp4'}],
+])
+def test_resolve_outputs_rejects_invalid_specs(specs):
+    with pytest.raises(ValueError):
+        resolve_outputs({'outputs': specs}, '/out/job.mp4')
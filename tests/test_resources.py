@@ -0,0 +1,56 @@
+from stylesync import resources
+from stylesync.resources import _output_indices, _cap_threads, limit_command
+
+
+def test_output_indices_skips_option_values():
+    cmd = ['ffmpeg', '-y', '-i', 'in.mp4', '-c:v', 'libx264', '-an', 'out.mp4']
+    assert _output_indices(cmd) == [7]
+
+
+def test_output_indices_finds_every_output():
+    cmd = ['ffmpeg', '-i', 'in.mp4', '-map', '[a]', 'a.mp4', '-map', '[b]', '-y', 'b.mp4']
+    assert _output_indices(cmd) == [5, 9]
+
+
+def test_output_indices_treats_dash_as_an_output():
+    cmd = ['ffmpeg', '-i', '-', '-f', 'mp4', '-']
+    assert _output_indices(cmd) == [5]
+
+
+def test_cap_threads_adds_a_cap_to_every_output():
+    cmd = ['ffmpeg', '-i', 'in.mp4', '-map', '[a]', 'a.mp4', '-map', '[b]', 'b.mp4']
+    assert _cap_threads(cmd, 2) == [
+        'ffmpeg', '-filter_threads', '2', '-filter_complex_threads', '2',
+        '-i', 'in.mp4', '-map', '[a]', '-threads', '2', 'a.mp4', '-map', '[b]', '-threads', '2', 'b.mp4',
+    ]
+
+
+def test_cap_threads_clamps_existing_values():
+    cmd = ['ffmpeg', '-i', 'in.mp4', '-threads', '8', 'a.mp4', '-threads', '0', 'b.mp4', '-threads', '1', 'c.mp4']
+    capped = _cap_threads(cmd, 4)
+    assert capped[5:] == ['-i', 'in.mp4', '-threads', '4', 'a.mp4', '-threads', '4', 'b.mp4', '-threads', '1', 'c.mp4']
+
+
+def test_cap_threads_leaves_input_options_alone():
+    cmd = ['ffmpeg', '-threads', '1', '-ss', '5', '-i', 'in.mp4', 'out.mp4']
+    capped = _cap_threads(cmd, 2)
+    assert capped[5:] == ['-threads', '1', '-ss', '5', '-i', 'in.mp4', '-threads', '2', 'out.mp4']
+
+
+def test_limit_command_without_policy_is_unchanged():
+    cmd = ['ffmpeg', '-i', 'in.mp4', 'out.mp4']
+    assert limit_command(cmd, {}) == cmd
+
+
+def test_limit_command_prefixes_in_exec_order(monkeypatch):
+    monkeypatch.setattr(resources.shutil, 'which', lambda name: f"/usr/bin/{name}")
+    policy = {'threads': 2, 'io_class': 'idle', 'cpus': [0, 1], 'nice': 10}
+    cmd = limit_command(['ffmpeg', '-i', 'in.mp4', 'out.mp4'], policy)
+    assert cmd[:9] == ['nice', '-n', '10', 'taskset', '-c', '0,1', 'ionice', '-c', '3']
+    assert cmd[9:] == _cap_threads(['ffmpeg', '-i', 'in.mp4', 'out.mp4'], 2)
+
+
+def test_limit_command_skips_missing_tools(monkeypatch):
+    monkeypatch.setattr(resources.shutil, 'which', lambda name: None)
+    cmd = limit_command(['ffprobe', '-i', 'in.mp4'], {'threads': 2, 'nice': 10, 'io_class': 'idle'})
+    assert cmd == ['ffprobe', '-i', 'in.mp4']
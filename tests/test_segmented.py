@@ -0,0 +1,24 @@
+from stylesync.segmented import plan_segments
+
+
+def test_plan_segments_picks_keyframes_nearest_even_boundaries():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+    assert plan_segments(keyframes, 12.0, 3) == [4.0, 8.0]
+
+
+def test_plan_segments_ignores_keyframes_outside_the_clip():
+    assert plan_segments([0.0, 5.0, 12.0, 15.0], 12.0, 2) == [5.0]
+
+
+def test_plan_segments_stops_when_keyframes_run_out():
+    assert plan_segments([0.0, 3.0], 12.0, 4) == [3.0]
+
+
+def test_plan_segments_never_repeats_a_split_point():
+    splits = plan_segments([0.0, 1.0, 9.0], 10.0, 4)
+    assert splits == sorted(set(splits))
+    assert splits == [1.0, 9.0]
+
+
+def test_plan_segments_single_segment_has_no_splits():
+    assert plan_segments([0.0, 2.0, 4.0], 6.0, 1) == []
@@ -0,0 +1,51 @@
+import pytest
+
+from stylesync.style_analysis import relative_corrections
+
+
+def profile(p5=16, p50=128, luma_std=50.0, colorfulness=40.0, warm_bias=0.0, green_magenta_bias=0.0):
+    return {
+        'luma_percentiles': {'p5': p5, 'p50': p50},
+        'luma_std': luma_std,
+        'colorfulness': colorfulness,
+        'warm_bias': warm_bias,
+        'green_magenta_bias': green_magenta_bias,
+    }
+
+
+def test_relative_corrections_identical_profiles_are_neutral():
+    corrections = relative_corrections(profile(), profile())
+    assert corrections == {
+        'brightness': 0, 'contrast': 1.0, 'saturation': 1.0, 'gamma': 1.0, 'rs': 0, 'gs': 0, 'bs': 0,
+    }
+
+
+def test_relative_corrections_move_toward_the_reference():
+    corrections = relative_corrections(
+        profile(p5=40, p50=160, luma_std=60.0, colorfulness=60.0, warm_bias=0.2),
+        profile(),
+    )
+    assert corrections['brightness'] == pytest.approx(24 / 255)
+    assert corrections['contrast'] == pytest.approx(1.2)
+    assert corrections['saturation'] == pytest.approx(1.5)
+    assert corrections['gamma'] > 1
+    assert corrections['rs'] == pytest.approx(0.12)
+    assert corrections['bs'] == pytest.approx(-0.08)
+
+
+def test_relative_corrections_are_clamped():
+    corrections = relative_corrections(
+        profile(p5=255, luma_std=500.0, colorfulness=500.0, warm_bias=5.0, green_magenta_bias=-5.0),
+        profile(p5=0, luma_std=1.0, colorfulness=1.0),
+    )
+    assert corrections['brightness'] == 0.2
+    assert corrections['contrast'] == 1.5
+    assert corrections['saturation'] == 2.0
+    assert (corrections['rs'], corrections['gs'], corrections['bs']) == (0.3, -0.3, -0.3)
+
+
+def test_relative_corrections_need_both_statistics():
+    assert relative_corrections(profile(), None) is None
+    incomplete = profile()
+    del incomplete['luma_std']
+    assert relative_corrections(profile(), incomplete) is None
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from stylesync.template_registry import (
+    BUILTIN_TEMPLATE_DIR, TemplateError, TemplateRegistry, compile_template, validate_filter,
+)
+
+SEPIA = {
+    'name': 'sepia',
+    'description': 'Brown tones',
+    'filters': ['colorchannelmixer=.393:.769:.189:0:.349:.686:.168:0:.272:.534:.131'],
+    'options': {
+        'grain': {'filters': ['noise=alls=10:allf=t']},
+        'vignette': {'filters': ['vignette=PI/5'], 'default': False},
+    },
+}
+
+
+def write_template(directory, data, name=None):
+    path = directory / f"{name or data['name']}.json"
+    path.write_text(json.dumps(data))
+    return path
+
+
+def test_validate_filter_accepts_a_single_filter():
+    assert validate_filter("curves=all='0/0 0.5/0.6 1/1'", 'test') == "curves=all='0/0 0.5/0.6 1/1'"
+    assert validate_filter('eq@grade=contrast=1.1', 'test') == 'eq@grade=contrast=1.1'
+
+
+@pytest.mark.parametrize('spec', [
+    '', '   ', 42, 'Eq=contrast=1', 'eq=contrast=1,hue=h=5', 'eq=contrast=1;[x]null', 'null[out]',
+])
+def test_validate_filter_rejects_anything_but_one_filter(spec):
+    with pytest.raises(TemplateError):
+        validate_filter(spec, 'test')
+
+
+def test_compile_template_precompiles_every_option_combination():
+    template = compile_template(SEPIA, 'sepia.json')
+    assert template['options'] == [('grain', True), ('vignette', False)]
+    assert len(template['chains']) == 4
+    assert template['chains'][(True, False)] == SEPIA['filters'] + ['noise=alls=10:allf=t']
+    assert template['chains'][(False, True)] == SEPIA['filters'] + ['vignette=PI/5']
+
+
+@pytest.mark.parametrize('data', [
+    [],
+    {'name': 'sepia', 'filters': [], 'extra': 1},
+    {'name': 'Sepia', 'filters': []},
+    {'name': 'sepia', 'filters': 'eq=contrast=1'},
+    {'name': 'sepia', 'filters': [], 'options': {'grain': {}}},
+    {'name': 'sepia', 'filters': [], 'options': {f"o{i}": {'filters': []} for i in range(5)}},
+])
+def test_compile_template_rejects_invalid_files(data):
+    with pytest.raises(TemplateError):
+        compile_template(data, 'sepia.json')
+
+
+def test_registry_applies_option_toggles(tmp_path):
+    write_template(tmp_path, SEPIA)
+    registry = TemplateRegistry([tmp_path])
+    assert registry.names() == ['sepia']
+    assert registry.filters('sepia', {}) == SEPIA['filters'] + ['noise=alls=10:allf=t']
+    assert registry.filters('sepia', {'grain': False, 'vignette': True}) == SEPIA['filters'] + ['vignette=PI/5']
+    assert registry.filters(None, {}) == []
+
+
+def test_registry_later_directories_override_built_ins(tmp_path):
+    builtin, custom = tmp_path / 'builtin', tmp_path / 'custom'
+    builtin.mkdir()
+    custom.mkdir()
+    write_template(builtin, SEPIA)
+    write_template(custom, {'name': 'sepia', 'filters': ['hue=s=0']})
+    registry = TemplateRegistry([builtin, custom])
+    assert registry.filters('sepia', {}) == ['hue=s=0']
+
+
+def test_registry_unknown_template_reports_a_skipped_file(tmp_path):
+    write_template(tmp_path, {'name': 'noir', 'filters': ['eq=contrast=1,hue=s=0']})
+    registry = TemplateRegistry([tmp_path])
+    assert 'noir' not in registry.names()
+    with pytest.raises(TemplateError, match='Unknown style template: noir .*single filter'):
+        registry.filters('noir', {})
+    with pytest.raises(TemplateError, match='Unknown style template: missing$'):
+        registry.filters('missing', {})
+
+
+def test_registry_describe_lists_default_chains(tmp_path):
+    write_template(tmp_path, SEPIA)
+    [entry] = TemplateRegistry([tmp_path]).describe()
+    assert entry == {
+        'name': 'sepia',
+        'description': 'Brown tones',
+        'filters': SEPIA['filters'] + ['noise=alls=10:allf=t'],
+        'options': {'grain': True, 'vignette': False},
+    }
+
+
+def test_built_in_templates_compile():
+    registry = TemplateRegistry([BUILTIN_TEMPLATE_DIR])
+    assert not registry.errors
+    assert {'cinematic', 'minimal', 'vibrant', 'vintage'} <= set(registry.names())